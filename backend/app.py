@@ -3,19 +3,30 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import scan
+import search_service
+from quota import QuotaExceeded
+from search_cache import query_cache
+from notifications import notification_sender
+from enrichment import posting_enricher
+from boards import board_syncer
+from seen_filter import seen_filter
 from pydantic import BaseModel, Field
 from typing import List
 from enum import Enum
 import os
 from auth_routes import router as auth_router
 from saved_search_routes import router as saved_search_router
+from event_routes import router as event_router
 from auth_dep import get_current_user
+from rate_limit import rate_limit
 import models  # Import models to ensure they're registered with SQLAlchemy
 from scheduler import (
     start_background_scheduler, 
     stop_background_scheduler, 
     get_scheduler_status, 
-    run_searches_now
+    get_scheduler_queue,
+    run_searches_now,
+    scheduler_runs_in_web
 )
 
 app = FastAPI(title="Job Search API", description="API for job searching with authentication")
@@ -42,6 +53,9 @@ app.include_router(auth_router)
 # Include saved search routes
 app.include_router(saved_search_router)
 
+# Include server-sent event routes
+app.include_router(event_router)
+
 class ExperienceLevel(str, Enum):
     INTERN = "intern"
     NEW_GRAD = "new grad"
@@ -123,43 +137,51 @@ def debug_saved_searches():
             "message": "Database query failed"
         }
 
-@app.post("/search", response_model=List[str])
+@app.post("/search", response_model=List[str], dependencies=[Depends(rate_limit("search", "10/60"))])
 def search_endpoint(body: InputItem):
     try:
         # Check if API keys are configured
-        if not scan.key or not scan.id:
+        if not scan.search_configured():
             raise HTTPException(
                 status_code=503, 
-                detail="Search service not configured. Missing API keys."
+                detail="Search service not configured. Missing API keys or job boards."
             )
         
-        query = scan.buildQuery(body.text, body.level)
+        query = scan.buildQuery(body.text, body.level.value)
         print(f"Query: {query}")
         print(f"Level: {body.level}")
-        result = scan.search(query, scan.key, scan.id, body.count)
+        result = search_service.search(query, body.count)
         return result or []
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except HTTPException:
         raise
     except Exception as e:
         print(f"Search error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
-@app.post("/search/protected", response_model=List[str])
+@app.post(
+    "/search/protected",
+    response_model=List[str],
+    dependencies=[Depends(rate_limit("search_protected", "30/60", per_user=True))]
+)
 def protected_search_endpoint(body: InputItem, current_user: dict = Depends(get_current_user)):
     """Protected search endpoint that requires authentication"""
     try:
         # Check if API keys are configured
-        if not scan.key or not scan.id:
+        if not scan.search_configured():
             raise HTTPException(
                 status_code=503, 
-                detail="Search service not configured. Missing API keys."
+                detail="Search service not configured. Missing API keys or job boards."
             )
         
-        query = scan.buildQuery(body.text, body.level)
+        query = scan.buildQuery(body.text, body.level.value)
         print(f"Query: {query} (User: {current_user['email']})")
         print(f"Level: {body.level}")
-        result = scan.search(query, scan.key, scan.id, body.count)
+        result = search_service.search(query, body.count)
         return result or []
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except HTTPException:
         raise
     except Exception as e:
@@ -172,6 +194,11 @@ def get_scheduler_status_endpoint():
     """Get the current status of the background scheduler"""
     return get_scheduler_status()
 
+@app.get("/admin/scheduler/queue")
+def get_scheduler_queue_endpoint(limit: int = 50):
+    """List the next saved searches due to run, with their current intervals"""
+    return {"queue": get_scheduler_queue(min(max(limit, 1), 500))}
+
 @app.post("/admin/scheduler/start")
 def start_scheduler_endpoint():
     """Start the background scheduler"""
@@ -187,21 +214,85 @@ def stop_scheduler_endpoint():
 @app.post("/admin/scheduler/run-now")
 def run_searches_now_endpoint():
     """Manually trigger all searches immediately"""
-    run_searches_now()
-    return {"message": "All searches triggered successfully"}
+    summary = run_searches_now()
+    return {"message": "All searches triggered successfully", "summary": summary}
+
+# Notification outbox routes
+@app.get("/admin/notifications/stats")
+def get_notification_stats_endpoint():
+    """Get outbox counts by status and sender counters"""
+    return notification_sender.get_stats()
+
+@app.post("/admin/notifications/flush")
+def flush_notifications_endpoint():
+    """Send due notifications now instead of waiting for the next drain"""
+    return {"message": "Notifications sent", "delivered": notification_sender.drain()}
+
+# Search cache management routes
+@app.get("/admin/search/stats")
+def get_search_stats_endpoint():
+    """Get cache, request coalescing and quota counters for upstream searches"""
+    return search_service.get_stats()
+
+@app.get("/admin/search-cache/stats")
+def get_search_cache_stats_endpoint():
+    """Get hit/miss/eviction counters for the search result cache"""
+    return query_cache.get_stats()
+
+@app.post("/admin/search-cache/clear")
+def clear_search_cache_endpoint():
+    """Drop every cached search result"""
+    query_cache.clear()
+    return {"message": "Search cache cleared successfully"}
+
+# Posting enrichment routes
+@app.get("/admin/enrichment/stats")
+def get_enrichment_stats_endpoint():
+    """Get posting counts by enrichment status, fetch counters and throughput"""
+    return posting_enricher.get_stats()
+
+@app.post("/admin/enrichment/run")
+def run_enrichment_endpoint():
+    """Enrich due postings now instead of waiting for the next drain"""
+    processed = posting_enricher.drain()
+    return {"message": "Enrichment finished", "processed": processed, "last_batch": posting_enricher.last_batch}
+
+# Job board sync routes
+@app.get("/admin/boards/stats")
+def get_board_stats_endpoint():
+    """Get sync state of each job board and the board syncer's counters"""
+    return board_syncer.get_stats()
+
+@app.post("/admin/boards/sync")
+def sync_boards_endpoint():
+    """Pull every board that's due now instead of waiting for the next poll"""
+    processed = board_syncer.drain()
+    return {"message": "Board sync finished", "boards": processed, "last_batch": board_syncer.last_batch}
+
+# Seen-results filter routes
+@app.get("/admin/seen-filter/stats")
+def get_seen_filter_stats_endpoint():
+    """Get size, memory use and false-positive rates of the seen-results filter"""
+    return seen_filter.get_stats()
 
 # Startup event to start the scheduler
 @app.on_event("startup")
 async def startup_event():
     """Start the background scheduler when the app starts"""
-    # Create database tables if they don't exist
-    from db import engine, Base
-    Base.metadata.create_all(bind=engine)
+    # Create database tables if they don't exist and migrate; other processes wait on the same lock
+    from db import engine
+    from migrations import run_migrations
+    run_migrations(engine)
+    seen_filter.start()
     
-    start_background_scheduler()
+    # Deployments with a separate scheduler worker (python -m scheduler) set SCHEDULER_IN_WEB=false,
+    # which only takes effect with a shared Postgres database and EVENTS_BACKEND=postgres
+    if scheduler_runs_in_web():
+        start_background_scheduler()
 
 # Shutdown event to stop the scheduler
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop the background scheduler when the app shuts down"""
     stop_background_scheduler()
+    seen_filter.stop()
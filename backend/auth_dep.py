@@ -1,48 +1,143 @@
+import hashlib
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
 from jose import jwt
+from jose.exceptions import JWTClaimsError
 from fastapi import Depends, HTTPException, status, Request
 
+logger = logging.getLogger(__name__)
+
 PROJECT_URL = os.environ.get("SUPABASE_PROJECT_URL") or os.environ.get("SUPABASE_URL")
 JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET") or os.environ.get("SUPABASE_KEY")
-AUDIENCE = "authenticated" 
+AUDIENCE = "authenticated"
 ISSUER = f"{PROJECT_URL}/auth/v1" if PROJECT_URL else None
 
+# Validation policy; audience and issuer checks are off by default to match existing tokens
+JWT_VERIFY_AUD = os.environ.get("JWT_VERIFY_AUD", "false").lower() == "true"
+JWT_VERIFY_ISS = os.environ.get("JWT_VERIFY_ISS", "false").lower() == "true"
+
+# Lifetime of the tokens that open the event stream (EventSource can't send an Authorization header)
+STREAM_TOKEN_TTL = int(os.environ.get("EVENTS_TOKEN_TTL_SECONDS", "60"))
+STREAM_TOKEN_SCOPE = "events"
+
+# Verified-claims cache
+TOKEN_CACHE_SIZE = int(os.environ.get("JWT_CACHE_SIZE", "10000"))
+# Tokens without an exp claim are cached for at most this long
+TOKEN_CACHE_MAX_TTL = int(os.environ.get("JWT_CACHE_MAX_TTL_SECONDS", "300"))
+
+class ClaimsCache:
+    """Bounded LRU of verified claims keyed by token digest, each entry expiring at the token's exp"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, digest: str):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[digest]
+                return None
+            self.entries.move_to_end(digest)
+            return claims
+
+    def set(self, digest: str, claims: dict):
+        now = time.time()
+        expires_at = claims.get("exp") or now + TOKEN_CACHE_MAX_TTL
+        with self.lock:
+            self.entries[digest] = (claims, expires_at)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+claims_cache = ClaimsCache(TOKEN_CACHE_SIZE)
+
+def check_claims_policy(claims: dict):
+    """Audience and issuer checks for claims served from the cache, as jwt.decode applies them"""
+    if JWT_VERIFY_AUD:
+        audience = claims.get("aud")
+        if AUDIENCE not in (audience if isinstance(audience, list) else [audience]):
+            raise JWTClaimsError("Invalid audience")
+    if JWT_VERIFY_ISS and claims.get("iss") != ISSUER:
+        raise JWTClaimsError("Invalid issuer")
+
+def verify_token(token: str):
+    """Decode and verify a token with the configured policy, using the claims cache"""
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    claims = claims_cache.get(digest)
+    if claims is not None:
+        check_claims_policy(claims)
+        return claims
+
+    # Supabase uses HS256 with the anon/service key as secret
+    claims = jwt.decode(
+        token,
+        JWT_SECRET,
+        algorithms=["HS256"],
+        audience=AUDIENCE if JWT_VERIFY_AUD else None,
+        issuer=ISSUER if JWT_VERIFY_ISS else None,
+        options={"verify_aud": JWT_VERIFY_AUD, "verify_iss": JWT_VERIFY_ISS}
+    )
+    claims_cache.set(digest, claims)
+    return claims
+
 def get_current_user(request: Request):
     if not PROJECT_URL or not JWT_SECRET:
         raise HTTPException(status_code=503, detail="Authentication service not configured")
-        
+
     authorization = request.headers.get("authorization")
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing bearer token")
-    
+
     token = authorization.split(" ", 1)[1]
-    print(f"Debug: Received token: {token[:50]}...")
-    print(f"Debug: Using JWT_SECRET validation")
-    
+
     try:
-        # Supabase uses HS256 with the anon/service key as secret
-        claims = jwt.decode(
-            token, 
-            JWT_SECRET, 
-            algorithms=["HS256"], 
-            audience=AUDIENCE, 
-            issuer=ISSUER,
-            options={"verify_aud": False, "verify_iss": False}  # Be more lenient for debugging
-        )
-        print(f"Debug: Token decoded successfully")
+        claims = verify_token(token)
     except Exception as e:
-        print(f"Debug: Token decode error: {e}")
-        # Try without audience/issuer validation
-        try:
-            claims = jwt.decode(token, JWT_SECRET, algorithms=["HS256"], options={"verify_aud": False, "verify_iss": False})
-            print(f"Debug: Token decoded with relaxed validation")
-        except Exception as e2:
-            print(f"Debug: Relaxed decode also failed: {e2}")
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+        logger.debug(f"Token decode error: {e}")
+        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
 
     user_id = claims.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="No subject in token")
-    
-    print(f"Debug: User authenticated: {user_id}")
-    return {"id": user_id, "email": claims.get("email")}
\ No newline at end of file
+
+    logger.debug(f"User authenticated: {user_id}")
+    return {"id": user_id, "email": claims.get("email"), "claims": claims}
+
+def _stream_token_secret():
+    # Derived from, not equal to, the JWT secret, so a stream token never passes as an access token
+    return hashlib.sha256(f"event-stream:{JWT_SECRET}".encode()).hexdigest()
+
+def create_stream_token(user: dict):
+    """Short-lived token that authenticates GET /events/stream?token= for a user"""
+    now = int(time.time())
+    return jwt.encode(
+        {"sub": user["id"], "email": user.get("email"), "scope": STREAM_TOKEN_SCOPE, "iat": now, "exp": now + STREAM_TOKEN_TTL},
+        _stream_token_secret(),
+        algorithm="HS256"
+    )
+
+def get_stream_user(request: Request, token: Optional[str] = None):
+    """Authenticate the event stream by ?token= from create_stream_token, or the usual bearer header"""
+    if token is None:
+        return get_current_user(request)
+    if not PROJECT_URL or not JWT_SECRET:
+        raise HTTPException(status_code=503, detail="Authentication service not configured")
+
+    try:
+        claims = jwt.decode(token, _stream_token_secret(), algorithms=["HS256"])
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Invalid stream token: {str(e)}")
+
+    if claims.get("scope") != STREAM_TOKEN_SCOPE or not claims.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid stream token")
+
+    return {"id": claims["sub"], "email": claims.get("email"), "claims": claims}
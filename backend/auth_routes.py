@@ -2,9 +2,16 @@ from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel, EmailStr, Field
 from supabase import create_client, Client
 from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import os
+import threading
+import time
 from auth_dep import get_current_user
 
+logger = logging.getLogger(__name__)
+
 # Initialize Supabase client
 supabase_url = os.environ.get("SUPABASE_PROJECT_URL")
 supabase_key = os.environ.get("SUPABASE_ANON_KEY")
@@ -161,34 +168,75 @@ async def refresh_token(token_data: RefreshTokenRequest):
             detail=f"Token refresh failed: {str(e)}"
         )
 
+class UserProfileCache:
+    """TTL cache of Supabase user metadata that isn't in the JWT, refreshed lazily in the background"""
+    
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="profile-refresh")
+    
+    def get(self, user_id: str, token: str):
+        """Return cached metadata (possibly stale, or None), scheduling a refresh when it is missing or stale"""
+        with self.lock:
+            entry = self.entries.get(user_id)
+            stale = entry is None or time.time() - entry[1] > self.ttl_seconds
+            if stale and user_id not in self.refreshing and supabase is not None:
+                self.refreshing.add(user_id)
+                self.executor.submit(self._refresh, user_id, token)
+            return entry[0] if entry else None
+    
+    def _refresh(self, user_id: str, token: str):
+        try:
+            user_response = supabase.auth.get_user(token)
+            user = user_response.user if user_response else None
+            if user is not None:
+                metadata = {
+                    "full_name": (user.user_metadata or {}).get("full_name"),
+                    "email_verified": user.email_confirmed_at is not None,
+                    "created_at": user.created_at
+                }
+                with self.lock:
+                    self.entries[user_id] = (metadata, time.time())
+                    self.entries.move_to_end(user_id)
+                    while len(self.entries) > self.max_size:
+                        self.entries.popitem(last=False)
+        except Exception as e:
+            logger.warning(f"Profile refresh failed for {user_id}: {str(e)}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(user_id)
+
+profile_cache = UserProfileCache(
+    int(os.environ.get("PROFILE_CACHE_TTL_SECONDS", "600")),
+    int(os.environ.get("PROFILE_CACHE_SIZE", "10000"))
+)
+
 @router.get("/me")
-async def get_current_user_profile(current_user: dict = Depends(get_current_user)):
-    """Get current user profile"""
-    try:
-        # Get user details from Supabase
-        user_response = supabase.auth.get_user()
-        
-        if user_response.user is None:
-            raise HTTPException(
-                status_code=404,
-                detail="User not found"
-            )
-        
-        return {
-            "id": user_response.user.id,
-            "email": user_response.user.email,
-            "full_name": user_response.user.user_metadata.get("full_name"),
-            "email_verified": user_response.user.email_confirmed_at is not None,
-            "created_at": user_response.user.created_at
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to get user profile: {str(e)}"
-        )
+async def get_current_user_profile(
+    current_user: dict = Depends(get_current_user),
+    authorization: str = Header(None)
+):
+    """Get current user profile from the verified token, plus cached Supabase metadata"""
+    claims = current_user.get("claims", {})
+    user_metadata = claims.get("user_metadata") or {}
+    token = authorization.split(" ", 1)[1] if authorization else None
+    
+    # Never waits on Supabase: a miss is filled in the background for the next call
+    metadata = profile_cache.get(current_user["id"], token) or {}
+    # Until then the token's own claims answer; Supabase puts email_verified at the top level or in user_metadata
+    email_verified = claims.get("email_verified", user_metadata.get("email_verified", False))
+    
+    return {
+        "id": current_user["id"],
+        "email": current_user["email"],
+        "full_name": metadata.get("full_name") or user_metadata.get("full_name"),
+        "email_verified": metadata.get("email_verified", bool(email_verified)),
+        "created_at": metadata.get("created_at")
+    }
 
 class ResetPasswordRequest(BaseModel):
     email: EmailStr
@@ -0,0 +1,411 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy import select, update, and_, or_
+
+from db import SessionLocal
+from enrichment import (
+    GREENHOUSE_API_URL, LEVER_API_URL, LEVER_EU_API_URL, ASHBY_API_URL, ENRICH_USER_AGENT,
+    parse_greenhouse, parse_lever, parse_ashby_board, conditional_headers
+)
+from ingest import posting_row, upsert_postings
+from models import JobBoard, JobPosting
+import scan
+
+logger = logging.getLogger(__name__)
+
+# Boards to pull, as comma-separated "<ats>:<board slug>" (e.g. greenhouse:acme,lever:beta,ashby:gamma);
+# boards on Lever's EU instance are "lever-eu:<board slug>"
+BOARDS = os.getenv("BOARDS", "")
+BOARDS_SYNC_INTERVAL_MINUTES = int(os.getenv("BOARDS_SYNC_INTERVAL_MINUTES", "30"))
+BOARDS_RETRY_MINUTES = int(os.getenv("BOARDS_RETRY_MINUTES", "5"))
+# How often the syncer looks for boards that are due
+BOARDS_POLL_SECONDS = float(os.getenv("BOARDS_POLL_SECONDS", "60"))
+BOARDS_BATCH_SIZE = int(os.getenv("BOARDS_BATCH_SIZE", "50"))
+BOARDS_PER_HOST_CONCURRENCY = int(os.getenv("BOARDS_PER_HOST_CONCURRENCY", "4"))
+BOARDS_TIMEOUT_SECONDS = float(os.getenv("BOARDS_TIMEOUT_SECONDS", "30"))
+# Boards a worker claimed but didn't finish are picked up again after this long
+BOARDS_CLAIM_SECONDS = int(os.getenv("BOARDS_CLAIM_SECONDS", "600"))
+
+SUPPORTED_ATS = ("greenhouse", "lever", "ashby")
+# BOARDS prefixes naming an ATS's regional instance: prefix -> (ats, region)
+REGIONAL_ATS = {"lever-eu": ("lever", "eu")}
+# Listings are written this many postings at a time
+STORE_CHUNK_SIZE = 500
+# Rows read per round trip while matching a query against the store
+MATCH_CHUNK_SIZE = 500
+
+# Title keywords for each experience level; associate level is anything not marked as another level
+LEVEL_KEYWORDS = {
+    "intern": ("intern", "internship", "co-op", "coop"),
+    "new grad": ("new grad", "graduate", "entry level", "entry-level", "junior", "early career", "university"),
+    "senior level": ("senior", "sr", "staff", "lead", "principal"),
+    "manager": ("manager", "director", "head"),
+}
+ASSOCIATE_LEVEL = "associate level"
+
+def parse_board_list(value: str):
+    """[(ats, board slug, region or None)] from a BOARDS setting, skipping entries for unsupported systems"""
+    boards = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        ats, _, company = entry.partition(":")
+        ats, company = ats.strip().lower(), company.strip().lower()
+        ats, region = REGIONAL_ATS.get(ats, (ats, None))
+        if ats not in SUPPORTED_ATS or not company:
+            logger.warning(f"Ignoring board '{entry}'; expected <greenhouse|lever|lever-eu|ashby>:<board>")
+            continue
+        boards.append((ats, company, region))
+    return list(dict.fromkeys(boards))
+
+CONFIGURED_BOARDS = parse_board_list(BOARDS)
+
+def board_url(ats: str, company: str, region: str = None):
+    """Public endpoint listing every open job on a board"""
+    if ats == "greenhouse":
+        return f"{GREENHOUSE_API_URL}/v1/boards/{company}/jobs"
+    if ats == "lever":
+        base = LEVER_EU_API_URL if region == "eu" else LEVER_API_URL
+        return f"{base}/v0/postings/{company}?mode=json"
+    return f"{ASHBY_API_URL}/posting-api/job-board/{company}"
+
+def parse_listing(ats: str, company: str, data, region: str = None):
+    """[(posting URL, fields)] for every job in a board listing"""
+    if ats == "greenhouse":
+        return [
+            (f"https://job-boards.greenhouse.io/{company}/jobs/{job['id']}", parse_greenhouse(job))
+            for job in data.get("jobs") or []
+        ]
+    if ats == "lever":
+        host = "jobs.eu.lever.co" if region == "eu" else "jobs.lever.co"
+        return [(f"https://{host}/{company}/{job['id']}", parse_lever(job)) for job in data or []]
+    return [
+        (f"https://jobs.ashbyhq.com/{company}/{job_id}", fields)
+        for job_id, fields in parse_ashby_board(data).items()
+    ]
+
+def seed_boards(db):
+    """Make the job_boards table match BOARDS: add new boards, deactivate removed ones"""
+    configured = {(ats, company): region for ats, company, region in CONFIGURED_BOARDS}
+    existing = {(board.ats, board.company): board for board in db.query(JobBoard).all()}
+    for key, board in existing.items():
+        board.is_active = key in configured
+        if board.is_active:
+            board.region = configured[key]
+    for (ats, company), region in configured.items():
+        if (ats, company) not in existing:
+            db.add(JobBoard(ats=ats, company=company, region=region, is_active=True))
+    db.commit()
+
+def store_listing(db, board: dict, listing: list, now: datetime):
+    """Upsert a board's postings with their fields and close the ones it no longer lists.
+
+    Board postings are stored in job_postings like any other, already
+    enriched, so links created when a search matches them behave the same as
+    links to postings found through Custom Search. Returns (stored, closed).
+    """
+    listed = set()
+    for start in range(0, len(listing), STORE_CHUNK_SIZE):
+        chunk = listing[start:start + STORE_CHUNK_SIZE]
+        rows = {}
+        for url, fields in chunk:
+            row = posting_row(url)
+            rows[row["url_hash"]] = (row, fields)
+        posting_ids = upsert_postings(db, [row for row, _ in rows.values()])
+        db.execute(update(JobPosting), [
+            {
+                "id": posting_ids[url_hash],
+                **fields,
+                "enrich_status": "ok",
+                "enrich_attempts": 0,
+                "enrich_next_at": None,
+                "enrich_error": None,
+                "enriched_at": now,
+            }
+            for url_hash, (_, fields) in rows.items()
+        ])
+        listed.update(posting_ids.values())
+
+    open_ids = db.execute(select(JobPosting.id).where(
+        JobPosting.ats == board["ats"],
+        JobPosting.company == board["company"],
+        or_(JobPosting.enrich_status == None, JobPosting.enrich_status != "closed")
+    )).scalars().all()
+    unlisted = [posting_id for posting_id in open_ids if posting_id not in listed]
+    for start in range(0, len(unlisted), STORE_CHUNK_SIZE):
+        db.execute(
+            update(JobPosting)
+            .where(JobPosting.id.in_(unlisted[start:start + STORE_CHUNK_SIZE]))
+            .values(enrich_status="closed", enriched_at=now, enrich_next_at=None),
+            execution_options={"synchronize_session": False}
+        )
+    return len(listed), len(unlisted)
+
+class BoardSyncer:
+    """Keeps the local store of board postings current.
+
+    Every BOARDS_SYNC_INTERVAL_MINUTES each configured board's full listing is
+    pulled from its ATS's public JSON endpoint (concurrently, at most
+    BOARDS_PER_HOST_CONCURRENCY requests per host) with the last ETag and
+    Last-Modified, so unchanged boards cost a 304. Boards are leased like the
+    notification outbox, so several workers can share the work.
+    """
+
+    def __init__(self):
+        self.running = False
+        self.thread = None
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.counters = {"synced": 0, "not_modified": 0, "failed": 0, "requests": 0, "postings_stored": 0, "postings_closed": 0}
+        self.busy_seconds = 0.0
+        self.last_batch = None
+
+    def claim_boards(self, db):
+        """Claim up to BOARDS_BATCH_SIZE boards due for a sync"""
+        now = datetime.utcnow()
+        due = and_(
+            JobBoard.is_active == True,
+            or_(JobBoard.next_sync_at == None, JobBoard.next_sync_at <= now)
+        )
+        ids = db.execute(
+            select(JobBoard.id)
+            .where(due)
+            .order_by(JobBoard.id)
+            .limit(BOARDS_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            return []
+
+        # The repeated condition keeps two workers from claiming the same boards on SQLite
+        claimed = db.execute(
+            update(JobBoard)
+            .where(JobBoard.id.in_(ids), due)
+            .values(next_sync_at=now + timedelta(seconds=BOARDS_CLAIM_SECONDS))
+            .returning(JobBoard.id, JobBoard.ats, JobBoard.company, JobBoard.region, JobBoard.etag, JobBoard.last_modified),
+            execution_options={"synchronize_session": False}
+        ).mappings().all()
+        db.commit()
+        return [dict(row) for row in claimed]
+
+    async def fetch(self, client, limits, board: dict):
+        """Return (status, listing, response headers) for one board"""
+        url = board_url(board["ats"], board["company"], board["region"])
+        semaphore = limits.setdefault(urlsplit(url).netloc, asyncio.Semaphore(BOARDS_PER_HOST_CONCURRENCY))
+        try:
+            async with semaphore:
+                response = await client.get(url, headers=conditional_headers(board["etag"], board["last_modified"]))
+            self.counters["requests"] += 1
+            if response.status_code == 304:
+                return "not_modified", None, response.headers
+            response.raise_for_status()
+            return "ok", parse_listing(board["ats"], board["company"], response.json(), board["region"]), response.headers
+        except Exception as e:
+            message = str(e).splitlines()[0] if str(e) else ""
+            return "failed", f"{type(e).__name__}: {message}"[:500], None
+
+    def store(self, db, board: dict, status: str, listing, headers, now: datetime):
+        """Write one board's sync result and schedule its next sync"""
+        values = {"next_sync_at": now + timedelta(minutes=BOARDS_SYNC_INTERVAL_MINUTES)}
+        if status == "failed":
+            self.counters["failed"] += 1
+            logger.warning(f"Sync of {board['ats']} board '{board['company']}' failed: {listing}")
+            values.update(last_error=listing, next_sync_at=now + timedelta(minutes=BOARDS_RETRY_MINUTES))
+        elif status == "not_modified":
+            self.counters["not_modified"] += 1
+            values.update(last_synced_at=now, last_error=None)
+        else:
+            stored, closed = store_listing(db, board, listing, now)
+            self.counters["synced"] += 1
+            self.counters["postings_stored"] += stored
+            self.counters["postings_closed"] += closed
+            values.update(
+                last_synced_at=now,
+                last_error=None,
+                job_count=stored,
+                etag=headers.get("etag"),
+                last_modified=headers.get("last-modified")
+            )
+        db.execute(
+            update(JobBoard).where(JobBoard.id == board["id"]).values(**values),
+            execution_options={"synchronize_session": False}
+        )
+        db.commit()
+
+    async def _drain(self):
+        processed = 0
+        limits = {}
+        async with httpx.AsyncClient(
+            timeout=BOARDS_TIMEOUT_SECONDS,
+            follow_redirects=True,
+            headers={"User-Agent": ENRICH_USER_AGENT}
+        ) as client:
+            while True:
+                db = SessionLocal()
+                try:
+                    boards = self.claim_boards(db)
+                    if not boards:
+                        break
+                    started = time.monotonic()
+                    fetched = await asyncio.gather(*(self.fetch(client, limits, board) for board in boards))
+                    now = datetime.utcnow()
+                    stored = 0
+                    for board, (status, listing, headers) in zip(boards, fetched):
+                        try:
+                            self.store(db, board, status, listing, headers, now)
+                        except Exception as e:
+                            db.rollback()
+                            logger.error(f"Storing {board['ats']} board '{board['company']}' failed: {str(e)}")
+                            continue
+                        if status == "ok":
+                            stored += len(listing)
+                finally:
+                    db.close()
+                elapsed = time.monotonic() - started
+                self.busy_seconds += elapsed
+                self.last_batch = {
+                    "boards": len(boards),
+                    "postings": stored,
+                    "seconds": round(elapsed, 3),
+                    "postings_per_second": round(stored / elapsed, 1) if elapsed else None,
+                }
+                processed += len(boards)
+        return processed
+
+    def drain(self):
+        """Sync every board that's due; returns the number of boards processed"""
+        db = SessionLocal()
+        try:
+            seed_boards(db)
+        finally:
+            db.close()
+        return asyncio.run(self._drain())
+
+    def start(self):
+        """Start the background sync thread when the boards backend is selected"""
+        if scan.SEARCH_BACKEND != "boards":
+            return
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.wakeup.clear()
+            self.thread = threading.Thread(target=self._run, name="board-syncer", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                self.drain()
+            except Exception as e:
+                logger.error(f"Board syncer error: {str(e)}")
+            self.wakeup.wait(BOARDS_POLL_SECONDS)
+            self.wakeup.clear()
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=BOARDS_TIMEOUT_SECONDS + 5)
+        self.thread = None
+
+    def get_stats(self):
+        db = SessionLocal()
+        try:
+            boards = [
+                {
+                    "ats": board.ats,
+                    "company": board.company,
+                    "is_active": board.is_active,
+                    "job_count": board.job_count,
+                    "last_synced_at": board.last_synced_at,
+                    "next_sync_at": board.next_sync_at,
+                    "last_error": board.last_error,
+                }
+                for board in db.query(JobBoard).order_by(JobBoard.ats, JobBoard.company).all()
+            ]
+        finally:
+            db.close()
+        return {
+            "running": self.running,
+            "boards": boards,
+            **self.counters,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "last_batch": self.last_batch,
+        }
+
+def parse_query(query: str):
+    """(title terms, experience level) from a buildQuery() query"""
+    words = [word for word in query.split() if word != "OR" and not word.lower().startswith("site:")]
+    text = " ".join(words).lower()
+    level = None
+    for candidate in sorted([*LEVEL_KEYWORDS, ASSOCIATE_LEVEL], key=len, reverse=True):
+        if text == candidate or text.endswith(" " + candidate):
+            level = candidate
+            text = text[:-len(candidate)]
+            break
+    return re.findall(r"[a-z0-9+#.]+", text), level
+
+def _has_word(text: str, word: str):
+    return re.search(rf"(?<![a-z0-9]){re.escape(word)}", text) is not None
+
+def title_matches(title: str, terms: list, level: str):
+    """Every term starts a word in the title, and the title fits the experience level"""
+    title = (title or "").lower()
+    if not all(_has_word(title, term) for term in terms):
+        return False
+    if level in LEVEL_KEYWORDS:
+        return any(re.search(rf"(?<![a-z0-9]){re.escape(keyword)}(?![a-z0-9])", title) for keyword in LEVEL_KEYWORDS[level])
+    if level == ASSOCIATE_LEVEL:
+        # Words the user searched for don't count as level markers (e.g. "lead" in "lead generation")
+        markers = [keyword for keywords in LEVEL_KEYWORDS.values() for keyword in keywords if keyword not in terms]
+        return not any(re.search(rf"(?<![a-z0-9]){re.escape(keyword)}(?![a-z0-9])", title) for keyword in markers)
+    return True
+
+class BoardSearchBackend(scan.SearchBackend):
+    """Matches queries against open postings pulled from the configured boards, newest first"""
+
+    name = "boards"
+    uses_quota = False
+
+    def configured(self):
+        return bool(CONFIGURED_BOARDS)
+
+    def search(self, query: str, num: int):
+        terms, level = parse_query(query)
+        stmt = (
+            select(JobPosting.url, JobPosting.title)
+            .join(JobBoard, and_(JobBoard.ats == JobPosting.ats, JobBoard.company == JobPosting.company))
+            .where(JobBoard.is_active == True, JobPosting.enrich_status == "ok")
+            .order_by(JobPosting.posted_at.desc().nulls_last(), JobPosting.id.desc())
+        )
+        # LIKE narrows the candidates; title_matches applies word boundaries and the level
+        for term in terms:
+            stmt = stmt.where(JobPosting.title.ilike(f"%{term}%"))
+
+        links = []
+        db = SessionLocal()
+        try:
+            for url, title in db.execute(stmt.execution_options(yield_per=MATCH_CHUNK_SIZE)):
+                if title_matches(title, terms, level):
+                    links.append(url)
+                    if len(links) >= num:
+                        break
+        finally:
+            db.close()
+        return links
+
+# Global syncer instance
+board_syncer = BoardSyncer()
@@ -0,0 +1,477 @@
+import asyncio
+import html
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy import func, select, update, and_, or_, exists
+
+from db import SessionLocal
+from models import JobBoard, JobPosting
+
+logger = logging.getLogger(__name__)
+
+# Enrichment configuration
+ENRICH_ENABLED = os.getenv("ENRICH_ENABLED", "true").lower() == "true"
+ENRICH_INTERVAL_SECONDS = float(os.getenv("ENRICH_INTERVAL_SECONDS", "30"))
+ENRICH_BATCH_SIZE = int(os.getenv("ENRICH_BATCH_SIZE", "200"))
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "32"))
+ENRICH_PER_HOST_CONCURRENCY = int(os.getenv("ENRICH_PER_HOST_CONCURRENCY", "4"))
+ENRICH_TIMEOUT_SECONDS = float(os.getenv("ENRICH_TIMEOUT_SECONDS", "15"))
+ENRICH_MAX_ATTEMPTS = int(os.getenv("ENRICH_MAX_ATTEMPTS", "5"))
+ENRICH_RETRY_BASE_SECONDS = int(os.getenv("ENRICH_RETRY_BASE_SECONDS", "300"))
+# Postings a worker claimed but didn't finish are picked up again after this long
+ENRICH_CLAIM_SECONDS = int(os.getenv("ENRICH_CLAIM_SECONDS", "600"))
+# Postings first seen in the last ENRICH_REFRESH_WINDOW_DAYS are revalidated every
+# ENRICH_REFRESH_HOURS (a conditional request, so unchanged postings cost a 304)
+ENRICH_REFRESH_HOURS = float(os.getenv("ENRICH_REFRESH_HOURS", "24"))
+ENRICH_REFRESH_WINDOW_DAYS = int(os.getenv("ENRICH_REFRESH_WINDOW_DAYS", "14"))
+ENRICH_USER_AGENT = os.getenv("ENRICH_USER_AGENT", "job-search-app/1.0 (+posting enrichment)")
+# Board responses (Ashby lists a whole board per request) kept for revalidation
+ENRICH_BOARD_CACHE_SIZE = int(os.getenv("ENRICH_BOARD_CACHE_SIZE", "500"))
+
+# Public ATS APIs; point them at a local fixture server for testing
+GREENHOUSE_API_URL = os.getenv("ENRICH_GREENHOUSE_API_URL", "https://boards-api.greenhouse.io").rstrip("/")
+LEVER_API_URL = os.getenv("ENRICH_LEVER_API_URL", "https://api.lever.co").rstrip("/")
+LEVER_EU_API_URL = os.getenv("ENRICH_LEVER_EU_API_URL", "https://api.eu.lever.co").rstrip("/")
+ASHBY_API_URL = os.getenv("ENRICH_ASHBY_API_URL", "https://api.ashbyhq.com").rstrip("/")
+
+MAX_FIELD_LENGTH = 300
+
+_LD_JSON = re.compile(r"<script[^>]+type=[\"']application/ld\+json[\"'][^>]*>(.*?)</script>", re.I | re.S)
+_META_TAG = re.compile(r"<meta\s[^>]*>", re.I)
+_ATTRIBUTE = re.compile(r"([\w:-]+)\s*=\s*([\"'])(.*?)\2", re.S)
+_TITLE_TAG = re.compile(r"<title[^>]*>(.*?)</title>", re.I | re.S)
+
+class NotModified(Exception):
+    """The server answered 304 to a conditional request"""
+
+class PostingGone(Exception):
+    """The posting (or its board) no longer exists"""
+
+def clean(value):
+    if not isinstance(value, str):
+        return None
+    value = re.sub(r"\s+", " ", html.unescape(value)).strip()
+    return value[:MAX_FIELD_LENGTH] or None
+
+def parse_date(value):
+    """ISO 8601 string or epoch milliseconds to a naive UTC datetime"""
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value / 1000)
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_greenhouse(data: dict):
+    return {
+        "title": clean(data.get("title")),
+        "company_name": clean(data.get("company_name")),
+        "location": clean((data.get("location") or {}).get("name")),
+        "posted_at": parse_date(data.get("first_published") or data.get("updated_at")),
+    }
+
+def parse_lever(data: dict):
+    categories = data.get("categories") or {}
+    locations = categories.get("allLocations") or [categories.get("location")]
+    return {
+        "title": clean(data.get("text")),
+        "company_name": None,
+        "location": clean("; ".join(location for location in locations if location)),
+        "posted_at": parse_date(data.get("createdAt")),
+    }
+
+def parse_ashby_board(data: dict):
+    """{job id: fields} for every job listed on an Ashby board"""
+    jobs = {}
+    for job in data.get("jobs") or []:
+        location = job.get("location")
+        if job.get("isRemote") and not location:
+            location = "Remote"
+        jobs[str(job.get("id", "")).lower()] = {
+            "title": clean(job.get("title")),
+            "company_name": None,
+            "location": clean(location),
+            "posted_at": parse_date(job.get("publishedAt")),
+        }
+    return jobs
+
+def _ld_postings(node):
+    """Yield JobPosting objects from parsed JSON-LD, including inside @graph and lists"""
+    if isinstance(node, list):
+        for item in node:
+            yield from _ld_postings(item)
+    elif isinstance(node, dict):
+        kind = node.get("@type")
+        if kind == "JobPosting" or (isinstance(kind, list) and "JobPosting" in kind):
+            yield node
+        if "@graph" in node:
+            yield from _ld_postings(node["@graph"])
+
+def _ld_location(posting: dict):
+    locations = posting.get("jobLocation") or []
+    if isinstance(locations, dict):
+        locations = [locations]
+    names = []
+    for location in locations:
+        address = location.get("address") if isinstance(location, dict) else None
+        if isinstance(address, str):
+            names.append(address)
+        elif isinstance(address, dict):
+            parts = [address.get(key) for key in ("addressLocality", "addressRegion", "addressCountry")]
+            parts = [part.get("name") if isinstance(part, dict) else part for part in parts]
+            name = ", ".join(part for part in parts if isinstance(part, str) and part)
+            if name:
+                names.append(name)
+    if not names and posting.get("jobLocationType") == "TELECOMMUTE":
+        names.append("Remote")
+    return "; ".join(dict.fromkeys(names)) or None
+
+def parse_html(page: str):
+    """Fields from a posting page: schema.org JobPosting JSON-LD, falling back to og:/<title> tags"""
+    for block in _LD_JSON.findall(page):
+        try:
+            data = json.loads(block.strip())
+        except ValueError:
+            continue
+        for posting in _ld_postings(data):
+            organization = posting.get("hiringOrganization")
+            if isinstance(organization, dict):
+                organization = organization.get("name")
+            return {
+                "title": clean(posting.get("title")),
+                "company_name": clean(organization),
+                "location": clean(_ld_location(posting)),
+                "posted_at": parse_date(posting.get("datePosted")),
+            }
+
+    meta = {}
+    for tag in _META_TAG.findall(page):
+        attributes = {name.lower(): value for name, _, value in _ATTRIBUTE.findall(tag)}
+        name = attributes.get("property") or attributes.get("name")
+        if name and "content" in attributes:
+            meta.setdefault(name.lower(), attributes["content"])
+    title = meta.get("og:title")
+    if not title:
+        match = _TITLE_TAG.search(page)
+        title = match.group(1) if match else None
+    return {
+        "title": clean(title),
+        "company_name": clean(meta.get("og:site_name")),
+        "location": None,
+        "posted_at": None,
+    }
+
+def source_url(posting: dict):
+    """Where a posting's details are fetched from: its ATS API, or the page itself"""
+    ats, company, job_id = posting["ats"], posting["company"], posting["job_id"]
+    if ats == "greenhouse":
+        return f"{GREENHOUSE_API_URL}/v1/boards/{company}/jobs/{job_id}"
+    if ats == "lever":
+        base = LEVER_EU_API_URL if ".eu." in posting["url"] else LEVER_API_URL
+        return f"{base}/v0/postings/{company}/{job_id}"
+    if ats == "ashby":
+        return f"{ASHBY_API_URL}/posting-api/job-board/{company}"
+    return posting["url"]
+
+class ResponseCache:
+    """LRU of parsed responses with their ETag/Last-Modified, for revalidating shared board fetches"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, url: str):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+            return entry
+
+    def set(self, url: str, etag, last_modified, value):
+        with self.lock:
+            self.entries[url] = (etag, last_modified, value)
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+def conditional_headers(etag, last_modified):
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+class PostingEnricher:
+    """Fills in title, company, location and posted date for new job postings.
+
+    Runs off the request path on a background thread with its own event loop:
+    each batch of claimed postings is fetched concurrently with httpx, at most
+    ENRICH_CONCURRENCY requests at once and ENRICH_PER_HOST_CONCURRENCY per
+    host. Greenhouse and Lever postings come from their public per-job APIs,
+    Ashby postings from one board listing per company, and anything else from
+    the page's JSON-LD. Refreshes send the stored ETag/Last-Modified back, so an
+    unchanged posting costs a 304.
+    """
+
+    def __init__(self):
+        self.running = False
+        self.thread = None
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.board_cache = ResponseCache(ENRICH_BOARD_CACHE_SIZE)
+        self.counters = {"enriched": 0, "not_modified": 0, "closed": 0, "retries": 0, "failed": 0, "requests": 0}
+        self.busy_seconds = 0.0
+        self.last_batch = None
+
+    def due_condition(self, now: datetime):
+        claimable = or_(JobPosting.enrich_next_at == None, JobPosting.enrich_next_at <= now)
+        return or_(
+            and_(or_(JobPosting.enrich_status == None, JobPosting.enrich_status == "pending"), claimable),
+            and_(
+                JobPosting.enrich_status == "ok",
+                JobPosting.enriched_at < now - timedelta(hours=ENRICH_REFRESH_HOURS),
+                JobPosting.first_seen_at >= now - timedelta(days=ENRICH_REFRESH_WINDOW_DAYS),
+                # Board sync already keeps these current from the board's listing
+                ~exists().where(
+                    JobBoard.ats == JobPosting.ats,
+                    JobBoard.company == JobPosting.company,
+                    JobBoard.is_active == True
+                ).correlate(JobPosting),
+                claimable
+            )
+        )
+
+    def claim_batch(self, db):
+        """Claim up to ENRICH_BATCH_SIZE due postings, oldest first, as plain dicts"""
+        now = datetime.utcnow()
+        due = self.due_condition(now)
+        ids = db.execute(
+            select(JobPosting.id)
+            .where(due)
+            .order_by(JobPosting.id)
+            .limit(ENRICH_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            return []
+
+        # The repeated condition keeps two workers from claiming the same postings on SQLite
+        claimed = db.execute(
+            update(JobPosting)
+            .where(JobPosting.id.in_(ids), due)
+            .values(enrich_next_at=now + timedelta(seconds=ENRICH_CLAIM_SECONDS))
+            .returning(
+                JobPosting.id, JobPosting.url, JobPosting.ats, JobPosting.company, JobPosting.job_id,
+                JobPosting.enrich_status, JobPosting.enrich_attempts, JobPosting.etag, JobPosting.last_modified
+            ),
+            execution_options={"synchronize_session": False}
+        ).mappings().all()
+        db.commit()
+        return [dict(row) for row in claimed]
+
+    async def request(self, client, limits, url: str, headers: dict):
+        """GET under the global and per-host limits; raises NotModified / PostingGone"""
+        host = urlsplit(url).netloc
+        semaphore = limits.setdefault(host, asyncio.Semaphore(ENRICH_PER_HOST_CONCURRENCY))
+        async with semaphore:
+            response = await client.get(url, headers=headers)
+        self.counters["requests"] += 1
+        if response.status_code == 304:
+            raise NotModified()
+        if response.status_code in (404, 410):
+            raise PostingGone()
+        response.raise_for_status()
+        return response
+
+    async def fetch_board(self, client, limits, url: str):
+        cached = self.board_cache.get(url)
+        headers = conditional_headers(cached[0], cached[1]) if cached else {}
+        try:
+            response = await self.request(client, limits, url, headers)
+        except NotModified:
+            return cached[2]
+        jobs = parse_ashby_board(response.json())
+        self.board_cache.set(url, response.headers.get("etag"), response.headers.get("last-modified"), jobs)
+        return jobs
+
+    async def fetch(self, client, limits, boards: dict, posting: dict):
+        """Return the column updates for one posting"""
+        url = source_url(posting)
+        now = datetime.utcnow()
+        try:
+            if posting["ats"] == "ashby":
+                # Every posting on a board shares one request per batch
+                if url not in boards:
+                    boards[url] = asyncio.ensure_future(self.fetch_board(client, limits, url))
+                fields = (await boards[url]).get(posting["job_id"])
+                if fields is None:
+                    raise PostingGone()
+                validators = {}
+            else:
+                headers = {}
+                if posting["enrich_status"] == "ok":
+                    headers = conditional_headers(posting["etag"], posting["last_modified"])
+                response = await self.request(client, limits, url, headers)
+                if posting["ats"] == "greenhouse":
+                    fields = parse_greenhouse(response.json())
+                elif posting["ats"] == "lever":
+                    fields = parse_lever(response.json())
+                else:
+                    fields = parse_html(response.text)
+                validators = {"etag": response.headers.get("etag"), "last_modified": response.headers.get("last-modified")}
+        except NotModified:
+            self.counters["not_modified"] += 1
+            return {"id": posting["id"], "enriched_at": now, "enrich_next_at": None, "enrich_error": None}
+        except PostingGone:
+            self.counters["closed"] += 1
+            return {"id": posting["id"], "enrich_status": "closed", "enriched_at": now, "enrich_next_at": None}
+        except Exception as e:
+            return self.retry_later(posting, e, now)
+
+        self.counters["enriched"] += 1
+        return {
+            "id": posting["id"],
+            **fields,
+            **validators,
+            "enrich_status": "ok",
+            "enrich_attempts": 0,
+            "enrich_next_at": None,
+            "enrich_error": None,
+            "enriched_at": now,
+        }
+
+    def retry_later(self, posting: dict, error: Exception, now: datetime):
+        """Back off exponentially, giving up after ENRICH_MAX_ATTEMPTS"""
+        error_text = f"{type(error).__name__}: {error}"[:500]
+        logger.warning(f"Enrichment of posting {posting['id']} failed: {error_text}")
+        if posting["enrich_status"] == "ok":
+            # A failed refresh keeps the fields it has and tries again next refresh
+            return {"id": posting["id"], "enriched_at": now, "enrich_next_at": None, "enrich_error": error_text}
+        attempts = (posting["enrich_attempts"] or 0) + 1
+        if attempts >= ENRICH_MAX_ATTEMPTS:
+            self.counters["failed"] += 1
+            return {
+                "id": posting["id"], "enrich_status": "failed", "enrich_attempts": attempts,
+                "enrich_next_at": None, "enrich_error": error_text,
+            }
+        self.counters["retries"] += 1
+        return {
+            "id": posting["id"], "enrich_status": "pending", "enrich_attempts": attempts,
+            "enrich_next_at": now + timedelta(seconds=ENRICH_RETRY_BASE_SECONDS * 2 ** (attempts - 1)),
+            "enrich_error": error_text,
+        }
+
+    async def _drain(self):
+        processed = 0
+        limits = {}
+        client = httpx.AsyncClient(
+            timeout=ENRICH_TIMEOUT_SECONDS,
+            follow_redirects=True,
+            headers={"User-Agent": ENRICH_USER_AGENT},
+            limits=httpx.Limits(max_connections=ENRICH_CONCURRENCY, max_keepalive_connections=ENRICH_CONCURRENCY)
+        )
+        try:
+            while True:
+                db = SessionLocal()
+                try:
+                    postings = self.claim_batch(db)
+                    if not postings:
+                        break
+                    started = time.monotonic()
+                    updates = await self.fetch_batch(client, limits, postings)
+                    db.execute(update(JobPosting), updates)
+                    db.commit()
+                finally:
+                    db.close()
+                elapsed = time.monotonic() - started
+                self.busy_seconds += elapsed
+                self.last_batch = {
+                    "postings": len(postings),
+                    "seconds": round(elapsed, 3),
+                    "postings_per_second": round(len(postings) / elapsed, 1) if elapsed else None,
+                }
+                processed += len(postings)
+        finally:
+            await client.aclose()
+        return processed
+
+    async def fetch_batch(self, client, limits, postings: list):
+        """Fetch a batch concurrently; boards maps Ashby board URLs to their single in-flight fetch"""
+        boards = {}
+        return await asyncio.gather(*(self.fetch(client, limits, boards, posting) for posting in postings))
+
+    def drain(self):
+        """Enrich everything that's due; returns the number of postings processed"""
+        return asyncio.run(self._drain())
+
+    def wake(self):
+        """Start the next drain now, e.g. after a run stored new postings"""
+        self.wakeup.set()
+
+    def start(self):
+        """Start the background enrichment thread"""
+        if not ENRICH_ENABLED:
+            return
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.wakeup.clear()
+            self.thread = threading.Thread(target=self._run, name="posting-enricher", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                self.drain()
+            except Exception as e:
+                logger.error(f"Posting enricher error: {str(e)}")
+            self.wakeup.wait(ENRICH_INTERVAL_SECONDS)
+            self.wakeup.clear()
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=ENRICH_TIMEOUT_SECONDS + 5)
+        self.thread = None
+
+    def get_stats(self):
+        db = SessionLocal()
+        try:
+            by_status = dict(db.query(
+                func.coalesce(JobPosting.enrich_status, "pending"), func.count(JobPosting.id)
+            ).group_by(func.coalesce(JobPosting.enrich_status, "pending")).all())
+        finally:
+            db.close()
+        processed = sum(self.counters[key] for key in ("enriched", "not_modified", "closed", "retries", "failed"))
+        return {
+            "running": self.running,
+            "postings": by_status,
+            **self.counters,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "postings_per_second": round(processed / self.busy_seconds, 1) if self.busy_seconds else None,
+            "last_batch": self.last_batch,
+        }
+
+# Global enricher instance
+posting_enricher = PostingEnricher()
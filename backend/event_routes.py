@@ -0,0 +1,71 @@
+import asyncio
+import json
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
+
+from auth_dep import STREAM_TOKEN_TTL, create_stream_token, get_current_user, get_stream_user
+from events import broker, event_backend
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+HEARTBEAT_SECONDS = int(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+def format_event(event: dict):
+    data = {k: v for k, v in event.items() if k not in ("id", "type", "user_id")}
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/token")
+async def create_events_token(current_user: dict = Depends(get_current_user)):
+    """Short-lived token for opening the stream from a browser EventSource, which can't set headers"""
+    return {"token": create_stream_token(current_user), "expires_in": STREAM_TOKEN_TTL}
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    current_user: dict = Depends(get_stream_user),
+    last_event_id: Optional[str] = Header(None),
+    resume_after: Optional[str] = Query(None, alias="last_event_id")
+):
+    """Server-Sent Events stream of "new results for search X" notifications for the current user.
+
+    Authenticate with a bearer header or ?token= from POST /events/token. A new
+    EventSource can pass ?last_event_id= to resume, since only the browser's
+    own reconnects send the Last-Event-ID header.
+    """
+    event_backend.start()
+
+    last_event_id = last_event_id or resume_after
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
+
+    user_id = current_user["id"]
+    subscriber, missed = broker.subscribe(user_id, resume_from)
+
+    async def event_stream():
+        _, queue = subscriber
+        try:
+            yield f"retry: {HEARTBEAT_SECONDS * 1000}\n\n"
+            for event in missed:
+                yield format_event(event)
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment lines keep proxies from closing an idle connection
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            broker.unsubscribe(user_id, subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict, deque
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from db import DATABASE_URL, engine
+
+logger = logging.getLogger(__name__)
+
+# Event configuration
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory").lower()  # memory or postgres
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "search_events")
+EVENTS_REPLAY_SIZE = int(os.getenv("EVENTS_REPLAY_SIZE", "100"))
+# Replay buffers are kept for at most this many users (least recently active dropped first)
+EVENTS_REPLAY_USERS = int(os.getenv("EVENTS_REPLAY_USERS", "10000"))
+# Events older than this aren't replayed on reconnect
+EVENTS_REPLAY_SECONDS = int(os.getenv("EVENTS_REPLAY_SECONDS", "300"))
+
+class EventBroker:
+    """Fans events out to this process's SSE subscribers and keeps a short per-user replay buffer"""
+
+    def __init__(self, replay_size: int, replay_users: int, replay_seconds: int):
+        self.replay_size = replay_size
+        self.replay_users = replay_users
+        self.replay_seconds = replay_seconds
+        self.lock = threading.Lock()
+        self.subscribers = {}  # user_id -> set of (loop, queue)
+        self.recent = OrderedDict()  # user_id -> deque of events, least recently published first
+
+    def subscribe(self, user_id: str, last_event_id: int = None):
+        """Register a subscriber; returns (queue, events missed since last_event_id)"""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(subscriber)
+            missed = []
+            if last_event_id is not None:
+                # Event ids are nanosecond timestamps
+                oldest = max(last_event_id, time.time_ns() - self.replay_seconds * 1_000_000_000)
+                missed = [e for e in self.recent.get(user_id, ()) if e["id"] > oldest]
+        return subscriber, missed
+
+    def unsubscribe(self, user_id: str, subscriber):
+        with self.lock:
+            subscribers = self.subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.subscribers[user_id]
+
+    def dispatch(self, event: dict):
+        """Deliver an event to local subscribers; safe to call from any thread"""
+        user_id = event["user_id"]
+        with self.lock:
+            recent = self.recent.get(user_id)
+            if recent is None:
+                recent = self.recent[user_id] = deque(maxlen=self.replay_size)
+            else:
+                self.recent.move_to_end(user_id)
+            recent.append(event)
+            while len(self.recent) > self.replay_users:
+                self.recent.popitem(last=False)
+            subscribers = list(self.subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's event loop has closed
+                pass
+
+    def subscriber_count(self):
+        with self.lock:
+            return sum(len(s) for s in self.subscribers.values())
+
+class MemoryEventBackend:
+    """Delivers events within this process only"""
+
+    def __init__(self, broker: EventBroker):
+        self.broker = broker
+
+    def publish(self, event: dict):
+        self.broker.dispatch(event)
+
+    def start(self):
+        pass
+
+def listen_dsn(url: str):
+    """libpq connection string for a SQLAlchemy URL; libpq rejects driver suffixes like postgresql+psycopg2://"""
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+class PostgresNotifyBackend:
+    """Delivers events through Postgres LISTEN/NOTIFY so every worker process sees them"""
+
+    def __init__(self, broker: EventBroker, channel: str):
+        self.broker = broker
+        self.channel = channel
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def publish(self, event: dict):
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"), {
+                "channel": self.channel,
+                "payload": json.dumps(event),
+            })
+
+    def start(self):
+        """Start the listener thread once per process"""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._listen_forever, name="event-listener", daemon=True)
+                self.thread.start()
+
+    def _listen_forever(self):
+        import psycopg2
+
+        while True:
+            try:
+                conn = psycopg2.connect(listen_dsn(DATABASE_URL))
+                conn.set_session(autocommit=True)
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                logger.info(f"Listening for events on channel {self.channel}")
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.broker.dispatch(json.loads(notify.payload))
+            except Exception as e:
+                logger.error(f"Event listener error, reconnecting: {str(e)}")
+                time.sleep(5)
+
+def create_backend(name: str, broker: EventBroker):
+    if name == "postgres":
+        return PostgresNotifyBackend(broker, EVENTS_CHANNEL)
+    if name != "memory":
+        logger.warning(f"Unknown EVENTS_BACKEND '{name}', using in-process events")
+    return MemoryEventBackend(broker)
+
+# Global broker instance
+broker = EventBroker(EVENTS_REPLAY_SIZE, EVENTS_REPLAY_USERS, EVENTS_REPLAY_SECONDS)
+event_backend = create_backend(EVENTS_BACKEND, broker)
+
+def publish_new_results(user_id: str, saved_search_id: int, new_results: int, new_results_count: int):
+    """Announce that ingestion committed new results for a saved search.
+
+    new_results is how many this run added; new_results_count is the search's
+    unseen total afterwards, which clients show as is rather than adding up runs.
+    """
+    event = {
+        # Nanosecond timestamps keep ids ordered across processes for Last-Event-ID resume
+        "id": time.time_ns(),
+        "type": "new_results",
+        "user_id": user_id,
+        "saved_search_id": saved_search_id,
+        "new_results": new_results,
+        "new_results_count": new_results_count,
+    }
+    try:
+        event_backend.publish(event)
+    except Exception as e:
+        logger.error(f"Failed to publish event for search {saved_search_id}: {str(e)}")
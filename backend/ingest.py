@@ -0,0 +1,133 @@
+import hashlib
+
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import JobPosting, SavedSearchResult
+from seen_filter import seen_filter
+import scan
+
+def result_hash(url: str):
+    """Hash of a result's posting identity, so variants of one job posting dedupe to a single row"""
+    return hashlib.sha256(scan.posting_identity(url).encode()).hexdigest()
+
+def posting_row(url: str):
+    """job_postings values for a result URL"""
+    canonical, key = scan.canonicalize_url(url)
+    identity = ":".join(key) if key else canonical
+    ats, company, job_id = key or (None, None, None)
+    return {
+        "url_hash": hashlib.sha256(identity.encode()).hexdigest(),
+        "url": canonical,
+        "ats": ats,
+        "company": company,
+        "job_id": job_id,
+    }
+
+def _dialect_insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
+
+def upsert_postings(db: Session, postings: list):
+    """Make sure each posting row exists and return {url_hash: posting id}"""
+    if not postings:
+        return {}
+    hashes = [posting["url_hash"] for posting in postings]
+
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is not None:
+        db.execute(dialect_insert(JobPosting).values(postings).on_conflict_do_nothing(index_elements=["url_hash"]))
+    else:
+        existing = set(db.execute(select(JobPosting.url_hash).where(JobPosting.url_hash.in_(hashes))).scalars())
+        missing = [posting for posting in postings if posting["url_hash"] not in existing]
+        if missing:
+            db.execute(insert(JobPosting), missing)
+
+    return dict(db.execute(select(JobPosting.url_hash, JobPosting.id).where(JobPosting.url_hash.in_(hashes))).all())
+
+def insert_links(db: Session, links: list):
+    """Link postings to saved searches, skipping existing links; returns the (saved_search_id, posting_id) pairs inserted"""
+    if not links:
+        return set()
+
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(SavedSearchResult).values(links).on_conflict_do_nothing(
+            index_elements=["saved_search_id", "posting_id"]
+        ).returning(SavedSearchResult.saved_search_id, SavedSearchResult.posting_id)
+        return {tuple(row) for row in db.execute(stmt)}
+
+    pairs = [(link["saved_search_id"], link["posting_id"]) for link in links]
+    existing = {tuple(row) for row in db.execute(
+        select(SavedSearchResult.saved_search_id, SavedSearchResult.posting_id).where(
+            tuple_(SavedSearchResult.saved_search_id, SavedSearchResult.posting_id).in_(pairs)
+        )
+    )}
+    new_links = [link for link, pair in zip(links, pairs) if pair not in existing]
+    if new_links:
+        db.execute(insert(SavedSearchResult), new_links)
+    return {(link["saved_search_id"], link["posting_id"]) for link in new_links}
+
+def linked_hashes(db: Session, saved_search_id: int, hashes: list):
+    """The subset of posting hashes already linked to a saved search"""
+    if not hashes:
+        return set()
+    return set(db.execute(
+        select(JobPosting.url_hash)
+        .join(SavedSearchResult, SavedSearchResult.posting_id == JobPosting.id)
+        .where(SavedSearchResult.saved_search_id == saved_search_id, JobPosting.url_hash.in_(hashes))
+    ).scalars())
+
+def count_new_results(db: Session, saved_search_id: int):
+    """Results of a saved search not yet marked seen, as shown in its new_results_count"""
+    return db.scalar(select(func.count()).where(
+        SavedSearchResult.saved_search_id == saved_search_id,
+        SavedSearchResult.is_new == True
+    ))
+
+def ingest_results(db: Session, saved_search_id: int, urls: list):
+    """Link results to a saved search and return the URLs it hadn't seen before, in rank order.
+
+    A posting is stored once in job_postings however many searches find it;
+    per-search state lives in the slim saved_search_results link rows. The
+    seen-results Bloom filter answers first: only its "maybe" answers are
+    checked against the database, and only results not already linked are
+    written. Postgres and SQLite insert with ON CONFLICT DO NOTHING (links
+    RETURNING what was new), so links another worker added since the filter
+    last saw them are still caught; other dialects check existing rows with one
+    IN query and bulk insert the rest. The caller commits.
+    """
+    postings = []
+    seen = set()
+    for url in urls:
+        posting = posting_row(url)
+        if posting["url_hash"] not in seen:
+            seen.add(posting["url_hash"])
+            postings.append(posting)
+    if not postings:
+        return []
+
+    maybe = [posting["url_hash"] for posting in postings if seen_filter.might_contain(saved_search_id, posting["url_hash"])]
+    linked = linked_hashes(db, saved_search_id, maybe)
+    seen_filter.record(len(postings), len(maybe), len(maybe) - len(linked))
+    postings = [posting for posting in postings if posting["url_hash"] not in linked]
+    if not postings:
+        return []
+
+    posting_ids = upsert_postings(db, postings)
+    inserted = insert_links(db, [
+        {"saved_search_id": saved_search_id, "posting_id": posting_ids[posting["url_hash"]], "is_new": True}
+        for posting in postings
+    ])
+    # A rolled-back transaction leaves extra entries behind, which only turn into "maybe" answers
+    for posting in postings:
+        seen_filter.add(saved_search_id, posting["url_hash"])
+    return [
+        posting["url"] for posting in postings
+        if (saved_search_id, posting_ids[posting["url_hash"]]) in inserted
+    ]
@@ -0,0 +1,216 @@
+import itertools
+import logging
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from db import SessionLocal
+from models import SavedSearchRun
+
+logger = logging.getLogger(__name__)
+
+# Worker pool configuration
+WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", "4"))
+# Finished runs kept in saved_search_runs for status polling
+MAX_FINISHED_RUNS = int(os.getenv("MAX_FINISHED_RUNS", "1000"))
+
+# Lower numbers run first
+INTERACTIVE_PRIORITY = 0
+SCHEDULED_PRIORITY = 10
+
+class WorkerPool:
+    """Fixed-size thread pool that runs queued work in priority order.
+
+    Shared by on-demand saved-search runs and the scheduler sweep, so a large
+    sweep can't hold up a user's "run now" behind thousands of queued queries.
+    """
+
+    def __init__(self, size: int, name: str):
+        self.size = size
+        self.name = name
+        self.queue = queue.PriorityQueue()
+        self.counter = itertools.count()
+        self.threads = []
+        self.busy = 0
+        self.lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self.lock:
+            while len(self.threads) < self.size:
+                thread = threading.Thread(
+                    target=self._work, name=f"{self.name}-{len(self.threads)}", daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+
+    def _work(self):
+        while True:
+            _, _, future, fn, args = self.queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self.lock:
+                self.busy += 1
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                with self.lock:
+                    self.busy -= 1
+
+    def submit(self, fn, *args, priority: int = SCHEDULED_PRIORITY):
+        """Queue fn(*args) and return a Future for its result"""
+        self._ensure_started()
+        future = Future()
+        self.queue.put((priority, next(self.counter), future, fn, args))
+        return future
+
+    def get_stats(self):
+        return {
+            "size": self.size,
+            "busy": self.busy,
+            "queued": self.queue.qsize(),
+        }
+
+class SearchRun:
+    """State of one on-demand run of a saved search"""
+
+    FIELDS = (
+        "id", "saved_search_id", "user_id", "state", "queued_at", "started_at",
+        "finished_at", "total_results", "new_results", "error", "retry_after",
+    )
+
+    def __init__(self, saved_search_id: int, user_id: str):
+        self.id = uuid.uuid4().hex
+        self.saved_search_id = saved_search_id
+        self.user_id = user_id
+        self.state = "queued"
+        self.queued_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.total_results = None
+        self.new_results = None
+        self.error = None
+        self.retry_after = None
+
+    @classmethod
+    def from_row(cls, row: SavedSearchRun):
+        run = cls.__new__(cls)
+        for field in cls.FIELDS:
+            setattr(run, field, getattr(row, field))
+        return run
+
+    def to_row(self):
+        return SavedSearchRun(**{field: getattr(self, field) for field in self.FIELDS})
+
+    def to_dict(self):
+        duration = None
+        if self.started_at and self.finished_at:
+            duration = round((self.finished_at - self.started_at).total_seconds(), 3)
+        return {
+            "job_id": self.id,
+            "saved_search_id": self.saved_search_id,
+            "state": self.state,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_seconds": duration,
+            "total_results": self.total_results,
+            "new_results": self.new_results,
+            "error": self.error,
+            "retry_after": self.retry_after,
+        }
+
+class RunRegistry:
+    """Tracks on-demand runs; repeat requests for a search join its queued or running job.
+
+    Run state is written to saved_search_runs, so a status poll can be served by
+    any web worker, not only the one running the search.
+    """
+
+    def __init__(self, pool: WorkerPool, max_finished: int):
+        self.pool = pool
+        self.max_finished = max_finished
+        self.lock = threading.Lock()
+        self.active = {}
+
+    def submit(self, saved_search_id: int, user_id: str, fn):
+        """Start fn(run) for a search unless one is already in flight; returns (run, created)"""
+        with self.lock:
+            run = self.active.get(saved_search_id)
+            if run is not None:
+                return run, False
+
+            run = SearchRun(saved_search_id, user_id)
+            self._save(run)
+            self.active[saved_search_id] = run
+
+        self.pool.submit(self._execute, run, fn, priority=INTERACTIVE_PRIORITY)
+        return run, True
+
+    def _execute(self, run: SearchRun, fn):
+        run.state = "running"
+        run.started_at = datetime.utcnow()
+        self._record(run)
+        state = "failed"
+        try:
+            fn(run)
+            state = "succeeded"
+        except Exception as e:
+            logger.error(f"Run {run.id} of search {run.saved_search_id} failed: {str(e)}")
+            run.error = str(e)
+            run.retry_after = getattr(e, "retry_after", None)
+        finally:
+            run.finished_at = datetime.utcnow()
+            run.state = state
+            self._record(run, trim=True)
+            with self.lock:
+                self.active.pop(run.saved_search_id, None)
+
+    def _save(self, run: SearchRun, trim: bool = False):
+        db = SessionLocal()
+        try:
+            db.merge(run.to_row())
+            if trim:
+                self._trim(db)
+            db.commit()
+        finally:
+            db.close()
+
+    def _record(self, run: SearchRun, trim: bool = False):
+        """Save a state change from the worker; a failed write is logged, not raised"""
+        try:
+            self._save(run, trim)
+        except Exception as e:
+            logger.error(f"Failed to save state of run {run.id}: {str(e)}")
+
+    def _trim(self, db):
+        """Forget the oldest finished runs once more than max_finished are kept"""
+        cutoff = (
+            select(SavedSearchRun.finished_at)
+            .where(SavedSearchRun.finished_at.isnot(None))
+            .order_by(SavedSearchRun.finished_at.desc())
+            .offset(self.max_finished)
+            .limit(1)
+            .scalar_subquery()
+        )
+        db.execute(delete(SavedSearchRun).where(SavedSearchRun.finished_at <= cutoff))
+
+    def get(self, job_id: str):
+        db = SessionLocal()
+        try:
+            row = db.get(SavedSearchRun, job_id)
+            return SearchRun.from_row(row) if row is not None else None
+        finally:
+            db.close()
+
+# Global instances shared by the API and the scheduler
+worker_pool = WorkerPool(WORKER_POOL_SIZE, "worker")
+run_registry = RunRegistry(worker_pool, MAX_FINISHED_RUNS)
@@ -0,0 +1,241 @@
+import logging
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from sqlalchemy import inspect, select, update, delete, text
+from sqlalchemy.orm import Session
+
+from db import Base
+from models import SchemaMigration
+
+# Rows are copied out of legacy tables this many at a time
+MIGRATION_CHUNK_SIZE = 5000
+
+# Postgres advisory lock held while migrating, so the web and worker processes don't race
+MIGRATION_LOCK_ID = 720174
+
+# Per-search results table, superseded by job_postings + saved_search_results. It is
+# left in place after its rows are copied so it can be checked (and dropped) by hand.
+legacy_results = sa.table(
+    "search_results",
+    sa.column("id", sa.Integer),
+    sa.column("saved_search_id", sa.Integer),
+    sa.column("result_url", sa.String),
+    sa.column("result_hash", sa.String),
+    sa.column("is_new", sa.Boolean),
+    sa.column("found_at", sa.DateTime),
+)
+
+def has_table(db: Session, name: str):
+    return inspect(db.get_bind()).has_table(name)
+
+logger = logging.getLogger(__name__)
+
+def sync_columns(engine):
+    """Add columns that exist on a model but not yet on its table.
+
+    Only nullable columns are added; anything else needs a hand-written
+    migration because existing rows would have no value for it.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable:
+                    logger.warning(f"Not adding non-nullable column {table.name}.{column.name}; migrate it by hand")
+                    continue
+                logger.info(f"Adding column {column.name} to {table.name}")
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {preparer.quote(column.name)} {column_type}"
+                ))
+
+def sync_indexes(engine):
+    """Bring indexes on existing tables in line with the models.
+
+    create_all() only creates missing tables, so indexes added to (or changed
+    on) a model after its table exists are created here. An index whose
+    uniqueness no longer matches the model is dropped and recreated.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {ix["name"]: ix for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                current = existing.get(index.name)
+                if current is not None and bool(current["unique"]) == bool(index.unique):
+                    continue
+                if current is not None:
+                    logger.info(f"Recreating index {index.name} on {table.name}")
+                    index.drop(bind=conn)
+                else:
+                    logger.info(f"Creating index {index.name} on {table.name}")
+                index.create(bind=conn)
+
+def relax_result_hash_index(db: Session):
+    """Make the legacy search_results.result_hash index non-unique.
+
+    Older schemas declared result_hash globally unique, so re-keying the same
+    posting found by two searches would collide. The SearchResult model is
+    gone, so sync_indexes no longer recreates this index; do it by hand.
+    """
+    if not has_table(db, "search_results"):
+        return
+
+    bind = db.get_bind()
+    indexes = {ix["name"]: ix for ix in inspect(bind).get_indexes("search_results")}
+    index = indexes.get("ix_search_results_result_hash")
+    if index is not None and not index["unique"]:
+        return
+
+    preparer = bind.dialect.identifier_preparer
+    name = preparer.quote("ix_search_results_result_hash")
+    if index is not None:
+        logger.info("Recreating ix_search_results_result_hash on search_results as non-unique")
+        db.execute(text(f"DROP INDEX {name}"))
+    db.execute(text(f"CREATE INDEX {name} ON {preparer.quote('search_results')} (result_hash)"))
+    db.commit()
+
+def canonicalize_result_urls(db: Session):
+    """Re-key legacy results by canonical posting identity, keeping the oldest row of each posting"""
+    from ingest import result_hash
+    import scan
+
+    if not has_table(db, "search_results"):
+        return
+
+    results = legacy_results.c
+    search_ids = db.execute(select(results.saved_search_id).distinct()).scalars().all()
+    for search_id in search_ids:
+        rows = db.execute(
+            select(results.id, results.result_url, results.result_hash)
+            .where(results.saved_search_id == search_id)
+            .order_by(results.id)
+        ).all()
+
+        kept = set()
+        duplicates = []
+        changed = []
+        for row in rows:
+            url, _ = scan.canonicalize_url(row.result_url)
+            url_hash = result_hash(url)
+            if url_hash in kept:
+                duplicates.append(row.id)
+                continue
+            kept.add(url_hash)
+            if url != row.result_url or url_hash != row.result_hash:
+                changed.append({"row_id": row.id, "result_url": url, "result_hash": url_hash})
+
+        # Duplicates go first so no kept row's new hash collides with a row still to be removed
+        if duplicates:
+            db.execute(delete(legacy_results).where(results.id.in_(duplicates)))
+        if changed:
+            db.execute(
+                update(legacy_results)
+                .where(results.id == sa.bindparam("row_id"))
+                .values(result_url=sa.bindparam("result_url"), result_hash=sa.bindparam("result_hash")),
+                changed
+            )
+        db.commit()
+        if duplicates or changed:
+            logger.info(f"Search {search_id}: merged {len(duplicates)} duplicate and re-keyed {len(changed)} result(s)")
+
+def copy_results_to_postings(db: Session):
+    """Copy legacy search_results into job_postings and saved_search_results links"""
+    from ingest import posting_row, upsert_postings, insert_links
+
+    if not has_table(db, "search_results"):
+        return
+
+    results = legacy_results.c
+    last_id = 0
+    copied = 0
+    while True:
+        rows = db.execute(
+            select(results.id, results.saved_search_id, results.result_url, results.is_new, results.found_at)
+            .where(results.id > last_id)
+            .order_by(results.id)
+            .limit(MIGRATION_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        postings = {}
+        row_hashes = []
+        for row in rows:
+            posting = posting_row(row.result_url)
+            postings.setdefault(posting["url_hash"], posting)
+            row_hashes.append(posting["url_hash"])
+        posting_ids = upsert_postings(db, list(postings.values()))
+
+        links = {}
+        for row, url_hash in zip(rows, row_hashes):
+            links.setdefault((row.saved_search_id, posting_ids[url_hash]), {
+                "saved_search_id": row.saved_search_id,
+                "posting_id": posting_ids[url_hash],
+                "is_new": row.is_new,
+                "found_at": row.found_at,
+            })
+        copied += len(insert_links(db, list(links.values())))
+        db.commit()
+        last_id = rows[-1].id
+
+    logger.info(f"Copied {copied} result link(s) from search_results")
+
+# One-off data migrations, applied in order and recorded in schema_migrations
+DATA_MIGRATIONS = [
+    ("relax_result_hash_index", relax_result_hash_index),
+    ("canonicalize_result_urls", canonicalize_result_urls),
+    ("copy_results_to_postings", copy_results_to_postings),
+]
+
+def run_data_migrations(engine):
+    with Session(engine) as db:
+        applied = set(db.execute(select(SchemaMigration.name)).scalars())
+        for name, migrate in DATA_MIGRATIONS:
+            if name in applied:
+                continue
+            logger.info(f"Applying data migration {name}")
+            migrate(db)
+            db.add(SchemaMigration(name=name))
+            db.commit()
+
+@contextmanager
+def migration_lock(engine):
+    """Hold a Postgres advisory lock for the block; a no-op on SQLite, which runs as one local process"""
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            conn.commit()
+
+def run_migrations(engine):
+    """Create missing tables and apply idempotent schema upgrades that create_all() can't handle.
+
+    Every process calls this at startup; the first one migrates and the rest
+    wait for it, then find nothing left to do.
+    """
+    with migration_lock(engine):
+        Base.metadata.create_all(bind=engine)
+        sync_columns(engine)
+        sync_indexes(engine)
+        run_data_migrations(engine)
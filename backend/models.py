@@ -14,6 +14,10 @@ class UserPreference(Base):
 
 class SavedSearch(Base):
     __tablename__ = "saved_searches"
+    __table_args__ = (
+        # Supports finding the next active searches due to run
+        sa.Index("ix_saved_searches_active_next_run", "is_active", "next_run_at"),
+    )
     
     id = sa.Column(sa.Integer, primary_key=True, index=True)
     user_id = sa.Column(sa.String, nullable=False, index=True)  # Supabase user ID
@@ -24,19 +28,162 @@ class SavedSearch(Base):
     is_active = sa.Column(sa.Boolean, nullable=False, default=True)
     notification_email = sa.Column(sa.String, nullable=True)
     last_run_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    next_run_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    run_interval_minutes = sa.Column(sa.Integer, nullable=True)  # Fixed interval; adaptive when unset
+    empty_runs = sa.Column(sa.Integer, nullable=True)  # Consecutive scheduled runs without new results
+    # Held by the scheduler worker currently running this search
+    lease_owner = sa.Column(sa.String, nullable=True)
+    lease_expires_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
     created_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
     updated_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now())
 
-class SearchResult(Base):
-    __tablename__ = "search_results"
-    
-    id = sa.Column(sa.Integer, primary_key=True, index=True)
-    saved_search_id = sa.Column(sa.Integer, sa.ForeignKey("saved_searches.id"), nullable=False)
-    result_url = sa.Column(sa.String, nullable=False)
-    result_hash = sa.Column(sa.String, nullable=False, unique=True, index=True)
+class JobPosting(Base):
+    __tablename__ = "job_postings"
+    __table_args__ = (
+        # Supports claiming postings due for enrichment
+        sa.Index("ix_job_postings_enrich_due", "enrich_status", "enrich_next_at"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    # Hash of the posting identity (see scan.posting_identity); one row per posting across all searches
+    url_hash = sa.Column(sa.String, nullable=False, unique=True)
+    url = sa.Column(sa.String, nullable=False)  # Canonical URL
+    ats = sa.Column(sa.String, nullable=True)
+    company = sa.Column(sa.String, nullable=True)  # Board slug from the URL
+    job_id = sa.Column(sa.String, nullable=True)
+    first_seen_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
+
+    # Filled in by the enrichment pipeline (see enrichment.py)
+    title = sa.Column(sa.String, nullable=True)
+    company_name = sa.Column(sa.String, nullable=True)
+    location = sa.Column(sa.String, nullable=True)
+    posted_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    enrich_status = sa.Column(sa.String, nullable=True, default="pending")  # pending, ok, closed or failed; NULL means pending
+    enrich_attempts = sa.Column(sa.Integer, nullable=True, default=0)
+    enrich_next_at = sa.Column(sa.DateTime(timezone=True), nullable=True)  # Retry or claim expiry; NULL means due
+    enrich_error = sa.Column(sa.String, nullable=True)
+    enriched_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    # Validators of the last response, sent back when the posting is refreshed
+    etag = sa.Column(sa.String, nullable=True)
+    last_modified = sa.Column(sa.String, nullable=True)
+
+class JobBoard(Base):
+    __tablename__ = "job_boards"
+    __table_args__ = (
+        sa.UniqueConstraint("ats", "company", name="uq_job_boards_ats_company"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    ats = sa.Column(sa.String, nullable=False)  # greenhouse, lever or ashby
+    company = sa.Column(sa.String, nullable=False)  # Board slug, as in the posting URLs
+    region = sa.Column(sa.String, nullable=True)  # "eu" for boards on Lever's EU instance
+    is_active = sa.Column(sa.Boolean, nullable=False, default=True)
+    next_sync_at = sa.Column(sa.DateTime(timezone=True), nullable=True)  # Next sync or claim expiry; NULL means due
+    last_synced_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    job_count = sa.Column(sa.Integer, nullable=True)
+    last_error = sa.Column(sa.String, nullable=True)
+    # Validators of the last listing, sent back on the next sync
+    etag = sa.Column(sa.String, nullable=True)
+    last_modified = sa.Column(sa.String, nullable=True)
+
+class SavedSearchResult(Base):
+    __tablename__ = "saved_search_results"
+    __table_args__ = (
+        # Supports counting unseen results per search
+        sa.Index("ix_saved_search_results_search_new", "saved_search_id", "is_new"),
+    )
+
+    saved_search_id = sa.Column(sa.Integer, sa.ForeignKey("saved_searches.id"), primary_key=True)
+    posting_id = sa.Column(sa.Integer, sa.ForeignKey("job_postings.id"), primary_key=True)
     is_new = sa.Column(sa.Boolean, nullable=False, default=True)
     found_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
 
+# Supports keyset pagination of a search's results, newest first
+sa.Index(
+    "ix_saved_search_results_search_found",
+    SavedSearchResult.saved_search_id, SavedSearchResult.found_at.desc(), SavedSearchResult.posting_id
+)
+
+class SearchCacheEntry(Base):
+    __tablename__ = "search_cache"
+
+    cache_key = sa.Column(sa.String, primary_key=True)
+    results = sa.Column(sa.JSON, nullable=False, default=list)
+    expires_at = sa.Column(sa.Float, nullable=False, index=True)  # Unix timestamp
+    accessed_at = sa.Column(sa.Float, nullable=False, index=True)  # Unix timestamp, for LRU eviction
+
+class ApiQuotaUsage(Base):
+    __tablename__ = "api_quota_usage"
+
+    day = sa.Column(sa.String, primary_key=True)  # UTC date, YYYY-MM-DD
+    used = sa.Column(sa.Integer, nullable=False, default=0)
+    updated_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now())
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        # Supports the sender picking up deliveries that are due
+        sa.Index("ix_notification_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    recipient = sa.Column(sa.String, nullable=False, index=True)
+    # A snapshot of the search, so deleting it doesn't orphan or block a pending email
+    saved_search_id = sa.Column(sa.Integer, nullable=False)
+    search_name = sa.Column(sa.String, nullable=False)
+    job_title = sa.Column(sa.String, nullable=False)
+    experience_level = sa.Column(sa.String, nullable=False)
+    new_count = sa.Column(sa.Integer, nullable=False)
+    urls = sa.Column(sa.JSON, nullable=False, default=list)
+    status = sa.Column(sa.String, nullable=False, default="pending")  # pending, sending, sent or failed
+    attempts = sa.Column(sa.Integer, nullable=False, default=0)
+    claim_token = sa.Column(sa.String, nullable=True)  # Set by the sender delivering this row
+    next_attempt_at = sa.Column(sa.DateTime(timezone=True), nullable=False)
+    last_error = sa.Column(sa.String, nullable=True)
+    created_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
+    sent_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+
+class SavedSearchRun(Base):
+    """On-demand run of a saved search, stored so any web worker can report its status"""
+    __tablename__ = "saved_search_runs"
+
+    id = sa.Column(sa.String, primary_key=True)  # Job id returned to the client
+    # No foreign key: a run may finish after its search is deleted
+    saved_search_id = sa.Column(sa.Integer, nullable=False, index=True)
+    user_id = sa.Column(sa.String, nullable=False)
+    state = sa.Column(sa.String, nullable=False)  # queued, running, succeeded or failed
+    queued_at = sa.Column(sa.DateTime(timezone=True), nullable=False)
+    started_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    finished_at = sa.Column(sa.DateTime(timezone=True), nullable=True, index=True)
+    total_results = sa.Column(sa.Integer, nullable=True)
+    new_results = sa.Column(sa.Integer, nullable=True)
+    error = sa.Column(sa.String, nullable=True)
+    retry_after = sa.Column(sa.Integer, nullable=True)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    name = sa.Column(sa.String, primary_key=True)
+    applied_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
+
+class RateLimitCounter(Base):
+    __tablename__ = "rate_limit_counters"
+
+    key = sa.Column(sa.String, primary_key=True)
+    window_start = sa.Column(sa.Integer, primary_key=True)  # Unix timestamp of the fixed window
+    count = sa.Column(sa.Integer, nullable=False, default=0)
+
+class SeenFilterSnapshot(Base):
+    __tablename__ = "seen_filter_snapshots"
+
+    name = sa.Column(sa.String, primary_key=True)
+    data = sa.Column(sa.LargeBinary, nullable=False)  # Bloom filter bit array
+    bits = sa.Column(sa.BigInteger, nullable=False)
+    hashes = sa.Column(sa.Integer, nullable=False)
+    capacity = sa.Column(sa.BigInteger, nullable=False)
+    item_count = sa.Column(sa.BigInteger, nullable=False)
+    saved_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now())
+
 # Pydantic Models for API
 class ExperienceLevel(str, Enum):
     INTERN = "intern"
@@ -56,6 +203,7 @@ class SavedSearchCreate(BaseModel):
     experience_level: ExperienceLevel
     count: int = Field(default=10, ge=1, le=100)
     notification_email: Optional[str] = Field(None, max_length=255)
+    run_interval_minutes: Optional[int] = Field(None, ge=1, le=10080)
 
 class SavedSearchUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100)
@@ -64,6 +212,7 @@ class SavedSearchUpdate(BaseModel):
     count: Optional[int] = Field(None, ge=1, le=100)
     is_active: Optional[bool] = None
     notification_email: Optional[str] = Field(None, max_length=255)
+    run_interval_minutes: Optional[int] = Field(None, ge=1, le=10080)
 
 class SavedSearchResponse(BaseModel):
     id: int
@@ -74,6 +223,8 @@ class SavedSearchResponse(BaseModel):
     is_active: bool
     notification_email: Optional[str]
     last_run_at: Optional[datetime]
+    next_run_at: Optional[datetime] = None
+    run_interval_minutes: Optional[int] = None
     created_at: datetime
     new_results_count: int = 0
 
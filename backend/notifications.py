@@ -0,0 +1,313 @@
+import logging
+import os
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from html import escape
+
+from sqlalchemy import func, select, update, delete, and_
+
+from db import SessionLocal
+from models import NotificationOutbox, SavedSearch
+
+logger = logging.getLogger(__name__)
+
+# SMTP configuration
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+FROM_EMAIL = os.getenv("FROM_EMAIL", SMTP_USERNAME)
+# Local stand-ins (python -m aiosmtpd -n) speak plain SMTP without TLS or auth
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_AUTH = os.getenv("SMTP_AUTH", "true").lower() == "true"
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+APP_URL = os.getenv("APP_URL", "https://your-app-url.netlify.app")
+
+# Outbox delivery
+NOTIFY_INTERVAL_SECONDS = float(os.getenv("NOTIFY_INTERVAL_SECONDS", "60"))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "200"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "6"))
+NOTIFY_RETRY_BASE_SECONDS = int(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "60"))
+# Rows a sender claimed but didn't finish (e.g. it crashed) are picked up again after this long
+NOTIFY_CLAIM_SECONDS = int(os.getenv("NOTIFY_CLAIM_SECONDS", "300"))
+NOTIFY_RETENTION_DAYS = int(os.getenv("NOTIFY_RETENTION_DAYS", "7"))
+
+# URLs listed per search in an email
+MAX_URLS_PER_SEARCH = 10
+
+def email_configured():
+    return bool(FROM_EMAIL) and (not SMTP_AUTH or bool(SMTP_USERNAME and SMTP_PASSWORD))
+
+def enqueue_notification(db, saved_search: SavedSearch, new_urls: list):
+    """Queue a new-results email in the caller's transaction, so it commits together with the results"""
+    if not saved_search.notification_email:
+        return False
+    if not email_configured():
+        logger.warning("SMTP credentials not configured, skipping email notification")
+        return False
+
+    db.add(NotificationOutbox(
+        recipient=saved_search.notification_email,
+        saved_search_id=saved_search.id,
+        search_name=saved_search.name,
+        job_title=saved_search.job_title,
+        experience_level=saved_search.experience_level,
+        new_count=len(new_urls),
+        urls=new_urls[:MAX_URLS_PER_SEARCH],
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    ))
+    return True
+
+def build_digest(recipient: str, items: list):
+    """One email covering every pending notification for a recipient"""
+    total = sum(item.new_count for item in items)
+    if len(items) == 1:
+        subject = f"New Job Results: {items[0].search_name}"
+    else:
+        subject = f"New Job Results: {total} new posting(s) across {len(items)} saved searches"
+
+    html_body = """
+    <html>
+    <body>
+        <h2>New Job Search Results</h2>
+    """
+
+    for item in items:
+        html_body += f"""
+        <p>Your saved search "<strong>{escape(item.search_name)}</strong>" found {item.new_count} new job posting(s):</p>
+        <ul>
+            <li><strong>Job Title:</strong> {escape(item.job_title)}</li>
+            <li><strong>Experience Level:</strong> {escape(item.experience_level)}</li>
+        </ul>
+        <ul>
+        """
+        for url in item.urls:
+            html_body += f'<li><a href="{escape(url)}" target="_blank">{escape(url)}</a></li>'
+        if item.new_count > len(item.urls):
+            html_body += f"<li><em>...and {item.new_count - len(item.urls)} more results</em></li>"
+        html_body += "</ul>"
+
+    html_body += f"""
+        <p>
+            <a href="{APP_URL}" target="_blank">View all results in your dashboard</a>
+        </p>
+
+        <hr>
+        <p><small>This is an automated notification from your Job Search App.
+        To stop receiving these notifications, update your saved search settings.</small></p>
+    </body>
+    </html>
+    """
+
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = FROM_EMAIL
+    msg['To'] = recipient
+    msg.attach(MIMEText(html_body, 'html'))
+    return msg
+
+class NotificationSender:
+    """Drains the notification outbox: one SMTP session per drain and one digest email per recipient"""
+
+    def __init__(self):
+        self.running = False
+        self.thread = None
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.counters = {"emails_sent": 0, "items_sent": 0, "retries": 0, "failed": 0}
+
+    def claim_batch(self, db):
+        """Claim up to NOTIFY_BATCH_SIZE due outbox rows, oldest first"""
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        due = and_(
+            NotificationOutbox.status.in_(("pending", "sending")),
+            NotificationOutbox.next_attempt_at <= now
+        )
+        ids = db.execute(
+            select(NotificationOutbox.id)
+            .where(due)
+            .order_by(NotificationOutbox.id)
+            .limit(NOTIFY_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            return []
+
+        # The repeated condition keeps two senders from claiming the same rows on SQLite
+        db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(ids), due)
+            .values(
+                status="sending",
+                claim_token=token,
+                next_attempt_at=now + timedelta(seconds=NOTIFY_CLAIM_SECONDS)
+            ),
+            execution_options={"synchronize_session": False}
+        )
+        db.commit()
+        return db.query(NotificationOutbox).filter(
+            NotificationOutbox.claim_token == token
+        ).order_by(NotificationOutbox.id).all()
+
+    def connect(self):
+        smtp = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            if SMTP_STARTTLS:
+                smtp.starttls()
+            if SMTP_AUTH:
+                smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+        except Exception:
+            smtp.close()
+            raise
+        return smtp
+
+    def retry_later(self, items: list, error: Exception):
+        """Back off exponentially, giving up after NOTIFY_MAX_ATTEMPTS"""
+        now = datetime.utcnow()
+        for item in items:
+            item.attempts += 1
+            item.claim_token = None
+            item.last_error = str(error)[:500]
+            if item.attempts >= NOTIFY_MAX_ATTEMPTS:
+                item.status = "failed"
+                self.counters["failed"] += 1
+            else:
+                item.status = "pending"
+                item.next_attempt_at = now + timedelta(seconds=NOTIFY_RETRY_BASE_SECONDS * 2 ** (item.attempts - 1))
+                self.counters["retries"] += 1
+        recipients = ", ".join(sorted({item.recipient for item in items}))
+        logger.error(f"Failed to send {len(items)} notification(s) to {recipients}: {str(error)}")
+
+    def send_batch(self, db, smtp, items: list):
+        """Send one digest per recipient over an open SMTP session; returns outbox rows delivered"""
+        by_recipient = {}
+        for item in items:
+            by_recipient.setdefault(item.recipient, []).append(item)
+
+        delivered = 0
+        unsent = list(by_recipient.items())
+        try:
+            while unsent:
+                recipient, recipient_items = unsent[0]
+                try:
+                    smtp.send_message(build_digest(recipient, recipient_items))
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                    # The server rejected this message; the session is still usable
+                    self.retry_later(recipient_items, e)
+                else:
+                    now = datetime.utcnow()
+                    for item in recipient_items:
+                        item.status = "sent"
+                        item.sent_at = now
+                        item.claim_token = None
+                    delivered += len(recipient_items)
+                    self.counters["emails_sent"] += 1
+                    self.counters["items_sent"] += len(recipient_items)
+                    logger.info(f"Email notification sent to {recipient} covering {len(recipient_items)} search(es)")
+                unsent.pop(0)
+                db.commit()
+        except Exception as e:
+            # The connection is gone; everything not yet sent goes back in the queue
+            for _, recipient_items in unsent:
+                self.retry_later(recipient_items, e)
+            db.commit()
+            raise
+        return delivered
+
+    def drain(self):
+        """Send everything that's due; returns the number of outbox rows delivered"""
+        delivered = 0
+        smtp = None
+        try:
+            while True:
+                db = SessionLocal()
+                try:
+                    items = self.claim_batch(db)
+                    if not items:
+                        break
+                    try:
+                        if smtp is None:
+                            smtp = self.connect()
+                        delivered += self.send_batch(db, smtp, items)
+                    except Exception as e:
+                        if smtp is None:
+                            self.retry_later(items, e)
+                            db.commit()
+                        logger.error(f"Notification batch failed: {str(e)}")
+                        break
+                finally:
+                    db.close()
+        finally:
+            if smtp is not None:
+                try:
+                    smtp.quit()
+                except Exception:
+                    smtp.close()
+        return delivered
+
+    def purge(self):
+        """Drop delivered and abandoned rows older than the retention window"""
+        db = SessionLocal()
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=NOTIFY_RETENTION_DAYS)
+            db.execute(delete(NotificationOutbox).where(
+                NotificationOutbox.status.in_(("sent", "failed")),
+                NotificationOutbox.created_at < cutoff
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def start(self):
+        """Start the background sender thread"""
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.wakeup.clear()
+            self.thread = threading.Thread(target=self._run, name="notification-sender", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                self.drain()
+                self.purge()
+            except Exception as e:
+                logger.error(f"Notification sender error: {str(e)}")
+            self.wakeup.wait(NOTIFY_INTERVAL_SECONDS)
+            self.wakeup.clear()
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def get_stats(self):
+        db = SessionLocal()
+        try:
+            by_status = dict(db.query(NotificationOutbox.status, func.count(NotificationOutbox.id)).group_by(
+                NotificationOutbox.status
+            ).all())
+        finally:
+            db.close()
+        return {
+            "running": self.running,
+            "email_configured": email_configured(),
+            "outbox": by_status,
+            **self.counters,
+        }
+
+# Global sender instance
+notification_sender = NotificationSender()
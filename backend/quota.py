@@ -0,0 +1,196 @@
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from db import SessionLocal
+from models import ApiQuotaUsage
+
+logger = logging.getLogger(__name__)
+
+# Quota configuration
+DAILY_QUOTA = int(os.getenv("CSE_DAILY_QUOTA", "100"))
+RATE_PER_SECOND = float(os.getenv("CSE_RATE_PER_SECOND", "5"))
+# Share of the daily quota that only interactive traffic may use
+INTERACTIVE_RESERVE = float(os.getenv("CSE_INTERACTIVE_RESERVE", "0.2"))
+# How long scheduled traffic may wait for a per-second token before giving up
+SCHEDULED_MAX_WAIT_SECONDS = float(os.getenv("CSE_SCHEDULED_MAX_WAIT_SECONDS", "30"))
+
+INTERACTIVE = "interactive"
+SCHEDULED = "scheduled"
+
+class QuotaExceeded(Exception):
+    """Raised when an upstream call would exceed the rate limit or the daily quota"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def pages_for(count: int):
+    """Number of upstream API calls needed to fetch count results"""
+    return max(1, math.ceil(min(count, 100) / 10))
+
+def _today():
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+def _seconds_until_reset():
+    now = datetime.utcnow()
+    tomorrow = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    return int((tomorrow - now).total_seconds()) + 1
+
+class TokenBucket:
+    """In-process token bucket; part of the capacity is held back for the interactive lane"""
+
+    def __init__(self, rate: float, capacity: float, interactive_reserve: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.interactive_reserve = interactive_reserve
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_take(self, cost: float, lane: str):
+        """Take cost tokens if available; otherwise return the seconds to wait"""
+        # Keep the reserve free for interactive calls, but never so much that a full search can't fit
+        floor = 0 if lane == INTERACTIVE else min(self.interactive_reserve, self.capacity - cost)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens - cost >= floor:
+                self.tokens -= cost
+                return 0
+            return (cost + floor - self.tokens) / self.rate
+
+    def give_back(self, cost: float):
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + cost)
+
+class QuotaLimiter:
+    """Per-second and per-day limits on upstream search calls, with interactive and scheduled lanes.
+
+    The per-second bucket lives in process memory. The daily counter lives in the
+    api_quota_usage table and is updated atomically, so it survives restarts and
+    is shared by every worker.
+    """
+
+    def __init__(self, daily_quota: int, rate_per_second: float, interactive_reserve: float):
+        self.daily_quota = daily_quota
+        self.interactive_reserve = interactive_reserve
+        # Burst capacity must hold at least one full 100-result search
+        capacity = max(float(pages_for(100)), rate_per_second)
+        self.bucket = TokenBucket(rate_per_second, capacity, capacity * interactive_reserve)
+        self.lock = threading.Lock()
+        self.rejected = {INTERACTIVE: 0, SCHEDULED: 0}
+        self.granted = {INTERACTIVE: 0, SCHEDULED: 0}
+        self.released = 0
+
+    def daily_limit(self, lane: str):
+        """Daily calls available to a lane; scheduled traffic cannot touch the interactive reserve"""
+        if lane == INTERACTIVE:
+            return self.daily_quota
+        return int(self.daily_quota * (1 - self.interactive_reserve))
+
+    def used_today(self):
+        db = SessionLocal()
+        try:
+            row = db.get(ApiQuotaUsage, _today())
+            return row.used if row else 0
+        finally:
+            db.close()
+
+    def remaining(self, lane: str):
+        """Calls left today for a lane"""
+        return max(0, self.daily_limit(lane) - self.used_today())
+
+    def _reserve_daily(self, cost: int, lane: str):
+        """Atomically add cost to today's usage if it fits under the lane's limit"""
+        day = _today()
+        limit = self.daily_limit(lane)
+        if cost > limit:
+            return False
+        db = SessionLocal()
+        try:
+            updated = db.query(ApiQuotaUsage).filter(
+                ApiQuotaUsage.day == day,
+                ApiQuotaUsage.used + cost <= limit
+            ).update({"used": ApiQuotaUsage.used + cost}, synchronize_session=False)
+            if not updated:
+                if db.get(ApiQuotaUsage, day) is not None:
+                    return False
+                db.add(ApiQuotaUsage(day=day, used=cost))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker created today's row first
+                db.rollback()
+                return self._reserve_daily(cost, lane)
+            return True
+        finally:
+            db.close()
+
+    def _record(self, counter: dict, lane: str):
+        with self.lock:
+            counter[lane] += 1
+
+    def acquire(self, cost: int = 1, lane: str = INTERACTIVE):
+        """Reserve cost upstream calls or raise QuotaExceeded.
+
+        Interactive calls fail fast. Scheduled calls may wait for per-second
+        tokens, but never for the daily quota.
+        """
+        deadline = time.monotonic() + (SCHEDULED_MAX_WAIT_SECONDS if lane == SCHEDULED else 0)
+        while True:
+            wait = self.bucket.try_take(cost, lane)
+            if wait == 0:
+                break
+            if time.monotonic() + wait > deadline:
+                self._record(self.rejected, lane)
+                raise QuotaExceeded("Search rate limit exceeded, try again shortly", max(1, math.ceil(wait)))
+            time.sleep(wait)
+
+        if not self._reserve_daily(cost, lane):
+            self.bucket.give_back(cost)
+            self._record(self.rejected, lane)
+            raise QuotaExceeded("Daily search quota exhausted", _seconds_until_reset())
+
+        self._record(self.granted, lane)
+
+    def release(self, cost: int):
+        """Give back calls reserved by acquire() that were never made upstream"""
+        self.bucket.give_back(cost)
+        db = SessionLocal()
+        try:
+            db.query(ApiQuotaUsage).filter(
+                ApiQuotaUsage.day == _today(),
+                ApiQuotaUsage.used >= cost
+            ).update({"used": ApiQuotaUsage.used - cost}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        with self.lock:
+            self.released += cost
+
+    def get_stats(self):
+        try:
+            used = self.used_today()
+        except Exception as e:
+            logger.error(f"Failed to read quota usage: {str(e)}")
+            used = None
+        return {
+            "day": _today(),
+            "daily_quota": self.daily_quota,
+            "used_today": used,
+            "scheduled_daily_limit": self.daily_limit(SCHEDULED),
+            "rate_per_second": self.bucket.rate,
+            "granted": dict(self.granted),
+            "rejected": dict(self.rejected),
+            "released": self.released,
+        }
+
+# Global limiter instance
+quota_limiter = QuotaLimiter(DAILY_QUOTA, RATE_PER_SECOND, INTERACTIVE_RESERVE)
@@ -0,0 +1,135 @@
+import logging
+import math
+import os
+import random
+import threading
+import time
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.dialects import postgresql, sqlite
+
+from auth_dep import get_current_user
+from db import SessionLocal
+from models import RateLimitCounter
+
+logger = logging.getLogger(__name__)
+
+# Rate limit configuration
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()  # memory or database
+# Use the first X-Forwarded-For hop as the client IP (only behind a trusted proxy)
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+
+def parse_limit(value: str):
+    """Parse "<requests>/<seconds>" into (requests, seconds)"""
+    requests, seconds = value.split("/", 1)
+    return int(requests), int(seconds)
+
+class MemoryRateLimitBackend:
+    """Per-process fixed-window counters"""
+
+    def __init__(self):
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def hit(self, key: str, window_start: int, window: int):
+        """Count a request in the current window; returns (current count, previous window count)"""
+        with self.lock:
+            current = self.counters.get((key, window_start), 0) + 1
+            self.counters[(key, window_start)] = current
+            previous = self.counters.get((key, window_start - window), 0)
+            if random.random() < 0.01:
+                self._prune(window_start - window)
+            return current, previous
+
+    def _prune(self, oldest: int):
+        for counter_key in [k for k in self.counters if k[1] < oldest]:
+            del self.counters[counter_key]
+
+class DatabaseRateLimitBackend:
+    """Counters in the rate_limit_counters table, shared by every worker"""
+
+    def hit(self, key: str, window_start: int, window: int):
+        db = SessionLocal()
+        try:
+            dialect = db.get_bind().dialect.name
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            stmt = dialect_insert(RateLimitCounter).values(key=key, window_start=window_start, count=1)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["key", "window_start"],
+                set_={"count": RateLimitCounter.count + 1}
+            ).returning(RateLimitCounter.count)
+            current = db.execute(stmt).scalar_one()
+            previous_row = db.get(RateLimitCounter, (key, window_start - window))
+            previous = previous_row.count if previous_row else 0
+            if random.random() < 0.01:
+                db.query(RateLimitCounter).filter(
+                    RateLimitCounter.window_start < window_start - window
+                ).delete(synchronize_session=False)
+            db.commit()
+            return current, previous
+        finally:
+            db.close()
+
+def create_backend(name: str):
+    if name == "database":
+        return DatabaseRateLimitBackend()
+    if name != "memory":
+        logger.warning(f"Unknown RATE_LIMIT_BACKEND '{name}', using in-process counters")
+    return MemoryRateLimitBackend()
+
+backend = create_backend(RATE_LIMIT_BACKEND)
+
+def check(key: str, limit: int, window: int):
+    """Sliding-window check; returns (allowed, remaining, reset_seconds)"""
+    now = time.time()
+    window_start = int(now // window * window)
+    try:
+        current, previous = backend.hit(key, window_start, window)
+    except Exception as e:
+        # Fail open: a broken limiter shouldn't take the search endpoints down
+        logger.error(f"Rate limit check failed: {str(e)}")
+        return True, limit, window
+
+    # Weight the previous window by how much of it still overlaps the sliding window
+    elapsed = now - window_start
+    estimated = previous * (window - elapsed) / window + current
+    reset = max(1, math.ceil(window - elapsed))
+    return estimated <= limit, max(0, int(limit - estimated)), reset
+
+def client_ip(request: Request):
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def _enforce(name: str, limit: int, window: int, identity: str, response: Response):
+    allowed, remaining, reset = check(f"{name}:{identity}", limit, window)
+    headers = {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(reset),
+    }
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please slow down",
+            headers={**headers, "Retry-After": str(reset)}
+        )
+    response.headers.update(headers)
+
+def rate_limit(name: str, default: str, per_user: bool = False):
+    """Dependency limiting a route to RATE_LIMIT_<NAME> requests (e.g. "10/60") per user or client IP"""
+    limit, window = parse_limit(os.getenv(f"RATE_LIMIT_{name.upper()}", default))
+
+    if per_user:
+        def dependency(response: Response, current_user: dict = Depends(get_current_user)):
+            if RATE_LIMIT_ENABLED:
+                _enforce(name, limit, window, f"user:{current_user['id']}", response)
+    else:
+        def dependency(request: Request, response: Response):
+            if RATE_LIMIT_ENABLED:
+                _enforce(name, limit, window, f"ip:{client_ip(request)}", response)
+
+    return dependency
@@ -1,29 +1,78 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, Response
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
-import hashlib
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, update, delete, and_, or_, inspect
+from typing import List, Optional
 from datetime import datetime
+import asyncio
+import base64
 
 from auth_dep import get_current_user
-from db import SessionLocal
-from models import SavedSearch, SearchResult, SavedSearchCreate, SavedSearchUpdate, SavedSearchResponse
+from db import AsyncSessionLocal, SessionLocal
+from enrichment import posting_enricher
+from events import publish_new_results
+from ingest import ingest_results, count_new_results
+from jobs import run_registry
+from migrations import legacy_results
+from rate_limit import rate_limit
+from scheduler import wake_scheduler
+from models import SavedSearch, SavedSearchResult, JobPosting, SavedSearchCreate, SavedSearchUpdate, SavedSearchResponse
 import scan
+import search_service
 
 router = APIRouter(prefix="/saved-searches", tags=["saved-searches"])
 
-def get_db():
-    db = SessionLocal()
-    try:
+MAX_RESULTS_PAGE_SIZE = 500
+TOTAL_ESTIMATE_CAP = 10000
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def new_results_count_column():
+    """Correlated COUNT of unseen results, so searches and their counts load in one query"""
+    return select(func.count()).where(
+        SavedSearchResult.saved_search_id == SavedSearch.id,
+        SavedSearchResult.is_new == True
+    ).correlate(SavedSearch).scalar_subquery().label("new_results_count")
+
+def to_response(saved_search: SavedSearch, new_results_count: int):
+    return SavedSearchResponse(
+        id=saved_search.id,
+        name=saved_search.name,
+        job_title=saved_search.job_title,
+        experience_level=saved_search.experience_level,
+        count=saved_search.count,
+        is_active=saved_search.is_active,
+        notification_email=saved_search.notification_email,
+        last_run_at=saved_search.last_run_at,
+        next_run_at=saved_search.next_run_at,
+        run_interval_minutes=saved_search.run_interval_minutes,
+        created_at=saved_search.created_at,
+        new_results_count=new_results_count or 0
+    )
+
+async def get_owned_search(db: AsyncSession, search_id: int, user_id: str):
+    """Return the saved search if the user owns it, else None"""
+    result = await db.execute(select(SavedSearch).where(
+        SavedSearch.id == search_id,
+        SavedSearch.user_id == user_id
+    ))
+    return result.scalar_one_or_none()
+
+async def get_owned_search_with_count(db: AsyncSession, search_id: int, user_id: str):
+    """Return (saved_search, new_results_count), or (None, 0) if the user doesn't own the search"""
+    result = await db.execute(select(SavedSearch, new_results_count_column()).where(
+        SavedSearch.id == search_id,
+        SavedSearch.user_id == user_id
+    ))
+    row = result.first()
+    return tuple(row) if row else (None, 0)
 
 @router.get("/", response_model=List[SavedSearchResponse])
 async def get_saved_searches(
     response: Response,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Add explicit CORS headers
     response.headers["Access-Control-Allow-Origin"] = "*"
@@ -31,41 +80,21 @@ async def get_saved_searches(
     response.headers["Access-Control-Allow-Headers"] = "*"
     
     try:
-        saved_searches = db.query(SavedSearch).filter(
+        result = await db.execute(select(SavedSearch, new_results_count_column()).where(
             SavedSearch.user_id == current_user["id"]
-        ).order_by(SavedSearch.created_at.desc()).all()
+        ).order_by(SavedSearch.created_at.desc()))
+        rows = result.all()
     except Exception as e:
         print(f"Database error in get_saved_searches: {e}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
-    result = []
-    for search in saved_searches:
-        new_count = db.query(SearchResult).filter(
-            SearchResult.saved_search_id == search.id,
-            SearchResult.is_new == True
-        ).count()
-        
-        search_dict = {
-            "id": search.id,
-            "name": search.name,
-            "job_title": search.job_title,
-            "experience_level": search.experience_level,
-            "count": search.count,
-            "is_active": search.is_active,
-            "notification_email": search.notification_email,
-            "last_run_at": search.last_run_at,
-            "created_at": search.created_at,
-            "new_results_count": new_count
-        }
-        result.append(SavedSearchResponse(**search_dict))
-    
-    return result
+    return [to_response(search, new_count) for search, new_count in rows]
 
 @router.post("/", response_model=SavedSearchResponse)
 async def create_saved_search(
     search_data: SavedSearchCreate,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
 
     saved_search = SavedSearch(
@@ -74,75 +103,40 @@ async def create_saved_search(
         job_title=search_data.job_title,
         experience_level=search_data.experience_level.value,
         count=search_data.count,
-        notification_email=search_data.notification_email
+        notification_email=search_data.notification_email,
+        run_interval_minutes=search_data.run_interval_minutes
     )
     
     db.add(saved_search)
-    db.commit()
-    db.refresh(saved_search)
-    
-    search_dict = {
-        "id": saved_search.id,
-        "name": saved_search.name,
-        "job_title": saved_search.job_title,
-        "experience_level": saved_search.experience_level,
-        "count": saved_search.count,
-        "is_active": saved_search.is_active,
-        "notification_email": saved_search.notification_email,
-        "last_run_at": saved_search.last_run_at,
-        "created_at": saved_search.created_at,
-        "new_results_count": 0
-    }
+    await db.commit()
+    await db.refresh(saved_search)
+    wake_scheduler()
     
-    return SavedSearchResponse(**search_dict)
+    return to_response(saved_search, 0)
 
 @router.get("/{search_id}", response_model=SavedSearchResponse)
 async def get_saved_search(
     search_id: int,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
 
-    saved_search = db.query(SavedSearch).filter(
-        SavedSearch.id == search_id,
-        SavedSearch.user_id == current_user["id"]
-    ).first()
+    saved_search, new_count = await get_owned_search_with_count(db, search_id, current_user["id"])
     
     if not saved_search:
         raise HTTPException(status_code=404, detail="Saved search not found")
     
-    new_count = db.query(SearchResult).filter(
-        SearchResult.saved_search_id == saved_search.id,
-        SearchResult.is_new == True
-    ).count()
-    
-    search_dict = {
-        "id": saved_search.id,
-        "name": saved_search.name,
-        "job_title": saved_search.job_title,
-        "experience_level": saved_search.experience_level,
-        "count": saved_search.count,
-        "is_active": saved_search.is_active,
-        "notification_email": saved_search.notification_email,
-        "last_run_at": saved_search.last_run_at,
-        "created_at": saved_search.created_at,
-        "new_results_count": new_count
-    }
-    
-    return SavedSearchResponse(**search_dict)
+    return to_response(saved_search, new_count)
 
 @router.put("/{search_id}", response_model=SavedSearchResponse)
 async def update_saved_search(
     search_id: int,
     search_data: SavedSearchUpdate,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
 
-    saved_search = db.query(SavedSearch).filter(
-        SavedSearch.id == search_id,
-        SavedSearch.user_id == current_user["id"]
-    ).first()
+    saved_search = await get_owned_search(db, search_id, current_user["id"])
     
     if not saved_search:
         raise HTTPException(status_code=404, detail="Saved search not found")
@@ -155,149 +149,232 @@ async def update_saved_search(
         else:
             setattr(saved_search, field, value)
     
+    # A new interval takes effect from a freshly spread first run
+    if "run_interval_minutes" in update_data:
+        saved_search.next_run_at = None
+    
     saved_search.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(saved_search)
-    
-    new_count = db.query(SearchResult).filter(
-        SearchResult.saved_search_id == saved_search.id,
-        SearchResult.is_new == True
-    ).count()
-    
-    search_dict = {
-        "id": saved_search.id,
-        "name": saved_search.name,
-        "job_title": saved_search.job_title,
-        "experience_level": saved_search.experience_level,
-        "count": saved_search.count,
-        "is_active": saved_search.is_active,
-        "notification_email": saved_search.notification_email,
-        "last_run_at": saved_search.last_run_at,
-        "created_at": saved_search.created_at,
-        "new_results_count": new_count
-    }
+    await db.commit()
+    wake_scheduler()
     
-    return SavedSearchResponse(**search_dict)
+    saved_search, new_count = await get_owned_search_with_count(db, search_id, current_user["id"])
+    return to_response(saved_search, new_count)
 
 @router.delete("/{search_id}")
 async def delete_saved_search(
     search_id: int,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
 
-    saved_search = db.query(SavedSearch).filter(
-        SavedSearch.id == search_id,
-        SavedSearch.user_id == current_user["id"]
-    ).first()
+    saved_search = await get_owned_search(db, search_id, current_user["id"])
     
     if not saved_search:
         raise HTTPException(status_code=404, detail="Saved search not found")
     
-    db.query(SearchResult).filter(SearchResult.saved_search_id == search_id).delete()
+    # Postings stay; other searches may link to them
+    await db.execute(delete(SavedSearchResult).where(SavedSearchResult.saved_search_id == search_id))
+    # Rows left in the legacy search_results table still reference the search
+    connection = await db.connection()
+    if await connection.run_sync(lambda conn: inspect(conn).has_table("search_results")):
+        await db.execute(delete(legacy_results).where(legacy_results.c.saved_search_id == search_id))
     
-    db.delete(saved_search)
-    db.commit()
+    await db.delete(saved_search)
+    await db.commit()
     
     return {"message": "Saved search deleted successfully"}
 
-@router.post("/{search_id}/run")
+def execute_saved_search_run(run):
+    """Run a saved search in a background worker: upstream search, dedupe and store"""
+    db = SessionLocal()
+    try:
+        saved_search = db.get(SavedSearch, run.saved_search_id)
+        if saved_search is None:
+            raise ValueError("Saved search no longer exists")
+        
+        query = scan.buildQuery(saved_search.job_title, saved_search.experience_level)
+        results = search_service.search(query, saved_search.count)
+        
+        new_urls = ingest_results(db, saved_search.id, results) if results else []
+        saved_search.last_run_at = datetime.utcnow()
+        db.commit()
+        
+        run.total_results = len(results) if results else 0
+        run.new_results = len(new_urls)
+        
+        if new_urls:
+            publish_new_results(
+                saved_search.user_id, saved_search.id, len(new_urls), count_new_results(db, saved_search.id)
+            )
+            posting_enricher.wake()
+    finally:
+        db.close()
+
+@router.post(
+    "/{search_id}/run",
+    status_code=202,
+    dependencies=[Depends(rate_limit("saved_search_run", "10/60", per_user=True))]
+)
 async def run_saved_search(
     search_id: int,
+    response: Response,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    saved_search = db.query(SavedSearch).filter(
-        SavedSearch.id == search_id,
-        SavedSearch.user_id == current_user["id"]
-    ).first()
+    saved_search = await get_owned_search(db, search_id, current_user["id"])
     
     if not saved_search:
         raise HTTPException(status_code=404, detail="Saved search not found")
     
+    if not scan.search_configured():
+        raise HTTPException(
+            status_code=503, 
+            detail="Search service not configured. Missing API keys or job boards."
+        )
+    
+    # Repeat clicks while a run is queued or running join that run
+    run, created = await asyncio.to_thread(run_registry.submit, search_id, current_user["id"], execute_saved_search_run)
+    response.headers["Location"] = f"{router.prefix}/{search_id}/runs/{run.id}"
+    
+    return {
+        "message": "Search queued" if created else "Search already in progress",
+        **run.to_dict()
+    }
+
+@router.get("/{search_id}/runs/{job_id}")
+async def get_saved_search_run(
+    search_id: int,
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    run = await asyncio.to_thread(run_registry.get, job_id)
+    
+    if not run or run.saved_search_id != search_id or run.user_id != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Run not found")
+    
+    return run.to_dict()
+
+def encode_cursor(result):
+    """Opaque keyset cursor pointing at a result"""
+    return base64.urlsafe_b64encode(str(result.posting_id).encode()).decode()
+
+async def decode_cursor(db: AsyncSession, search_id: int, cursor: str):
+    """Return (found_at, posting_id) for a cursor; found_at stays in SQL so it compares in the database's own format"""
     try:
-        if not scan.key or not scan.id:
-            raise HTTPException(
-                status_code=503, 
-                detail="Search service not configured. Missing API keys."
-            )
-        
-        print(f"Debug: job_title = '{saved_search.job_title}'")
-        print(f"Debug: experience_level = '{saved_search.experience_level}' (type: {type(saved_search.experience_level)})")
-        
-        query = scan.buildQuery(saved_search.job_title, saved_search.experience_level)
-        print(f"Debug: built query = '{query}'")
-        results = scan.search(query, scan.key, scan.id, saved_search.count)
-        
-        if results:
-            new_results_count = 0
-            for result_url in results:
-                result_hash = hashlib.sha256(result_url.encode()).hexdigest()
-                
-                existing = db.query(SearchResult).filter(
-                    SearchResult.saved_search_id == search_id,
-                    SearchResult.result_hash == result_hash
-                ).first()
-                
-                if not existing:
-                    new_result = SearchResult(
-                        saved_search_id=search_id,
-                        result_url=result_url,
-                        result_hash=result_hash,
-                        is_new=True
-                    )
-                    db.add(new_result)
-                    new_results_count += 1
-            
-            saved_search.last_run_at = datetime.utcnow()
-            db.commit()
-            
-            return {
-                "message": "Search completed successfully",
-                "total_results": len(results),
-                "new_results": new_results_count
-            }
-        else:
-            saved_search.last_run_at = datetime.utcnow()
-            db.commit()
-            return {
-                "message": "Search completed successfully",
-                "total_results": 0,
-                "new_results": 0
-            }
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+        posting_id = int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    row = select(SavedSearchResult.found_at).where(
+        SavedSearchResult.saved_search_id == search_id,
+        SavedSearchResult.posting_id == posting_id
+    )
+    # The posting may have been unlinked since the cursor was issued; comparing against NULL would return nothing
+    if (await db.execute(row.limit(1))).first() is None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return row.scalar_subquery(), posting_id
 
 @router.get("/{search_id}/results")
 async def get_search_results(
     search_id: int,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    new_only: bool = False
+    db: AsyncSession = Depends(get_db),
+    new_only: bool = False,
+    is_new: Optional[bool] = None,
+    found_from: Optional[datetime] = None,
+    found_to: Optional[datetime] = None,
+    company: Optional[str] = Query(None, description="Only postings whose company contains this text"),
+    location: Optional[str] = Query(None, description="Only postings whose location contains this text"),
+    limit: int = Query(50, ge=1, le=MAX_RESULTS_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor of the last result on the previous page (older results)"),
+    before: Optional[str] = Query(None, description="Cursor of the first result on the next page (newer results)"),
+    total: str = Query("none", pattern="^(none|exact|estimate)$", description="How to compute total_results")
 ):
-    saved_search = db.query(SavedSearch).filter(
-        SavedSearch.id == search_id,
-        SavedSearch.user_id == current_user["id"]
-    ).first()
+    saved_search = await get_owned_search(db, search_id, current_user["id"])
     
     if not saved_search:
         raise HTTPException(status_code=404, detail="Saved search not found")
+    if after and before:
+        raise HTTPException(status_code=400, detail="Use either after or before, not both")
     
-    query = db.query(SearchResult).filter(SearchResult.saved_search_id == search_id)
+    filtered = select(SavedSearchResult.posting_id).where(SavedSearchResult.saved_search_id == search_id)
     
     if new_only:
-        query = query.filter(SearchResult.is_new == True)
+        is_new = True
+    if is_new is not None:
+        filtered = filtered.where(SavedSearchResult.is_new == is_new)
+    if found_from:
+        filtered = filtered.where(SavedSearchResult.found_at >= found_from)
+    if found_to:
+        filtered = filtered.where(SavedSearchResult.found_at < found_to)
+    
+    # Links carry the per-search state; the URL and enriched fields come from the shared posting
+    posting_filters = []
+    if company:
+        posting_filters.append(or_(
+            JobPosting.company_name.ilike(f"%{company}%"),
+            JobPosting.company.ilike(f"%{company}%")
+        ))
+    if location:
+        posting_filters.append(JobPosting.location.ilike(f"%{location}%"))
+    if posting_filters:
+        filtered = filtered.join(JobPosting, JobPosting.id == SavedSearchResult.posting_id).where(*posting_filters)
+    query = filtered.add_columns(
+        SavedSearchResult.found_at, SavedSearchResult.is_new, JobPosting.url,
+        JobPosting.title, JobPosting.company_name, JobPosting.company, JobPosting.location, JobPosting.posted_at
+    )
+    if not posting_filters:
+        query = query.join(JobPosting, JobPosting.id == SavedSearchResult.posting_id)
+    
+    # Keyset pagination on (found_at DESC, posting_id DESC); "before" walks backwards and flips the page
+    if before:
+        found_at, posting_id = await decode_cursor(db, search_id, before)
+        query = query.where(or_(
+            SavedSearchResult.found_at > found_at,
+            and_(SavedSearchResult.found_at == found_at, SavedSearchResult.posting_id > posting_id)
+        )).order_by(SavedSearchResult.found_at.asc(), SavedSearchResult.posting_id.asc())
+    else:
+        if after:
+            found_at, posting_id = await decode_cursor(db, search_id, after)
+            query = query.where(or_(
+                SavedSearchResult.found_at < found_at,
+                and_(SavedSearchResult.found_at == found_at, SavedSearchResult.posting_id < posting_id)
+            ))
+        query = query.order_by(SavedSearchResult.found_at.desc(), SavedSearchResult.posting_id.desc())
     
-    results = query.order_by(SearchResult.found_at.desc()).all()
+    results = list((await db.execute(query.limit(limit + 1))).all())
+    has_more = len(results) > limit
+    results = results[:limit]
+    if before:
+        results.reverse()
+    
+    # A page reached through a cursor always has a neighbour on the side it came from
+    has_newer = has_more if before else bool(after)
+    has_older = bool(before) if before else has_more
+    
+    total_results = None
+    total_is_estimate = False
+    if total == "exact":
+        total_results = await db.scalar(select(func.count()).select_from(filtered.subquery()))
+    elif total == "estimate":
+        # Count at most TOTAL_ESTIMATE_CAP rows so the cost stays bounded on long histories
+        capped = filtered.limit(TOTAL_ESTIMATE_CAP).subquery()
+        total_results = await db.scalar(select(func.count()).select_from(capped))
+        total_is_estimate = total_results >= TOTAL_ESTIMATE_CAP
     
     return {
         "search_name": saved_search.name,
-        "total_results": len(results),
+        "total_results": total_results,
+        "total_is_estimate": total_is_estimate,
+        "next_cursor": encode_cursor(results[-1]) if results and has_older else None,
+        "prev_cursor": encode_cursor(results[0]) if results and has_newer else None,
         "results": [
             {
-                "id": result.id,
-                "url": result.result_url,
+                "id": result.posting_id,
+                "url": result.url,
+                "title": result.title,
+                "company": result.company_name or result.company,
+                "location": result.location,
+                "posted_at": result.posted_at,
                 "found_at": result.found_at,
                 "is_new": result.is_new
             }
@@ -309,21 +386,19 @@ async def get_search_results(
 async def mark_results_as_seen(
     search_id: int,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    saved_search = db.query(SavedSearch).filter(
-        SavedSearch.id == search_id,
-        SavedSearch.user_id == current_user["id"]
-    ).first()
+    saved_search = await get_owned_search(db, search_id, current_user["id"])
     
     if not saved_search:
         raise HTTPException(status_code=404, detail="Saved search not found")
     
-    updated_count = db.query(SearchResult).filter(
-        SearchResult.saved_search_id == search_id,
-        SearchResult.is_new == True
-    ).update({"is_new": False})
+    result = await db.execute(update(SavedSearchResult).where(
+        SavedSearchResult.saved_search_id == search_id,
+        SavedSearchResult.is_new == True
+    ).values(is_new=False))
+    updated_count = result.rowcount
     
-    db.commit()
+    await db.commit()
     
     return {"message": f"Marked {updated_count} results as seen"}
@@ -1,7 +1,12 @@
 from googleapiclient.discovery import build
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qs
+import httplib2
 import os
+import re
+import threading
 import time
 
 
@@ -13,20 +18,255 @@ wait = 30
 run = True
 role = "product analyst"
 
-def search(query: str, key: str, id: str, num: int):
-    service = build("customsearch", "v1", developerKey=key)
-    res = service.cse().list(q=query, cx=id, num=num, sort="date:d:s").execute()
+# Where scan.search gets links from: cse (Google Custom Search) or boards (the local
+# store of ATS board listings kept up to date by boards.py)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "cse").lower()
 
-    if "items" not in res:
+# Search client configuration
+STATIC_DISCOVERY = os.getenv("CSE_STATIC_DISCOVERY", "true").lower() == "true"
+API_ENDPOINT = os.getenv("CSE_API_ENDPOINT")  # e.g. http://127.0.0.1:8081/ for a local stand-in
+HTTP_TIMEOUT = float(os.getenv("CSE_HTTP_TIMEOUT", "15"))
+
+# The API returns at most 10 results per page and no results past position 100
+PAGE_SIZE = 10
+MAX_RESULTS = 100
+PAGE_WORKERS = int(os.getenv("CSE_PAGE_WORKERS", "10"))
+
+# Query parameters that only track where a click came from
+TRACKING_PARAM_PREFIXES = ("utm_", "lever-")
+TRACKING_PARAMS = {"gh_src"}
+# Click tracking on the ATS hosts; on other sites these can select the page, so they stay
+ATS_TRACKING_PARAMS = {"source", "ref"}
+ATS_HOSTS = ("lever.co", "greenhouse.io", "ashbyhq.com")
+_ATS_SUBDOMAINS = tuple("." + domain for domain in ATS_HOSTS)
+
+_UUID = r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+# Lever and Ashby posting paths: /<company>/<uuid>[/apply or /application]
+_UUID_PATH = re.compile(rf"^/([^/]+)/({_UUID})(?:/|$)", re.I)
+_GREENHOUSE_PATH = re.compile(r"^/([^/]+)/jobs/(\d+)(?:/|$)")
+
+_backend = None
+_backend_lock = threading.Lock()
+_services = {}
+_services_lock = threading.Lock()
+_local = threading.local()
+_page_executor = None
+_page_executor_lock = threading.Lock()
+
+def get_service(key: str):
+    """Get the shared Custom Search service for an API key, building it once per process"""
+    service = _services.get(key)
+    if service is not None:
+        return service
+
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            client_options = {"api_endpoint": API_ENDPOINT} if API_ENDPOINT else None
+            # The discovery document is bundled with google-api-python-client, so
+            # static discovery never needs a network fetch at startup
+            service = build(
+                "customsearch",
+                "v1",
+                developerKey=key,
+                static_discovery=STATIC_DISCOVERY,
+                cache_discovery=False,
+                client_options=client_options,
+            )
+            _services[key] = service
+    return service
+
+def _get_http():
+    """Get this thread's keep-alive HTTP connection pool (httplib2 is not thread safe)"""
+    http = getattr(_local, "http", None)
+    if http is None:
+        http = httplib2.Http(timeout=HTTP_TIMEOUT)
+        _local.http = http
+    return http
+
+def _get_page_executor():
+    """Get the shared worker pool used to fetch result pages concurrently"""
+    global _page_executor
+    if _page_executor is None:
+        with _page_executor_lock:
+            if _page_executor is None:
+                _page_executor = ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix="cse-page")
+    return _page_executor
+
+def _page_starts(num: int):
+    """Split a request for num results into (start, page_size) pairs"""
+    num = min(num, MAX_RESULTS)
+    return [(start, min(PAGE_SIZE, num - start + 1)) for start in range(1, num + 1, PAGE_SIZE)]
+
+def fetch_page(query: str, key: str, id: str, start: int, num: int):
+    """Fetch a single page of result links"""
+    service = get_service(key)
+    res = service.cse().list(q=query, cx=id, num=num, start=start, sort="date:d:s").execute(http=_get_http())
+    return [item['link'] for item in res.get("items", [])]
+
+class SearchBackend:
+    """A source of job links for scan.search"""
+
+    name = None
+    # Whether calls count against the Custom Search quota (see quota.py)
+    uses_quota = False
+
+    def configured(self):
+        return True
+
+    def search(self, query: str, num: int):
+        """Return up to num job links for a buildQuery() query, best first"""
+        raise NotImplementedError
+
+class CustomSearchBackend(SearchBackend):
+    """Google Custom Search, restricted to the ATS hosts by buildQuery"""
+
+    name = "cse"
+    uses_quota = True
+
+    def configured(self):
+        return bool(key and id)
+
+    def search(self, query: str, num: int):
+        return custom_search(query, key, id, num)
+
+def get_backend():
+    """The process's search backend, chosen by SEARCH_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if SEARCH_BACKEND == "boards":
+                    # boards imports this module, so it is only loaded when selected
+                    from boards import BoardSearchBackend
+                    _backend = BoardSearchBackend()
+                else:
+                    if SEARCH_BACKEND != "cse":
+                        print(f"Unknown SEARCH_BACKEND '{SEARCH_BACKEND}', using cse")
+                    _backend = CustomSearchBackend()
+    return _backend
+
+def search_configured():
+    """Whether the search backend has what it needs (API keys, boards) to run"""
+    return get_backend().configured()
+
+def custom_search(query: str, key: str, id: str, num: int):
+    """Fetch up to num result links from Custom Search, in rank order"""
+    pages = _page_starts(num)
+    # Pages requested upstream; search_service reads this back to refund the quota for the rest
+    _local.pages_fetched = len(pages)
+
+    if len(pages) == 1:
+        page_results = [fetch_page(query, key, id, *pages[0])]
+    else:
+        executor = _get_page_executor()
+        futures = [executor.submit(fetch_page, query, key, id, start, size) for start, size in pages]
+
+        # Collect pages in rank order; a short page means there is nothing after it
+        page_results = []
+        for (start, size), future in zip(pages, futures):
+            links = future.result()
+            page_results.append(links)
+            if len(links) < size:
+                for pending in futures[len(page_results):]:
+                    if pending.cancel():
+                        _local.pages_fetched -= 1
+                break
+
+    return [link for links in page_results for link in links]
+
+def pages_fetched():
+    """Pages the last custom_search on this thread requested upstream, or None; reading clears it"""
+    pages = getattr(_local, "pages_fetched", None)
+    _local.pages_fetched = None
+    return pages
+
+def search(query: str, num: int):
+    """Search the configured backend; returns canonical URLs in rank order, or None if nothing matched"""
+    # Variants of one posting (apply pages, tracking parameters, board hosts) collapse to its canonical URL
+    results = []
+    seen = set()
+    for link in get_backend().search(query, num):
+        canonical, key = canonicalize_url(link)
+        identity = key or canonical
+        if identity not in seen:
+            seen.add(identity)
+            results.append(canonical)
+
+    if not results:
         print("no results")
         return
-    
-    results = []
-    for item in res["items"]:
-        results.append(item['link'])
 
     return results
 
+def _on_domain(host: str, domain: str):
+    """Whether host is domain or one of its subdomains (notlever.co isn't lever.co)"""
+    return host == domain or host.endswith("." + domain)
+
+def canonicalize_url(url: str):
+    """Return (canonical URL, (ats, company, job_id) or None) for a job link.
+
+    Variants of the same Lever, Greenhouse or Ashby posting share one key and
+    one canonical URL, e.g.
+        https://jobs.lever.co/Acme/<uuid>/apply?lever-source=x -> https://jobs.lever.co/acme/<uuid>
+        https://boards.greenhouse.io/acme/jobs/123?gh_jid=123  -> https://job-boards.greenhouse.io/acme/jobs/123
+        https://boards.greenhouse.io/embed/job_app?for=acme&token=123 (same)
+        https://jobs.ashbyhq.com/acme/<uuid>/application       -> https://jobs.ashbyhq.com/acme/<uuid>
+    Greenhouse embed links without ?for= get no key. Other links only lose
+    tracking parameters, the fragment and any trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path
+
+    if _on_domain(host, "lever.co"):
+        match = _UUID_PATH.match(path)
+        if match:
+            company, job_id = match.group(1).lower(), match.group(2).lower()
+            region = "jobs.eu.lever.co" if ".eu." in host else "jobs.lever.co"
+            return f"https://{region}/{company}/{job_id}", ("lever", company, job_id)
+    elif _on_domain(host, "greenhouse.io"):
+        match = _GREENHOUSE_PATH.match(path)
+        if match:
+            company, job_id = match.group(1).lower(), match.group(2)
+        else:
+            params = parse_qs(parts.query)
+            if params.get("for"):
+                company = params["for"][0].lower()
+            elif path.startswith("/embed/"):
+                # Embed links only name the board in ?for=; "embed" isn't a company
+                company = None
+            else:
+                company = path.strip("/").split("/")[0].lower()
+            job_id = (params.get("token") or params.get("gh_jid") or [None])[0]
+        if company and job_id and job_id.isdigit():
+            region = "job-boards.eu.greenhouse.io" if ".eu." in host else "job-boards.greenhouse.io"
+            return f"https://{region}/{company}/jobs/{job_id}", ("greenhouse", company, job_id)
+    elif _on_domain(host, "ashbyhq.com"):
+        match = _UUID_PATH.match(path)
+        if match:
+            company, job_id = match.group(1).lower(), match.group(2).lower()
+            return f"https://jobs.ashbyhq.com/{company}/{job_id}", ("ashby", company, job_id)
+
+    ats_host = host in ATS_HOSTS or host.endswith(_ATS_SUBDOMAINS)
+    kept = []
+    for param in parts.query.split("&"):
+        name = param.split("=", 1)[0].lower()
+        if not param or name.startswith(TRACKING_PARAM_PREFIXES) or name in TRACKING_PARAMS:
+            continue
+        if ats_host and name in ATS_TRACKING_PARAMS:
+            continue
+        kept.append(param)
+    query = "&".join(kept)
+    return urlunsplit(((parts.scheme or "https").lower(), host, path.rstrip("/") or "/", query, "")), None
+
+def posting_identity(url: str):
+    """Dedupe identity of a job link: "ats:company:job_id", or the canonical URL for unrecognised hosts"""
+    canonical, key = canonicalize_url(url)
+    return ":".join(key) if key else canonical
+
 def buildQuery(position: str, level: str):
         q = f'site:lever.co OR site:greenhouse.io OR site:ashbyhq.com {position} {level}'
         print(q)
@@ -1,36 +1,112 @@
 import asyncio
-import schedule
+import signal
+import socket
 import time
 import threading
-from datetime import datetime, timedelta
+import uuid
+from concurrent.futures import wait, FIRST_COMPLETED
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-import hashlib
-import smtplib
-try:
-    from email.mime.text import MimeText
-    from email.mime.multipart import MimeMultipart
-except ImportError:
-    # Fallback for Python 3.13+ or other import issues
-    import email.mime.text as mime_text
-    import email.mime.multipart as mime_multipart
-    MimeText = mime_text.MIMEText
-    MimeMultipart = mime_multipart.MIMEMultipart
+from sqlalchemy import func, select, update, case, and_, or_
 import os
 import logging
 
-from db import SessionLocal
-from models import SavedSearch, SearchResult
+from db import SessionLocal, engine
+from events import publish_new_results, EVENTS_BACKEND
+from ingest import ingest_results, count_new_results
+from seen_filter import seen_filter
+from jobs import worker_pool, SCHEDULED_PRIORITY, WORKER_POOL_SIZE
+from models import SavedSearch, SavedSearchResult
+from notifications import enqueue_notification, notification_sender
+from enrichment import posting_enricher
+from boards import board_syncer
 import scan
+import search_service
+from quota import quota_limiter, pages_for, QuotaExceeded, SCHEDULED
+from search_cache import normalize_query
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Window used to rank searches by how many new results they have been finding
+YIELD_WINDOW_DAYS = int(os.getenv("SCHEDULER_YIELD_WINDOW_DAYS", "7"))
+
+# Sweep execution; queries run on the worker pool shared with on-demand runs (WORKER_POOL_SIZE)
+SEARCH_TIMEOUT_SECONDS = float(os.getenv("SCHEDULER_SEARCH_TIMEOUT_SECONDS", "120"))
+SWEEP_OVERLAP = os.getenv("SCHEDULER_SWEEP_OVERLAP", "skip").lower()  # skip or queue
+SWEEP_INTERVAL_MINUTES = int(os.getenv("SCHEDULER_INTERVAL_MINUTES", "30"))
+
+# Each search runs on its own clock: every SWEEP_INTERVAL_MINUTES to start with, more often while it
+# keeps finding new results and backing off while it doesn't, unless it sets run_interval_minutes
+MIN_INTERVAL_MINUTES = int(os.getenv("SCHEDULER_MIN_INTERVAL_MINUTES", "10"))
+MAX_INTERVAL_MINUTES = int(os.getenv("SCHEDULER_MAX_INTERVAL_MINUTES", "1440"))
+# Upper bound on how long the scheduler sleeps, so searches changed by other processes are picked up
+MAX_SLEEP_SECONDS = float(os.getenv("SCHEDULER_MAX_SLEEP_SECONDS", "300"))
+
+# Sweeps read and lease searches this many rows at a time, committing between chunks
+CHUNK_SIZE = int(os.getenv("SCHEDULER_CHUNK_SIZE", "1000"))
+# Groups handed to the worker pool at once; the rest wait their turn in the sweep
+MAX_IN_FLIGHT = int(os.getenv("SCHEDULER_MAX_IN_FLIGHT", str(WORKER_POOL_SIZE * 4)))
+
+# Set to false when the scheduler runs as its own process (python -m scheduler); only honoured
+# when the worker can share the web tier's database and events (see worker_setup_problems)
+RUN_IN_WEB = os.getenv("SCHEDULER_IN_WEB", "true").lower() == "true"
+
+# Searches are leased to one worker per sweep so several worker replicas can share the load
+WORKER_ID = os.getenv("SCHEDULER_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", str(SWEEP_INTERVAL_MINUTES * 60)))
+
+# Columns a sweep needs to group and plan searches, read without loading ORM objects
+SWEEP_COLUMNS = (
+    SavedSearch.id,
+    SavedSearch.job_title,
+    SavedSearch.experience_level,
+    SavedSearch.count,
+    SavedSearch.last_run_at,
+)
+
+# Golden-ratio steps place consecutive search ids evenly across an interval
+SPREAD_STEP = (5 ** 0.5 - 1) / 2
+
+def spread_offset(search_id: int):
+    """Fraction of an interval into which a search's first run falls"""
+    return (search_id * SPREAD_STEP) % 1
+
+def next_interval(saved_search: SavedSearch):
+    """Minutes until a search runs again, given its empty_runs streak"""
+    if saved_search.run_interval_minutes:
+        return max(MIN_INTERVAL_MINUTES, saved_search.run_interval_minutes)
+    if saved_search.empty_runs is None:
+        return SWEEP_INTERVAL_MINUTES
+    if saved_search.empty_runs == 0:
+        return max(MIN_INTERVAL_MINUTES, SWEEP_INTERVAL_MINUTES // 2)
+    return min(MAX_INTERVAL_MINUTES, SWEEP_INTERVAL_MINUTES * 2 ** min(saved_search.empty_runs - 1, 16))
+
+def reschedule(saved_search: SavedSearch, new_results: int):
+    """Set a search's next run after a scheduled run that found new_results"""
+    saved_search.empty_runs = 0 if new_results > 0 else (saved_search.empty_runs or 0) + 1
+    saved_search.next_run_at = datetime.utcnow() + timedelta(minutes=next_interval(saved_search))
+
+def as_utc(value: datetime):
+    """Naive UTC datetime, whether the database returned an aware or naive value"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 class SearchScheduler:
     def __init__(self):
         self.running = False
         self.thread = None
+        self.last_sweep = None
+        self.current_sweep = None
+        self.sweep_lock = threading.Lock()
+        self.state_lock = threading.Lock()
+        self.sweep_queued = False
+        self.next_run_at = None  # Earliest next_run_at among searches not leased to a worker
+        self.queued_searches = 0
+        self.overrun = set()  # Futures of timed-out groups still running on the worker pool
+        self.wakeup = threading.Event()
 
     def get_db(self):
         """Get database session"""
@@ -40,172 +116,428 @@ class SearchScheduler:
         finally:
             pass  # Don't close here, close in the calling function
 
-    def run_all_active_searches(self):
-        """Run all active saved searches"""
+    def run_all_active_searches(self, due_only: bool = True):
+        """Run active saved searches, one upstream query per distinct search.
+
+        With due_only, only searches whose next_run_at has passed run (plus
+        same-query searches due soon, which share their upstream call).
+        """
+        # Only one sweep runs at a time; an overlapping trigger is skipped or queued behind it
+        if SWEEP_OVERLAP == "queue":
+            with self.state_lock:
+                if self.sweep_queued:
+                    logger.warning("A sweep is already queued, skipping this trigger")
+                    return {"skipped": True, "reason": "sweep already queued"}
+                self.sweep_queued = True
+            self.sweep_lock.acquire()
+            with self.state_lock:
+                self.sweep_queued = False
+        elif not self.sweep_lock.acquire(blocking=False):
+            logger.warning("Previous sweep still running, skipping this trigger")
+            return {"skipped": True, "reason": "sweep already running"}
+        
+        try:
+            return self._run_sweep(due_only)
+        finally:
+            self.sweep_lock.release()
+
+    def _run_sweep(self, due_only: bool):
+        started = time.monotonic()
+        summary = {
+            "started_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+            "duration_seconds": None,
+            "worker_id": WORKER_ID,
+            "searches": 0,
+            "groups": 0,
+            "planned_groups": 0,
+            "started": 0,
+            "done": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "new_results": 0,
+        }
+        self.current_sweep = summary
+        
+        lease = f"{WORKER_ID}:{uuid.uuid4().hex}"
         db = self.get_db()
         try:
             logger.info("Starting scheduled search run...")
             
-            # Get all active saved searches
-            active_searches = db.query(SavedSearch).filter(
-                SavedSearch.is_active == True
-            ).all()
+            # Lease the active searches no other worker is running
+            claimed = self.claim_searches(db, lease, due_only)
             
-            logger.info(f"Found {len(active_searches)} active saved searches")
+            # Searches for the same job title and level share one upstream query
+            groups = self.group_searches(claimed)
+            summary["searches"] = len(claimed)
+            summary["groups"] = len(groups)
+            logger.info(f"Found {len(claimed)} active saved searches in {len(groups)} distinct queries")
             
-            for saved_search in active_searches:
-                try:
-                    self.run_single_search(db, saved_search)
-                except Exception as e:
-                    logger.error(f"Error running search {saved_search.id}: {str(e)}")
-                    continue
+            planned = self.plan_sweep(db, groups)
+            summary["planned_groups"] = len(planned)
             
-            logger.info("Completed scheduled search run")
+            # Hand back searches that won't run this sweep
+            planned_ids = {s.id for _, members in planned for s in members}
+            self.release_searches([s.id for s in claimed if s.id not in planned_ids], lease)
             
+            # Workers load their own copies of the searches in their own sessions
+            work = [(query, [s.id for s in members]) for query, members in planned]
+            del claimed, groups, planned
         except Exception as e:
             logger.error(f"Error in run_all_active_searches: {str(e)}")
+            work = []
         finally:
             db.close()
+        
+        self.execute_groups(work, summary, lease)
+        
+        summary["finished_at"] = datetime.utcnow().isoformat()
+        summary["duration_seconds"] = round(time.monotonic() - started, 3)
+        logger.info(f"Completed scheduled search run: {summary}")
+        self.current_sweep = None
+        self.last_sweep = summary
+        return summary
 
-    def run_single_search(self, db: Session, saved_search: SavedSearch):
-        """Run a single saved search and store results"""
-        try:
-            # Check if API keys are configured
-            if not scan.key or not scan.id:
-                logger.warning(f"Search service not configured for search {saved_search.id}")
-                return
-            
-            logger.info(f"Running search: {saved_search.name} (ID: {saved_search.id})")
-            
-            # Build and run the search
-            query = scan.buildQuery(saved_search.job_title, saved_search.experience_level)
-            results = scan.search(query, scan.key, scan.id, saved_search.count)
+    def claim_searches(self, db: Session, lease: str, due_only: bool):
+        """Lease unleased active searches to this sweep.
+
+        Returns lightweight rows (SWEEP_COLUMNS) rather than ORM objects, so a
+        sweep over many searches doesn't fill a session's identity map.
+        """
+        now = datetime.utcnow()
+        unleased = and_(
+            SavedSearch.is_active == True,
+            or_(SavedSearch.lease_expires_at == None, SavedSearch.lease_expires_at < now)
+        )
+        if not due_only:
+            self._claim(db, lease, unleased, now)
+        else:
+            self._claim(db, lease, and_(unleased, SavedSearch.next_run_at <= now), now)
             
-            if results:
-                new_results_count = 0
-                new_result_urls = []
-                
-                for result_url in results:
-                    # Create hash for deduplication
-                    result_hash = hashlib.sha256(result_url.encode()).hexdigest()
-                    
-                    # Check if this result already exists
-                    existing = db.query(SearchResult).filter(
-                        and_(
-                            SearchResult.saved_search_id == saved_search.id,
-                            SearchResult.result_hash == result_hash
-                        )
-                    ).first()
-                    
-                    if not existing:
-                        new_result = SearchResult(
-                            saved_search_id=saved_search.id,
-                            result_url=result_url,
-                            result_hash=result_hash,
-                            is_new=True
+            # Searches sharing a query with a due one ride along if they're due within half an
+            # interval anyway, so the group keeps making a single upstream call
+            queries = {
+                normalize_query(scan.buildQuery(row.job_title, row.experience_level))
+                for row in self.iter_searches(db, SavedSearch.lease_owner == lease)
+            }
+            soon = and_(unleased, SavedSearch.next_run_at <= now + timedelta(minutes=SWEEP_INTERVAL_MINUTES / 2))
+            riders = [
+                row.id for row in self.iter_searches(db, soon)
+                if normalize_query(scan.buildQuery(row.job_title, row.experience_level)) in queries
+            ]
+            for start in range(0, len(riders), CHUNK_SIZE):
+                chunk = riders[start:start + CHUNK_SIZE]
+                self._claim(db, lease, and_(unleased, SavedSearch.id.in_(chunk)), now)
+        
+        return list(self.iter_searches(db, SavedSearch.lease_owner == lease))
+
+    def _claim(self, db: Session, lease: str, condition, now: datetime):
+        """Lease rows matching condition in id-ordered chunks, committing each so row locks are held briefly"""
+        last_id = 0
+        while True:
+            # Rows another worker is claiming at the same moment are skipped rather than waited on;
+            # the repeated condition keeps the claim safe on databases without row locks (SQLite)
+            ids = db.execute(
+                select(SavedSearch.id)
+                .where(condition, SavedSearch.id > last_id)
+                .order_by(SavedSearch.id)
+                .limit(CHUNK_SIZE)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not ids:
+                return
+            db.execute(
+                update(SavedSearch)
+                .where(SavedSearch.id.in_(ids), condition)
+                .values(lease_owner=lease, lease_expires_at=now + timedelta(seconds=LEASE_SECONDS)),
+                execution_options={"synchronize_session": False}
+            )
+            db.commit()
+            last_id = ids[-1]
+
+    def iter_searches(self, db: Session, condition):
+        """Yield SWEEP_COLUMNS rows matching condition in id-ordered chunks, ending the read transaction between chunks"""
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(*SWEEP_COLUMNS)
+                .where(condition, SavedSearch.id > last_id)
+                .order_by(SavedSearch.id)
+                .limit(CHUNK_SIZE)
+            ).all()
+            db.commit()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1].id
+
+    def release_searches(self, search_ids: list, lease: str):
+        """Give up this sweep's lease on the given searches.
+
+        Searches that are still due (skipped for quota, or failed before being
+        rescheduled) are retried an interval later instead of straight away.
+        """
+        if not search_ids:
+            return
+        now = datetime.utcnow()
+        retry_at = now + timedelta(minutes=SWEEP_INTERVAL_MINUTES)
+        db = self.get_db()
+        try:
+            for start in range(0, len(search_ids), CHUNK_SIZE):
+                db.execute(
+                    update(SavedSearch)
+                    .where(SavedSearch.id.in_(search_ids[start:start + CHUNK_SIZE]), SavedSearch.lease_owner == lease)
+                    .values(
+                        lease_owner=None,
+                        lease_expires_at=None,
+                        next_run_at=case(
+                            (or_(SavedSearch.next_run_at == None, SavedSearch.next_run_at <= now), retry_at),
+                            else_=SavedSearch.next_run_at
                         )
-                        db.add(new_result)
-                        new_results_count += 1
-                        new_result_urls.append(result_url)
-                
-                # Update last run time
-                saved_search.last_run_at = datetime.utcnow()
+                    ),
+                    execution_options={"synchronize_session": False}
+                )
                 db.commit()
+        except Exception as e:
+            logger.error(f"Failed to release leases on searches {search_ids}: {str(e)}")
+        finally:
+            db.close()
+
+    def execute_groups(self, work: list, summary: dict, lease: str = None):
+        """Run (query, search ids) groups on the shared worker pool, enforcing the per-search timeout"""
+        if not work:
+            return
+        
+        started_at = {}
+        
+        def run_group(query, search_ids):
+            with self.state_lock:
+                started_at[query] = time.monotonic()
+                summary["started"] += 1
+            db = self.get_db()
+            try:
+                members = db.query(SavedSearch).filter(SavedSearch.id.in_(search_ids)).all()
+                return self.run_search_group(db, query, members)
+            finally:
+                db.close()
+                if lease:
+                    self.release_searches(search_ids, lease)
+        
+        # Keep a bounded number of groups queued on the pool rather than one future per group
+        remaining = iter(work)
+        pending = {}
+        
+        def submit_more():
+            # Groups that ran past the timeout still hold a pool thread, so they count until they finish
+            with self.state_lock:
+                self.overrun = {future for future in self.overrun if not future.done()}
+                in_flight = len(pending) + len(self.overrun)
+            while in_flight < max(MAX_IN_FLIGHT, 1):
+                group = next(remaining, None)
+                if group is None:
+                    return False
+                query, ids = group
+                pending[worker_pool.submit(run_group, query, ids, priority=SCHEDULED_PRIORITY)] = query
+                in_flight += 1
+            return True
+        
+        try:
+            more = submit_more()
+            while pending or more:
+                with self.state_lock:
+                    overrun = set(self.overrun)
+                done, _ = wait(set(pending) | overrun, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    query = pending.pop(future, None)
+                    if query is None:
+                        continue
+                    started_at.pop(query, None)
+                    try:
+                        new_results = future.result()
+                        with self.state_lock:
+                            summary["done"] += 1
+                            summary["new_results"] += new_results
+                    except Exception as e:
+                        with self.state_lock:
+                            summary["failed"] += 1
+                        logger.error(f"Error running query '{query}': {str(e)}")
                 
-                logger.info(f"Search {saved_search.id} completed: {len(results)} total, {new_results_count} new")
-                
-                # Send notification if there are new results and email is configured
-                if new_results_count > 0 and saved_search.notification_email:
-                    self.send_notification(saved_search, new_results_count, new_result_urls)
-                    
-            else:
-                # Update last run time even if no results
-                saved_search.last_run_at = datetime.utcnow()
-                db.commit()
-                logger.info(f"Search {saved_search.id} completed: 0 results")
+                # Stop waiting on searches that have run past the timeout; their threads finish in the background
+                now = time.monotonic()
+                for future, query in list(pending.items()):
+                    if query in started_at and now - started_at[query] > SEARCH_TIMEOUT_SECONDS:
+                        pending.pop(future)
+                        with self.state_lock:
+                            self.overrun.add(future)
+                            summary["timed_out"] += 1
+                        logger.error(f"Query '{query}' timed out after {SEARCH_TIMEOUT_SECONDS}s")
                 
+                more = submit_more()
+        finally:
+            # Drop anything still queued if the sweep is interrupted
+            for future in pending:
+                future.cancel()
+
+    def group_searches(self, searches: list):
+        """Group searches by normalized upstream query, as (query, members) pairs"""
+        groups = {}
+        for saved_search in searches:
+            query = scan.buildQuery(saved_search.job_title, saved_search.experience_level)
+            groups.setdefault(normalize_query(query), (query, []))[1].append(saved_search)
+        return list(groups.values())
+
+    def plan_sweep(self, db: Session, groups: list):
+        """Fit a sweep into the remaining scheduled quota, dropping the lowest-yield queries first"""
+        if not scan.get_backend().uses_quota:
+            return groups
+        budget = quota_limiter.remaining(SCHEDULED)
+        costs = [pages_for(max(s.count for s in members)) for _, members in groups]
+        total_cost = sum(costs)
+        if total_cost <= budget:
+            return groups
+        
+        # New results found per upstream call over the recent window
+        since = datetime.utcnow() - timedelta(days=YIELD_WINDOW_DAYS)
+        found = dict(db.query(SavedSearchResult.saved_search_id, func.count()).filter(
+            SavedSearchResult.found_at >= since
+        ).group_by(SavedSearchResult.saved_search_id).all())
+        
+        def yield_score(item):
+            (_, members), cost = item
+            # Searches that have never run haven't had a chance to prove themselves yet
+            if any(s.last_run_at is None for s in members):
+                return float("inf")
+            return sum(found.get(s.id, 0) for s in members) / cost
+        
+        planned = []
+        for group, cost in sorted(zip(groups, costs), key=yield_score, reverse=True):
+            if cost <= budget:
+                planned.append(group)
+                budget -= cost
+        
+        logger.warning(
+            f"Quota allows {len(planned)} of {len(groups)} queries this sweep "
+            f"({total_cost} calls needed, {quota_limiter.remaining(SCHEDULED)} left today)"
+        )
+        return planned
+
+    def run_search_group(self, db: Session, query: str, members: list):
+        """Run one upstream query at the largest count in the group and fan the results out to every member"""
+        # Check if API keys are configured
+        if not scan.search_configured():
+            logger.warning(f"Search service not configured for query '{query}'")
+            return 0
+        
+        count = max(s.count for s in members)
+        logger.info(f"Running query '{query}' for {len(members)} saved search(es)")
+        
+        try:
+            results = search_service.search(query, count, SCHEDULED)
+        except QuotaExceeded as e:
+            # Leave last_run_at alone so the searches are picked up again once quota is available
+            logger.warning(f"Skipping query '{query}': {str(e)}")
+            return 0
         except Exception as e:
-            logger.error(f"Error running search {saved_search.id}: {str(e)}")
+            logger.error(f"Error running query '{query}': {str(e)}")
             # Still update last run time to avoid repeated failures
-            saved_search.last_run_at = datetime.utcnow()
+            for saved_search in members:
+                saved_search.last_run_at = datetime.utcnow()
             db.commit()
+            raise
+        
+        # Results are in rank order, so each member gets what a query at its own count would return
+        new_total = 0
+        for saved_search in members:
+            new_total += self.store_results(db, saved_search, results[:saved_search.count])
+        return new_total
 
-    def send_notification(self, saved_search: SavedSearch, new_count: int, new_urls: list):
-        """Send email notification for new results"""
+    def store_results(self, db: Session, saved_search: SavedSearch, results: list):
+        """Store new results for a saved search, notify, and return how many were new"""
+        search_id = saved_search.id
         try:
-            # Email configuration from environment variables
-            smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-            smtp_port = int(os.getenv("SMTP_PORT", "587"))
-            smtp_username = os.getenv("SMTP_USERNAME")
-            smtp_password = os.getenv("SMTP_PASSWORD")
-            from_email = os.getenv("FROM_EMAIL", smtp_username)
-            
-            if not smtp_username or not smtp_password:
-                logger.warning("SMTP credentials not configured, skipping email notification")
-                return
+            new_result_urls = ingest_results(db, search_id, results)
+            new_results_count = len(new_result_urls)
             
-            # Create email content
-            subject = f"New Job Results: {saved_search.name}"
+            # Update last run time even if no results
+            saved_search.last_run_at = datetime.utcnow()
+            reschedule(saved_search, new_results_count)
             
-            # Create HTML email body
-            html_body = f"""
-            <html>
-            <body>
-                <h2>New Job Search Results</h2>
-                <p>Your saved search "<strong>{saved_search.name}</strong>" found {new_count} new job posting(s):</p>
-                
-                <h3>Search Details:</h3>
-                <ul>
-                    <li><strong>Job Title:</strong> {saved_search.job_title}</li>
-                    <li><strong>Experience Level:</strong> {saved_search.experience_level}</li>
-                    <li><strong>Results Count:</strong> {saved_search.count}</li>
-                </ul>
-                
-                <h3>New Results:</h3>
-                <ul>
-            """
+            # The email is queued in the same transaction as the results and sent by the notification sender
+            if new_results_count > 0:
+                enqueue_notification(db, saved_search, new_result_urls)
+            db.commit()
             
-            # Add up to 10 new URLs to the email
-            for url in new_urls[:10]:
-                html_body += f'<li><a href="{url}" target="_blank">{url}</a></li>'
+            logger.info(f"Search {saved_search.id} completed: {len(results)} total, {new_results_count} new")
             
-            if len(new_urls) > 10:
-                html_body += f"<li><em>...and {len(new_urls) - 10} more results</em></li>"
+            if new_results_count > 0:
+                publish_new_results(
+                    saved_search.user_id, search_id, new_results_count, count_new_results(db, search_id)
+                )
+                posting_enricher.wake()
             
-            html_body += """
-                </ul>
-                
-                <p>
-                    <a href="https://your-app-url.netlify.app" target="_blank">View all results in your dashboard</a>
-                </p>
+            return new_results_count
                 
-                <hr>
-                <p><small>This is an automated notification from your Job Search App. 
-                To stop receiving these notifications, update your saved search settings.</small></p>
-            </body>
-            </html>
-            """
-            
-            # Create email message
-            msg = MimeMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = from_email
-            msg['To'] = saved_search.notification_email
-            
-            # Add HTML part
-            html_part = MimeText(html_body, 'html')
-            msg.attach(html_part)
-            
-            # Send email
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(smtp_username, smtp_password)
-                server.send_message(msg)
-            
-            logger.info(f"Email notification sent to {saved_search.notification_email} for search {saved_search.id}")
-            
         except Exception as e:
-            logger.error(f"Failed to send email notification: {str(e)}")
+            logger.error(f"Error storing results for search {search_id}: {str(e)}")
+            db.rollback()
+            return 0
+
+    def assign_first_runs(self, db: Session):
+        """Spread the first runs of searches that have never been scheduled across their interval"""
+        now = datetime.utcnow()
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(SavedSearch.id, SavedSearch.run_interval_minutes)
+                .where(SavedSearch.next_run_at == None, SavedSearch.id > last_id)
+                .order_by(SavedSearch.id)
+                .limit(CHUNK_SIZE)
+            ).all()
+            if not rows:
+                db.commit()
+                return
+            # Another process may have scheduled some of these since they were read; leave those alone
+            db.execute(
+                update(SavedSearch)
+                .where(SavedSearch.next_run_at == None)
+                .execution_options(synchronize_session=None),
+                [
+                    {
+                        "id": row.id,
+                        "next_run_at": now + timedelta(
+                            minutes=(row.run_interval_minutes or SWEEP_INTERVAL_MINUTES) * spread_offset(row.id)
+                        ),
+                    }
+                    for row in rows
+                ]
+            )
+            db.commit()
+            last_id = rows[-1].id
+
+    def refresh_next_run(self):
+        """Read the earliest upcoming run from the database"""
+        db = self.get_db()
+        try:
+            self.assign_first_runs(db)
+            now = datetime.utcnow()
+            next_run_at, queued = db.query(func.min(SavedSearch.next_run_at), func.count(SavedSearch.id)).filter(
+                SavedSearch.is_active == True,
+                or_(SavedSearch.lease_expires_at == None, SavedSearch.lease_expires_at < now)
+            ).one()
+        finally:
+            db.close()
+        
+        with self.state_lock:
+            self.next_run_at = as_utc(next_run_at) if next_run_at else None
+            self.queued_searches = queued
+
+    def seconds_until_next_run(self):
+        with self.state_lock:
+            next_run_at = self.next_run_at
+        if next_run_at is None:
+            return MAX_SLEEP_SECONDS
+        delay = (next_run_at - datetime.utcnow()).total_seconds()
+        return min(max(delay, 0), MAX_SLEEP_SECONDS)
 
     def start_scheduler(self):
         """Start the background scheduler"""
@@ -214,19 +546,27 @@ class SearchScheduler:
             return
         
         logger.info("Starting search scheduler...")
-        
-        # Schedule the job to run every 30 minutes
-        schedule.every(30).minutes.do(self.run_all_active_searches)
-        
-        # Also run once immediately for testing (optional)
-        # schedule.every().minute.do(self.run_all_active_searches)  # For testing
-        
         self.running = True
+        self.wakeup.clear()
         
         def run_scheduler():
             while self.running:
-                schedule.run_pending()
-                time.sleep(60)  # Check every minute
+                try:
+                    self.refresh_next_run()
+                except Exception as e:
+                    logger.error(f"Failed to read the next run time: {str(e)}")
+                
+                # Sleep until the next search is due; wake_scheduler() and stop cut this short
+                delay = self.seconds_until_next_run()
+                if delay > 0:
+                    self.wakeup.wait(delay)
+                    self.wakeup.clear()
+                    continue
+                
+                summary = self.run_all_active_searches()
+                if not summary.get("searches"):
+                    # Everything due is leased by another worker; don't spin while it finishes
+                    self.wakeup.wait(1)
         
         self.thread = threading.Thread(target=run_scheduler, daemon=True)
         self.thread.start()
@@ -240,19 +580,53 @@ class SearchScheduler:
         
         logger.info("Stopping search scheduler...")
         self.running = False
-        schedule.clear()
+        self.wakeup.set()
         
         if self.thread:
             self.thread.join(timeout=5)
         
         logger.info("Search scheduler stopped")
 
+    def get_queue(self, limit: int):
+        """Upcoming scheduled runs, read from the database so it works in any process"""
+        db = self.get_db()
+        try:
+            searches = db.query(SavedSearch).filter(
+                SavedSearch.is_active == True
+            ).order_by(SavedSearch.next_run_at).limit(limit).all()
+            return [
+                {
+                    "saved_search_id": s.id,
+                    "name": s.name,
+                    "next_run_at": s.next_run_at,
+                    "last_run_at": s.last_run_at,
+                    "interval_minutes": next_interval(s),
+                    "interval_override": s.run_interval_minutes is not None,
+                    "empty_runs": s.empty_runs or 0,
+                    "lease_owner": s.lease_owner,
+                }
+                for s in searches
+            ]
+        finally:
+            db.close()
+
     def get_status(self):
         """Get scheduler status"""
+        with self.state_lock:
+            next_run = self.next_run_at
+            queued = self.queued_searches
+            overrun = sum(1 for future in self.overrun if not future.done())
         return {
             "running": self.running,
-            "next_run": str(schedule.next_run()) if schedule.jobs else None,
-            "jobs_count": len(schedule.jobs)
+            "next_run": next_run.isoformat() if next_run else None,
+            "queued_searches": queued,
+            "worker_id": WORKER_ID,
+            "run_in_web": RUN_IN_WEB,
+            "worker_pool": worker_pool.get_stats(),
+            "timed_out_running": overrun,
+            "sweep_overlap": SWEEP_OVERLAP,
+            "current_sweep": self.current_sweep,
+            "last_sweep": self.last_sweep
         }
 
 # Global scheduler instance
@@ -260,17 +634,74 @@ scheduler = SearchScheduler()
 
 # Functions to be used by the main app
 def start_background_scheduler():
-    """Start the background job scheduler"""
+    """Start the background job scheduler and its helpers: notification sender, posting enricher and board syncer"""
+    board_syncer.start()
     scheduler.start_scheduler()
+    notification_sender.start()
+    posting_enricher.start()
 
 def stop_background_scheduler():
-    """Stop the background job scheduler"""
+    """Stop the background job scheduler and its helpers"""
     scheduler.stop_scheduler()
+    notification_sender.stop()
+    posting_enricher.stop()
+    board_syncer.stop()
 
 def get_scheduler_status():
     """Get current scheduler status"""
     return scheduler.get_status()
 
+def get_scheduler_queue(limit: int = 50):
+    """Get the next scheduled search runs"""
+    return scheduler.get_queue(limit)
+
+def wake_scheduler():
+    """Re-read the run queue now, e.g. after a saved search was created or changed"""
+    scheduler.wakeup.set()
+
 def run_searches_now():
     """Manually trigger all searches (for testing)"""
-    scheduler.run_all_active_searches()
+    return scheduler.run_all_active_searches(due_only=False)
+
+def worker_setup_problems():
+    """Reasons a separate scheduler worker wouldn't share the web tier's searches and events"""
+    problems = []
+    if engine.dialect.name == "sqlite":
+        problems.append("DATABASE_URL is a SQLite file, which another container or host can't share")
+    if EVENTS_BACKEND != "postgres":
+        problems.append("EVENTS_BACKEND is not postgres, so the worker's events never reach /events/stream")
+    return problems
+
+def scheduler_runs_in_web():
+    """Whether the web process should run the scheduler; SCHEDULER_IN_WEB=false is ignored without a shared setup"""
+    if RUN_IN_WEB:
+        return True
+    problems = worker_setup_problems()
+    if problems:
+        logger.warning(
+            f"Ignoring SCHEDULER_IN_WEB=false and running the scheduler in the web process: {'; '.join(problems)}"
+        )
+        return True
+    return False
+
+def run_worker():
+    """Run the scheduler as a standalone process until SIGINT/SIGTERM"""
+    from db import engine
+    from migrations import run_migrations
+    run_migrations(engine)
+    
+    stopping = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopping.set())
+    
+    for problem in worker_setup_problems():
+        logger.warning(f"Scheduler worker: {problem}")
+    logger.info(f"Scheduler worker {WORKER_ID} starting")
+    seen_filter.start()
+    start_background_scheduler()
+    stopping.wait()
+    stop_background_scheduler()
+    seen_filter.stop()
+
+if __name__ == "__main__":
+    run_worker()
@@ -0,0 +1,206 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import func
+
+from db import SessionLocal
+from models import SearchCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory").lower()  # memory, database or none
+CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "900"))
+CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+
+def normalize_query(query: str):
+    """Normalize a query so case and whitespace differences don't matter"""
+    return re.sub(r"\s+", " ", query.strip().lower())
+
+def normalize_key(query: str, count: int):
+    """Build the cache key for a query and result count"""
+    return f"{normalize_query(query)}|{count}"
+
+class MemoryCacheBackend:
+    """In-process LRU store, private to this worker"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str, now: float):
+        """Return (results, expired) for a key; results is None on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None, False
+            results, expires_at = entry
+            if expires_at <= now:
+                del self.entries[key]
+                return None, True
+            self.entries.move_to_end(key)
+            return list(results), False
+
+    def set(self, key: str, results: list, expires_at: float, now: float):
+        """Store results and return the number of entries evicted"""
+        with self.lock:
+            self.entries[key] = (results, expires_at)
+            self.entries.move_to_end(key)
+            evicted = 0
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def size(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+class DatabaseCacheBackend:
+    """Store entries in the search_cache table so they survive restarts and are shared by workers"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+
+    def get(self, key: str, now: float):
+        db = SessionLocal()
+        try:
+            entry = db.get(SearchCacheEntry, key)
+            if entry is None:
+                return None, False
+            if entry.expires_at <= now:
+                db.delete(entry)
+                db.commit()
+                return None, True
+            entry.accessed_at = now
+            results = list(entry.results)
+            db.commit()
+            return results, False
+        finally:
+            db.close()
+
+    def set(self, key: str, results: list, expires_at: float, now: float):
+        db = SessionLocal()
+        try:
+            db.merge(SearchCacheEntry(cache_key=key, results=results, expires_at=expires_at, accessed_at=now))
+            db.commit()
+
+            # Drop expired rows first, then the least recently used ones over the limit
+            db.query(SearchCacheEntry).filter(SearchCacheEntry.expires_at <= now).delete(synchronize_session=False)
+            evicted = 0
+            excess = db.query(func.count(SearchCacheEntry.cache_key)).scalar() - self.max_entries
+            if excess > 0:
+                stale_keys = db.query(SearchCacheEntry.cache_key).order_by(
+                    SearchCacheEntry.accessed_at.asc()
+                ).limit(excess).subquery()
+                evicted = db.query(SearchCacheEntry).filter(
+                    SearchCacheEntry.cache_key.in_(stale_keys.select())
+                ).delete(synchronize_session=False)
+            db.commit()
+            return evicted
+        finally:
+            db.close()
+
+    def size(self):
+        db = SessionLocal()
+        try:
+            return db.query(func.count(SearchCacheEntry.cache_key)).scalar()
+        finally:
+            db.close()
+
+    def clear(self):
+        db = SessionLocal()
+        try:
+            db.query(SearchCacheEntry).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+class QueryCache:
+    """TTL + LRU cache of upstream search results keyed on normalized query and count"""
+
+    def __init__(self, backend, ttl_seconds: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+
+    def _count(self, **increments):
+        with self.lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def get(self, query: str, count: int):
+        """Return cached results, or None on a miss"""
+        if self.backend is None:
+            return None
+        try:
+            results, expired = self.backend.get(normalize_key(query, count), time.time())
+        except Exception as e:
+            logger.error(f"Search cache lookup failed: {str(e)}")
+            self._count(errors=1, misses=1)
+            return None
+
+        if results is None:
+            self._count(misses=1, expirations=int(expired))
+        else:
+            self._count(hits=1)
+        return results
+
+    def set(self, query: str, count: int, results: list):
+        if self.backend is None:
+            return
+        now = time.time()
+        try:
+            evicted = self.backend.set(normalize_key(query, count), list(results), now + self.ttl_seconds, now)
+        except Exception as e:
+            logger.error(f"Search cache store failed: {str(e)}")
+            self._count(errors=1)
+            return
+        self._count(evictions=evicted)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def get_stats(self):
+        try:
+            size = self.backend.size() if self.backend is not None else 0
+        except Exception:
+            size = None
+        return {
+            "backend": CACHE_BACKEND,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.backend.max_entries if self.backend is not None else 0,
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "errors": self.errors,
+        }
+
+def create_backend(name: str):
+    """Create the configured cache backend"""
+    if name == "memory":
+        return MemoryCacheBackend(CACHE_MAX_ENTRIES)
+    if name == "database":
+        return DatabaseCacheBackend(CACHE_MAX_ENTRIES)
+    if name != "none":
+        logger.warning(f"Unknown SEARCH_CACHE_BACKEND '{name}', search cache disabled")
+    return None
+
+# Global cache instance
+query_cache = QueryCache(create_backend(CACHE_BACKEND), CACHE_TTL_SECONDS)
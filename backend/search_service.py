@@ -0,0 +1,46 @@
+import scan
+from quota import quota_limiter, pages_for, INTERACTIVE
+from search_cache import query_cache, normalize_key
+from singleflight import SingleFlight
+
+# Identical searches in flight at the same time share one upstream request
+_in_flight = SingleFlight()
+
+def _fetch(query: str, count: int, lane: str):
+    """Call the search backend (within quota, for Custom Search) and populate the cache"""
+    if not scan.get_backend().uses_quota:
+        results = scan.search(query, count) or []
+    else:
+        cost = pages_for(count)
+        quota_limiter.acquire(cost, lane)
+        scan.pages_fetched()
+        try:
+            results = scan.search(query, count) or []
+        finally:
+            # A short page ends the search early, so the pages after it were never requested
+            fetched = scan.pages_fetched()
+            if fetched is not None and fetched < cost:
+                quota_limiter.release(cost - fetched)
+    query_cache.set(query, count, results)
+    return results
+
+def search(query: str, count: int, lane: str = INTERACTIVE):
+    """Run an upstream job search, serving repeated queries from the result cache.
+
+    Raises quota.QuotaExceeded when the call would exceed the upstream quota.
+    """
+    results = query_cache.get(query, count)
+    if results is not None:
+        return results
+
+    # Keyed by lane too: a scheduled call can wait seconds for rate-limit tokens, and an
+    # interactive caller joining it would inherit that wait and its quota errors
+    return list(_in_flight.do(f"{lane}|{normalize_key(query, count)}", _fetch, query, count, lane))
+
+def get_stats():
+    """Get cache, request coalescing and quota counters"""
+    return {
+        "cache": query_cache.get_stats(),
+        "coalescing": _in_flight.get_stats(),
+        "quota": quota_limiter.get_stats(),
+    }
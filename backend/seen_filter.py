@@ -0,0 +1,257 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from db import SessionLocal
+from models import JobPosting, SavedSearchResult, SeenFilterSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Seen-results filter configuration. Off by default: against a local database one
+# indexed lookup per run is cheaper than the filter; it pays off when round trips are slow
+SEEN_FILTER_ENABLED = os.getenv("SEEN_FILTER_ENABLED", "false").lower() == "true"
+# Links the filter is sized for; a rebuild sizes for at least twice the current link count
+SEEN_FILTER_CAPACITY = int(os.getenv("SEEN_FILTER_CAPACITY", "1000000"))
+SEEN_FILTER_FP_RATE = float(os.getenv("SEEN_FILTER_FP_RATE", "0.01"))
+SEEN_FILTER_SAVE_SECONDS = float(os.getenv("SEEN_FILTER_SAVE_SECONDS", "300"))
+
+SNAPSHOT_NAME = "saved_search_results"
+REBUILD_CHUNK_SIZE = 10000
+
+def filter_key(saved_search_id: int, url_hash: str):
+    return f"{saved_search_id}:{url_hash}".encode()
+
+class BloomFilter:
+    """Fixed-size Bloom filter over a bytearray, using double hashing of one blake2b digest"""
+
+    def __init__(self, capacity: int, fp_rate: float, bits: int = None, hashes: int = None, data: bytes = None, count: int = 0):
+        self.capacity = max(1, capacity)
+        self.bits = bits or max(64, math.ceil(-self.capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = hashes or max(1, round(self.bits / self.capacity * math.log(2)))
+        self.data = bytearray(data) if data is not None else bytearray((self.bits + 7) // 8)
+        self.count = count
+        self.lock = threading.Lock()
+
+    def _positions(self, item: bytes):
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.hashes)]
+
+    def add(self, item: bytes):
+        """Add an item; returns False if it was (probably) already present"""
+        positions = self._positions(item)
+        data = self.data
+        with self.lock:
+            added = False
+            for position in positions:
+                mask = 1 << (position & 7)
+                if not data[position >> 3] & mask:
+                    data[position >> 3] |= mask
+                    added = True
+            if added:
+                self.count += 1
+            return added
+
+    def __contains__(self, item: bytes):
+        data = self.data
+        for position in self._positions(item):
+            if not data[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def estimated_fp_rate(self):
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def memory_bytes(self):
+        return len(self.data)
+
+    def snapshot(self):
+        with self.lock:
+            return bytes(self.data), self.count
+
+class SeenFilter:
+    """Process-wide Bloom filter of (saved_search_id, posting hash) links already stored.
+
+    "Not present" is definite, so ingestion can skip the existence check for
+    those results; "maybe" still goes to the database. Missing entries (links
+    another process added since the last snapshot) only cost a wasted insert,
+    which ON CONFLICT absorbs, so the filter never changes which results are new.
+    """
+
+    def __init__(self):
+        self.filter = None
+        self.ready = False
+        self.running = False
+        self.thread = None
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.dirty = 0
+        self.source = None
+        self.load_seconds = None
+        self.counters = {"lookups": 0, "maybe": 0, "definitely_new": 0, "false_positives": 0}
+
+    def might_contain(self, saved_search_id: int, url_hash: str):
+        """False only when the link definitely doesn't exist; True while the filter is loading"""
+        if not self.ready:
+            return True
+        return filter_key(saved_search_id, url_hash) in self.filter
+
+    def add(self, saved_search_id: int, url_hash: str):
+        bloom = self.filter
+        if bloom is not None and bloom.add(filter_key(saved_search_id, url_hash)):
+            self.dirty += 1
+
+    def record(self, lookups: int, maybe: int, false_positives: int):
+        """Count one ingestion's lookups; false positives are "maybe" answers the database didn't confirm"""
+        if not self.ready:
+            return
+        with self.lock:
+            self.counters["lookups"] += lookups
+            self.counters["maybe"] += maybe
+            self.counters["definitely_new"] += lookups - maybe
+            self.counters["false_positives"] += false_positives
+
+    def load(self):
+        """Load the persisted snapshot, or rebuild from saved_search_results if there isn't a usable one"""
+        started = time.monotonic()
+        db = SessionLocal()
+        try:
+            snapshot = db.get(SeenFilterSnapshot, SNAPSHOT_NAME)
+            if snapshot is not None and snapshot.item_count <= snapshot.capacity:
+                self.filter = BloomFilter(
+                    snapshot.capacity, SEEN_FILTER_FP_RATE,
+                    bits=snapshot.bits, hashes=snapshot.hashes, data=snapshot.data, count=snapshot.item_count
+                )
+                self.source = "snapshot"
+            else:
+                self.rebuild(db)
+        finally:
+            db.close()
+        self.ready = True
+        self.load_seconds = round(time.monotonic() - started, 3)
+        logger.info(
+            f"Seen-results filter loaded from {self.source} in {self.load_seconds}s "
+            f"({self.filter.count} links, {self.filter.memory_bytes()} bytes)"
+        )
+
+    def rebuild(self, db):
+        """Stream every stored link into a fresh filter sized for at least twice the current count"""
+        self.ready = False
+        links = db.query(func.count()).select_from(SavedSearchResult).scalar()
+        bloom = BloomFilter(max(SEEN_FILTER_CAPACITY, links * 2), SEEN_FILTER_FP_RATE)
+        # Links ingested while this runs are added to the new filter too
+        self.filter = bloom
+        rows = db.execute(
+            select(SavedSearchResult.saved_search_id, JobPosting.url_hash)
+            .join(JobPosting, JobPosting.id == SavedSearchResult.posting_id)
+            .execution_options(yield_per=REBUILD_CHUNK_SIZE)
+        )
+        for saved_search_id, url_hash in rows:
+            bloom.add(filter_key(saved_search_id, url_hash))
+        self.source = "rebuild"
+        self.dirty = bloom.count
+
+    def save(self):
+        """Persist the bit array so a restart can skip the rebuild"""
+        bloom = self.filter
+        if bloom is None or not self.ready:
+            return
+        data, count = bloom.snapshot()
+        self.dirty = 0
+        db = SessionLocal()
+        try:
+            db.merge(SeenFilterSnapshot(
+                name=SNAPSHOT_NAME,
+                data=data,
+                bits=bloom.bits,
+                hashes=bloom.hashes,
+                capacity=bloom.capacity,
+                item_count=count,
+                saved_at=datetime.utcnow()
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def start(self):
+        """Load the filter in the background and save it periodically"""
+        if not SEEN_FILTER_ENABLED:
+            return
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.wakeup.clear()
+            self.thread = threading.Thread(target=self._run, name="seen-filter", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        try:
+            self.load()
+            if self.source == "rebuild":
+                self.save()
+        except Exception as e:
+            logger.error(f"Seen-results filter load failed: {str(e)}")
+            self.running = False
+            return
+        while self.running:
+            self.wakeup.wait(SEEN_FILTER_SAVE_SECONDS)
+            self.wakeup.clear()
+            try:
+                if self.filter.count > self.filter.capacity:
+                    # Past capacity the false-positive rate climbs quickly; resize
+                    db = SessionLocal()
+                    try:
+                        self.rebuild(db)
+                    finally:
+                        db.close()
+                    self.ready = True
+                if self.dirty:
+                    self.save()
+            except Exception as e:
+                logger.error(f"Seen-results filter save failed: {str(e)}")
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        if self.dirty:
+            try:
+                self.save()
+            except Exception as e:
+                logger.error(f"Seen-results filter save failed: {str(e)}")
+
+    def get_stats(self):
+        bloom = self.filter
+        counters = dict(self.counters)
+        checked_absent = counters["definitely_new"] + counters["false_positives"]
+        return {
+            "enabled": SEEN_FILTER_ENABLED,
+            "ready": self.ready,
+            "source": self.source,
+            "load_seconds": self.load_seconds,
+            "items": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "bits": bloom.bits if bloom else 0,
+            "hashes": bloom.hashes if bloom else 0,
+            "memory_bytes": bloom.memory_bytes() if bloom else 0,
+            "estimated_fp_rate": round(bloom.estimated_fp_rate(), 6) if bloom else None,
+            # Share of lookups for links that didn't exist which the filter still answered "maybe"
+            "observed_fp_rate": round(counters["false_positives"] / checked_absent, 6) if checked_absent else None,
+            **counters,
+        }
+
+# Global filter instance
+seen_filter = SeenFilter()
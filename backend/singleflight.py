@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; everyone who arrives while
+    it is in flight waits on the same future and gets the same result (or
+    exception). Works for threaded callers via do() and for coroutines via
+    do_async(), and both kinds of caller can share one in-flight call.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.executions = 0
+        self.shared = 0
+
+    def _join(self, key):
+        """Return (future, is_leader) for a key"""
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = Future()
+            self.calls[key] = future
+            self.executions += 1
+            return future, True
+
+    def _run(self, key, future: Future, fn, args):
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+
+    def do(self, key, fn, *args):
+        """Run fn(*args) unless an identical call is in flight, and return its result"""
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn, args)
+        return future.result()
+
+    async def do_async(self, key, fn, *args):
+        """Like do(), but the blocking fn runs on the default executor instead of the event loop"""
+        future, leader = self._join(key)
+        if leader:
+            loop = asyncio.get_running_loop()
+            # Not awaited directly: the call must finish and release the key even if this caller is cancelled
+            loop.run_in_executor(None, self._run, key, future, fn, args)
+        return await asyncio.wrap_future(future)
+
+    def get_stats(self):
+        return {
+            "in_flight": len(self.calls),
+            "executions": self.executions,
+            "shared": self.shared,
+        }
@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+# The backend modules import each other by name, as when run from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# One SQLite file per test session, so threads and both engines see the same data
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='job-search-tests-')}/test.db")
+os.environ.setdefault("SEARCH_BACKEND", "cse")
+os.environ.setdefault("SEARCH_CACHE_BACKEND", "none")
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables"""
+    from db import Base, SessionLocal, engine
+    import models  # noqa: F401 - registers the tables
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+class StubServer:
+    """Local HTTP stand-in for the ATS APIs.
+
+    routes maps a request path (with its query string) to a response, or to a
+    list of responses served in turn with the last one repeating. A response is
+    (status, body, headers) where a dict or list body is sent as JSON, or a
+    callable taking the request headers and returning one.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests.append((self.path, dict(self.headers)))
+                status, body, headers = stub.respond(self.path, self.headers)
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body)
+                data = (body or "").encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def respond(self, path, headers):
+        route = self.routes.get(path)
+        if route is None:
+            return 404, "", {}
+        if isinstance(route, list):
+            route = route.pop(0) if len(route) > 1 else route[0]
+        if callable(route):
+            return route(headers)
+        return route
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    try:
+        yield server
+    finally:
+        server.close()
@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jose import JWTError, jwt
+from jose.exceptions import JWTClaimsError
+
+import auth_dep
+import auth_routes
+from auth_routes import UserProfileCache
+
+SECRET = "test-jwt-secret"
+PROJECT_URL = "https://project.supabase.co"
+
+def make_token(**claims):
+    now = int(time.time())
+    return jwt.encode({"sub": "user-1", "email": "ada@example.com", "iat": now, "exp": now + 3600, **claims},
+                      SECRET, algorithm="HS256")
+
+class StubSupabase:
+    """Stands in for the Supabase client's auth.get_user"""
+
+    def __init__(self, error=None):
+        self.auth = self
+        self.calls = []
+        self.error = error
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_user(self, token):
+        self.calls.append(token)
+        assert self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(user=SimpleNamespace(
+            user_metadata={"full_name": "Ada Lovelace"},
+            email_confirmed_at="2026-10-01T12:00:00Z",
+            created_at="2026-09-30T08:00:00Z",
+        ))
+
+@pytest.fixture
+def supabase(monkeypatch):
+    stub = StubSupabase()
+    monkeypatch.setattr(auth_routes, "supabase", stub)
+    return stub
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(auth_dep, "PROJECT_URL", PROJECT_URL)
+    monkeypatch.setattr(auth_dep, "JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth_dep, "claims_cache", auth_dep.ClaimsCache(100))
+    monkeypatch.setattr(auth_routes, "profile_cache", UserProfileCache(600, 100))
+    app = FastAPI()
+    app.include_router(auth_routes.router)
+    return TestClient(app)
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+def test_miss_returns_none_and_refreshes_in_background(supabase):
+    cache = UserProfileCache(600, 100)
+    supabase.release.clear()
+
+    assert cache.get("user-1", "token-1") is None
+    # A second miss while the refresh is running doesn't start another
+    assert cache.get("user-1", "token-1") is None
+    supabase.release.set()
+    wait_for(lambda: "user-1" in cache.entries and not cache.refreshing)
+
+    assert cache.get("user-1", "token-1") == {
+        "full_name": "Ada Lovelace", "email_verified": True, "created_at": "2026-09-30T08:00:00Z",
+    }
+    assert supabase.calls == ["token-1"]
+
+def test_stale_entry_is_served_while_refreshing(supabase):
+    cache = UserProfileCache(600, 100)
+    cache.entries["user-1"] = ({"full_name": "Old Name"}, time.time() - 601)
+
+    assert cache.get("user-1", "token-1") == {"full_name": "Old Name"}
+    wait_for(lambda: not cache.refreshing)
+
+    assert cache.get("user-1", "token-1")["full_name"] == "Ada Lovelace"
+    assert supabase.calls == ["token-1"]
+
+def test_failed_refresh_logs_a_warning_and_retries_next_time(supabase, caplog):
+    supabase.error = RuntimeError("supabase unavailable")
+    cache = UserProfileCache(600, 100)
+
+    with caplog.at_level(logging.WARNING, logger="auth_routes"):
+        assert cache.get("user-1", "token-1") is None
+        wait_for(lambda: not cache.refreshing)
+
+    assert "Profile refresh failed for user-1: supabase unavailable" in caplog.text
+    assert cache.get("user-1", "token-1") is None
+    wait_for(lambda: len(supabase.calls) == 2 and not cache.refreshing)
+
+def test_lru_keeps_max_size(supabase):
+    cache = UserProfileCache(600, 2)
+    for user_id in ("user-1", "user-2", "user-3"):
+        cache.get(user_id, "token")
+        wait_for(lambda: not cache.refreshing)
+
+    assert list(cache.entries) == ["user-2", "user-3"]
+
+def test_me_answers_from_claims_until_the_profile_is_cached(client, supabase):
+    supabase.release.clear()
+    token = make_token(email_verified=True, user_metadata={"full_name": "Ada From Token"})
+
+    response = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.json() == {
+        "id": "user-1", "email": "ada@example.com", "full_name": "Ada From Token",
+        "email_verified": True, "created_at": None,
+    }
+    supabase.release.set()
+    wait_for(lambda: not auth_routes.profile_cache.refreshing)
+
+    response = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.json()["full_name"] == "Ada Lovelace"
+    assert response.json()["created_at"] == "2026-09-30T08:00:00Z"
+
+def test_me_reads_email_verified_from_user_metadata(client, monkeypatch):
+    monkeypatch.setattr(auth_routes, "supabase", None)
+    unverified = make_token(user_metadata={"email_verified": False})
+    verified = make_token(sub="user-2", user_metadata={"email_verified": True})
+
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {unverified}"}).json()["email_verified"] is False
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {verified}"}).json()["email_verified"] is True
+
+@pytest.fixture
+def tokens(monkeypatch):
+    monkeypatch.setattr(auth_dep, "JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth_dep, "ISSUER", f"{PROJECT_URL}/auth/v1")
+    monkeypatch.setattr(auth_dep, "claims_cache", auth_dep.ClaimsCache(100))
+    return auth_dep.claims_cache
+
+def test_cached_token_expires_at_exp(tokens):
+    exp = int(time.time()) + 1
+    token = make_token(exp=exp)
+
+    assert auth_dep.verify_token(token)["sub"] == "user-1"
+    assert len(tokens.entries) == 1
+    # jose compares exp against whole seconds
+    time.sleep(exp + 1 - time.time())
+
+    with pytest.raises(JWTError):
+        auth_dep.verify_token(token)
+    assert not tokens.entries
+
+def test_token_without_exp_is_cached_for_max_ttl(tokens, monkeypatch):
+    monkeypatch.setattr(auth_dep, "TOKEN_CACHE_MAX_TTL", 60)
+    now = time.time()
+    token = jwt.encode({"sub": "user-1"}, SECRET, algorithm="HS256")
+
+    auth_dep.verify_token(token)
+
+    (_, expires_at), = tokens.entries.values()
+    assert now + 59 <= expires_at <= time.time() + 60
+
+@pytest.mark.parametrize("policy, claims", [
+    ("JWT_VERIFY_AUD", {"aud": "anon"}),
+    ("JWT_VERIFY_ISS", {"iss": "https://other.supabase.co/auth/v1"}),
+])
+def test_audience_and_issuer_apply_on_cache_hits(tokens, monkeypatch, policy, claims):
+    token = make_token(**claims)
+    auth_dep.verify_token(token)
+    assert len(tokens.entries) == 1
+
+    monkeypatch.setattr(auth_dep, policy, True)
+
+    with pytest.raises(JWTClaimsError):
+        auth_dep.verify_token(token)
+
+def test_matching_audience_and_issuer_pass_on_cache_hits(tokens, monkeypatch):
+    monkeypatch.setattr(auth_dep, "JWT_VERIFY_AUD", True)
+    monkeypatch.setattr(auth_dep, "JWT_VERIFY_ISS", True)
+    token = make_token(aud="authenticated", iss=f"{PROJECT_URL}/auth/v1")
+
+    assert auth_dep.verify_token(token) == auth_dep.verify_token(token)
+    assert len(tokens.entries) == 1
+
+def test_bad_signature_is_never_cached(tokens):
+    token = jwt.encode({"sub": "user-1"}, "some-other-secret", algorithm="HS256")
+
+    with pytest.raises(JWTError):
+        auth_dep.verify_token(token)
+    assert not tokens.entries
@@ -0,0 +1,175 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+import boards
+import scan
+from boards import BoardSyncer, BoardSearchBackend, parse_listing, parse_query, title_matches
+from models import JobBoard, JobPosting
+
+LEVER_IDS = [f"5ac1e0c4-3b1f-4b7e-9d6a-00000000000{i}" for i in range(3)]
+ASHBY_IDS = [f"0e3f7a52-8c41-4f0e-a1d2-00000000000{i}" for i in range(2)]
+
+# Trimmed copies of real listing responses
+GREENHOUSE_LISTING = {
+    "jobs": [
+        {
+            "id": 4012345, "title": "Software Engineer Intern", "company_name": "Acme",
+            "location": {"name": "New York, NY"}, "first_published": "2026-10-01T14:00:00-04:00",
+            "updated_at": "2026-10-05T09:30:00-04:00",
+            "absolute_url": "https://job-boards.greenhouse.io/acme/jobs/4012345",
+        },
+        {
+            "id": 4012346, "title": "Senior Software Engineer, Payments", "company_name": "Acme",
+            "location": {"name": "Remote - US"}, "first_published": "2026-09-20T10:00:00-04:00",
+            "absolute_url": "https://job-boards.greenhouse.io/acme/jobs/4012346",
+        },
+    ],
+    "meta": {"total": 2},
+}
+LEVER_LISTING = [
+    {
+        "id": LEVER_IDS[0], "text": "Software Engineer", "createdAt": 1759300000000,
+        "categories": {"commitment": "Full-time", "location": "Berlin", "team": "Platform", "allLocations": ["Berlin", "Remote"]},
+        "hostedUrl": f"https://jobs.eu.lever.co/beta/{LEVER_IDS[0]}",
+    },
+    {
+        "id": LEVER_IDS[1], "text": "Engineering Manager", "createdAt": 1759400000000,
+        "categories": {"commitment": "Full-time", "location": "Berlin", "team": "Platform"},
+        "hostedUrl": f"https://jobs.eu.lever.co/beta/{LEVER_IDS[1]}",
+    },
+]
+ASHBY_LISTING = {
+    "apiVersion": "1",
+    "jobs": [
+        {
+            "id": ASHBY_IDS[0], "title": "Software Engineer, New Grad", "location": "", "isRemote": True,
+            "publishedAt": "2026-10-03T16:20:00.000+00:00", "jobUrl": f"https://jobs.ashbyhq.com/gamma/{ASHBY_IDS[0]}",
+        },
+    ],
+}
+
+@pytest.fixture
+def ats(monkeypatch, stub_server, db):
+    """Boards acme (Greenhouse), beta (Lever EU) and gamma (Ashby) served by the stand-in"""
+    for name in ("GREENHOUSE_API_URL", "LEVER_API_URL", "ASHBY_API_URL"):
+        monkeypatch.setattr(boards, name, stub_server.url)
+    monkeypatch.setattr(boards, "LEVER_EU_API_URL", stub_server.url + "/eu")
+    monkeypatch.setattr(boards, "CONFIGURED_BOARDS", boards.parse_board_list("greenhouse:acme,lever-eu:beta,ashby:gamma"))
+    stub_server.routes.update({
+        "/v1/boards/acme/jobs": (200, GREENHOUSE_LISTING, {"ETag": '"gh-1"'}),
+        "/eu/v0/postings/beta?mode=json": (200, LEVER_LISTING, {"Last-Modified": "Fri, 03 Oct 2026 10:00:00 GMT"}),
+        "/posting-api/job-board/gamma": (200, ASHBY_LISTING, {}),
+    })
+    return stub_server
+
+def postings_by_url(db):
+    db.expire_all()
+    return {posting.url: posting for posting in db.query(JobPosting).all()}
+
+def make_due(db):
+    db.execute(update(JobBoard).values(next_sync_at=None))
+    db.commit()
+
+def test_parse_listing():
+    greenhouse = dict(parse_listing("greenhouse", "acme", GREENHOUSE_LISTING))
+    assert greenhouse["https://job-boards.greenhouse.io/acme/jobs/4012345"] == {
+        "title": "Software Engineer Intern",
+        "company_name": "Acme",
+        "location": "New York, NY",
+        "posted_at": datetime(2026, 10, 1, 18, 0),
+    }
+
+    lever = dict(parse_listing("lever", "beta", LEVER_LISTING, "eu"))
+    assert lever[f"https://jobs.eu.lever.co/beta/{LEVER_IDS[0]}"]["location"] == "Berlin; Remote"
+    assert list(dict(parse_listing("lever", "beta", LEVER_LISTING)))[0].startswith("https://jobs.lever.co/beta/")
+
+    ashby = dict(parse_listing("ashby", "gamma", ASHBY_LISTING))
+    assert ashby[f"https://jobs.ashbyhq.com/gamma/{ASHBY_IDS[0]}"]["location"] == "Remote"
+
+def test_sync_stores_board_postings(ats, db):
+    syncer = BoardSyncer()
+
+    assert syncer.drain() == 3
+
+    postings = postings_by_url(db)
+    assert len(postings) == 5
+    intern = postings["https://job-boards.greenhouse.io/acme/jobs/4012345"]
+    assert (intern.ats, intern.company, intern.job_id) == ("greenhouse", "acme", "4012345")
+    assert (intern.title, intern.location, intern.enrich_status) == ("Software Engineer Intern", "New York, NY", "ok")
+    assert postings[f"https://jobs.eu.lever.co/beta/{LEVER_IDS[1]}"].title == "Engineering Manager"
+    assert "/eu/v0/postings/beta?mode=json" in ats.paths()
+
+    acme = db.query(JobBoard).filter_by(ats="greenhouse", company="acme").one()
+    assert (acme.job_count, acme.etag, acme.last_error) == (2, '"gh-1"', None)
+    assert db.query(JobBoard).filter_by(ats="lever", company="beta").one().region == "eu"
+    assert syncer.counters["synced"] == 3 and syncer.counters["postings_stored"] == 5
+
+def test_resync_revalidates_and_closes_unlisted_postings(ats, db):
+    syncer = BoardSyncer()
+    syncer.drain()
+
+    def acme_listing(headers):
+        if headers.get("If-None-Match") == '"gh-1"':
+            return 304, "", {"ETag": '"gh-1"'}
+        return 200, GREENHOUSE_LISTING, {"ETag": '"gh-1"'}
+
+    ats.routes["/v1/boards/acme/jobs"] = acme_listing
+    # Beta took down its manager role
+    ats.routes["/eu/v0/postings/beta?mode=json"] = (200, LEVER_LISTING[:1], {})
+    make_due(db)
+    syncer.drain()
+
+    assert syncer.counters["not_modified"] == 1
+    assert syncer.counters["postings_closed"] == 1
+    postings = postings_by_url(db)
+    assert postings[f"https://jobs.eu.lever.co/beta/{LEVER_IDS[1]}"].enrich_status == "closed"
+    assert postings[f"https://jobs.eu.lever.co/beta/{LEVER_IDS[0]}"].enrich_status == "ok"
+    assert postings["https://job-boards.greenhouse.io/acme/jobs/4012346"].enrich_status == "ok"
+
+def test_failed_sync_keeps_postings(ats, db):
+    syncer = BoardSyncer()
+    syncer.drain()
+
+    ats.routes["/posting-api/job-board/gamma"] = (503, "upstream unavailable", {})
+    make_due(db)
+    syncer.drain()
+
+    gamma = db.query(JobBoard).filter_by(ats="ashby", company="gamma").one()
+    db.refresh(gamma)
+    assert gamma.last_error.startswith("HTTPStatusError: Server error '503")
+    assert postings_by_url(db)[f"https://jobs.ashbyhq.com/gamma/{ASHBY_IDS[0]}"].enrich_status == "ok"
+    assert syncer.counters["failed"] == 1
+
+@pytest.mark.parametrize("position, level, expected", [
+    ("software engineer", "intern", ["https://job-boards.greenhouse.io/acme/jobs/4012345"]),
+    ("software engineer", "new grad", [f"https://jobs.ashbyhq.com/gamma/{ASHBY_IDS[0]}"]),
+    ("software engineer", "senior level", ["https://job-boards.greenhouse.io/acme/jobs/4012346"]),
+    ("software engineer", "associate level", [f"https://jobs.eu.lever.co/beta/{LEVER_IDS[0]}"]),
+    ("engineering", "manager", [f"https://jobs.eu.lever.co/beta/{LEVER_IDS[1]}"]),
+    ("data scientist", "intern", []),
+])
+def test_board_search_matches_title_and_level(ats, db, position, level, expected):
+    BoardSyncer().drain()
+
+    assert BoardSearchBackend().search(scan.buildQuery(position, level), 10) == expected
+
+def test_board_search_skips_closed_postings_and_respects_num(ats, db):
+    BoardSyncer().drain()
+    db.execute(update(JobPosting).where(JobPosting.company == "acme").values(enrich_status="closed"))
+    db.commit()
+
+    assert BoardSearchBackend().search(scan.buildQuery("software engineer", "intern"), 10) == []
+    assert len(BoardSearchBackend().search(scan.buildQuery("engineer", ""), 2)) == 2
+
+def test_parse_query_and_title_matches():
+    assert parse_query(scan.buildQuery("Data Analyst", "associate level")) == (["data", "analyst"], "associate level")
+    assert parse_query(scan.buildQuery("C++ developer", "new grad")) == (["c++", "developer"], "new grad")
+
+    assert title_matches("Data Analyst II", ["data", "analyst"], "associate level")
+    assert not title_matches("Senior Data Analyst", ["data", "analyst"], "associate level")
+    # A level keyword the user searched for doesn't rule a title out
+    assert title_matches("Lead Generation Specialist", ["lead", "generation"], "associate level")
+    assert not title_matches("Internal Tools Engineer", ["engineer"], "intern")
+    assert not title_matches("Metadata Analyst", ["data"], None)
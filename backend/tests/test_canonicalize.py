@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from scan import canonicalize_url, posting_identity
+
+LEVER_ID = "0b6c1a7e-1111-2222-3333-444455556666"
+ASHBY_ID = "9f8e7d6c-aaaa-bbbb-cccc-ddddeeeeffff"
+
+# Each entry: canonical URL, key, and links that are all the same posting
+VARIANTS = [
+    (
+        f"https://jobs.lever.co/acme/{LEVER_ID}",
+        ("lever", "acme", LEVER_ID),
+        [
+            f"https://jobs.lever.co/acme/{LEVER_ID}",
+            f"https://jobs.lever.co/acme/{LEVER_ID}/",
+            f"https://jobs.lever.co/acme/{LEVER_ID}/apply",
+            f"https://jobs.lever.co/Acme/{LEVER_ID.upper()}/apply?lever-source=LinkedIn",
+            f"https://jobs.lever.co/acme/{LEVER_ID}?lever-origin=applied&lever-source%5B%5D=x",
+            f"http://www.jobs.lever.co/acme/{LEVER_ID}?utm_source=google&utm_medium=cpc#apply",
+            f"  https://jobs.lever.co/acme/{LEVER_ID}?source=indeed  ",
+        ],
+    ),
+    (
+        f"https://jobs.eu.lever.co/acme/{LEVER_ID}",
+        ("lever", "acme", LEVER_ID),
+        [
+            f"https://jobs.eu.lever.co/acme/{LEVER_ID}",
+            f"https://jobs.eu.lever.co/acme/{LEVER_ID}/apply?lever-via=abc",
+        ],
+    ),
+    (
+        "https://job-boards.greenhouse.io/acme/jobs/123",
+        ("greenhouse", "acme", "123"),
+        [
+            "https://boards.greenhouse.io/acme/jobs/123",
+            "https://job-boards.greenhouse.io/acme/jobs/123",
+            "https://boards.greenhouse.io/Acme/jobs/123/",
+            "https://boards.greenhouse.io/acme/jobs/123?gh_jid=123",
+            "https://boards.greenhouse.io/acme/jobs/123?gh_src=abc123&ref=linkedin#app",
+            "https://boards.greenhouse.io/acme?gh_jid=123",
+            "https://boards.greenhouse.io/embed/job_app?for=acme&token=123",
+            "https://boards.greenhouse.io/embed/job_app?token=123&for=Acme&utm_campaign=x",
+        ],
+    ),
+    (
+        "https://job-boards.eu.greenhouse.io/acme/jobs/456",
+        ("greenhouse", "acme", "456"),
+        [
+            "https://job-boards.eu.greenhouse.io/acme/jobs/456",
+            "https://boards.eu.greenhouse.io/acme/jobs/456?gh_src=x",
+        ],
+    ),
+    (
+        f"https://jobs.ashbyhq.com/acme/{ASHBY_ID}",
+        ("ashby", "acme", ASHBY_ID),
+        [
+            f"https://jobs.ashbyhq.com/acme/{ASHBY_ID}",
+            f"https://jobs.ashbyhq.com/acme/{ASHBY_ID}/application",
+            f"https://jobs.ashbyhq.com/Acme/{ASHBY_ID}/application?utm_source=linkedin",
+            f"https://www.jobs.ashbyhq.com/acme/{ASHBY_ID}/?ref=homepage",
+        ],
+    ),
+]
+
+@pytest.mark.parametrize(
+    "url, canonical, key",
+    [(url, canonical, key) for canonical, key, urls in VARIANTS for url in urls]
+)
+def test_variants_share_canonical_url_and_key(url, canonical, key):
+    assert canonicalize_url(url) == (canonical, key)
+
+def test_postings_stay_distinct():
+    identities = {posting_identity(urls[0]) for _, _, urls in VARIANTS}
+    # The EU Lever board shares the company and job id of the global one
+    assert len(identities) == len(VARIANTS) - 1
+
+@pytest.mark.parametrize("url, expected", [
+    # Embed links name the board only in ?for=
+    ("https://boards.greenhouse.io/embed/job_app?token=123",
+     "https://boards.greenhouse.io/embed/job_app?token=123"),
+    # Board pages and other non-posting ATS links have no posting identity
+    ("https://boards.greenhouse.io/acme", "https://boards.greenhouse.io/acme"),
+    ("https://jobs.lever.co/acme?team=Engineering&source=x", "https://jobs.lever.co/acme?team=Engineering"),
+    ("https://jobs.ashbyhq.com/acme/", "https://jobs.ashbyhq.com/acme"),
+    ("https://boards.greenhouse.io/acme/jobs/abc", "https://boards.greenhouse.io/acme/jobs/abc"),
+])
+def test_links_without_posting_key(url, expected):
+    assert canonicalize_url(url) == (expected, None)
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://careers.example.com/jobs/42/?utm_source=x&gh_src=y#top", "https://careers.example.com/jobs/42"),
+    # source and ref only count as tracking on the ATS hosts
+    ("https://careers.example.com/search?source=internal&ref=main&page=2",
+     "https://careers.example.com/search?source=internal&ref=main&page=2"),
+    ("https://www.example.com/?utm_medium=email", "https://example.com/"),
+    ("https://example.com/job?resource=1&preference=remote", "https://example.com/job?resource=1&preference=remote"),
+    # Look-alike domains aren't the ATS hosts
+    ("https://notlever.co/acme/0b6c1a7e-1111-2222-3333-444455556666?source=x",
+     "https://notlever.co/acme/0b6c1a7e-1111-2222-3333-444455556666?source=x"),
+    ("https://jobs.notgreenhouse.io/acme/jobs/4012345?ref=x", "https://jobs.notgreenhouse.io/acme/jobs/4012345?ref=x"),
+    ("https://myashbyhq.com/acme/0b6c1a7e-1111-2222-3333-444455556666",
+     "https://myashbyhq.com/acme/0b6c1a7e-1111-2222-3333-444455556666"),
+    ("https://lever.co.example.com/acme/0b6c1a7e-1111-2222-3333-444455556666?source=x",
+     "https://lever.co.example.com/acme/0b6c1a7e-1111-2222-3333-444455556666?source=x"),
+])
+def test_other_hosts_keep_meaningful_params(url, expected):
+    assert canonicalize_url(url) == (expected, None)
+
+def test_canonicalize_throughput():
+    urls = [url for _, _, variants in VARIANTS for url in variants]
+    urls += ["https://careers.example.com/jobs/42/?utm_source=x&page=2"] * 5
+    count = 100_000
+    batch = (urls * (count // len(urls) + 1))[:count]
+
+    started = time.perf_counter()
+    for url in batch:
+        canonicalize_url(url)
+    elapsed = time.perf_counter() - started
+
+    rate = count / elapsed
+    print(f"canonicalized {count} URLs in {elapsed:.2f}s ({rate:,.0f} URLs/s)")
+    # Roughly 300k URLs/s on one core; the floor only catches a pathological regression
+    assert rate > 20_000
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+import enrichment
+from enrichment import PostingEnricher
+from ingest import posting_row, upsert_postings
+from models import JobBoard, JobPosting
+
+LEVER_ID = "5ac1e0c4-3b1f-4b7e-9d6a-000000000001"
+ASHBY_IDS = [f"0e3f7a52-8c41-4f0e-a1d2-00000000000{i}" for i in range(4)]
+
+GREENHOUSE_JOB = {
+    "id": 4012345, "title": "Software Engineer Intern", "company_name": "Acme",
+    "location": {"name": "New York, NY"}, "first_published": "2026-10-01T14:00:00-04:00",
+}
+LEVER_JOB = {
+    "id": LEVER_ID, "text": "Backend Engineer", "createdAt": 1759300000000,
+    "categories": {"location": "Berlin", "allLocations": ["Berlin", "Remote"]},
+}
+ASHBY_BOARD = {
+    "jobs": [
+        {"id": job_id, "title": f"Engineer {i}", "location": "London", "publishedAt": "2026-10-03T16:20:00.000+00:00"}
+        for i, job_id in enumerate(ASHBY_IDS[:3])
+    ],
+}
+
+@pytest.fixture
+def ats(monkeypatch, stub_server, db):
+    for name in ("GREENHOUSE_API_URL", "LEVER_API_URL", "ASHBY_API_URL"):
+        monkeypatch.setattr(enrichment, name, stub_server.url)
+    monkeypatch.setattr(enrichment, "LEVER_EU_API_URL", stub_server.url + "/eu")
+    return stub_server
+
+def add_postings(db, *urls):
+    rows = [posting_row(url) for url in urls]
+    ids = upsert_postings(db, rows)
+    db.commit()
+    return [ids[row["url_hash"]] for row in rows]
+
+def load(db, posting_id):
+    db.expire_all()
+    return db.get(JobPosting, posting_id)
+
+def make_due(db, **values):
+    db.execute(update(JobPosting).values(enrich_next_at=None, **values))
+    db.commit()
+
+def test_enriches_from_ats_apis(ats, db):
+    greenhouse, lever = add_postings(
+        db, "https://boards.greenhouse.io/acme/jobs/4012345", f"https://jobs.eu.lever.co/beta/{LEVER_ID}/apply"
+    )
+    ats.routes["/v1/boards/acme/jobs/4012345"] = (200, GREENHOUSE_JOB, {"ETag": '"v1"'})
+    ats.routes[f"/eu/v0/postings/beta/{LEVER_ID}"] = (200, LEVER_JOB, {"Last-Modified": "Fri, 03 Oct 2026 10:00:00 GMT"})
+    enricher = PostingEnricher()
+
+    assert enricher.drain() == 2
+
+    posting = load(db, greenhouse)
+    assert (posting.title, posting.company_name, posting.location) == ("Software Engineer Intern", "Acme", "New York, NY")
+    assert posting.posted_at == datetime(2026, 10, 1, 18, 0)
+    assert (posting.enrich_status, posting.etag, posting.enrich_attempts) == ("ok", '"v1"', 0)
+    posting = load(db, lever)
+    assert (posting.title, posting.location) == ("Backend Engineer", "Berlin; Remote")
+    assert posting.last_modified == "Fri, 03 Oct 2026 10:00:00 GMT"
+    assert enricher.counters["enriched"] == 2 and enricher.counters["requests"] == 2
+
+def test_refresh_sends_validators_and_accepts_304(ats, db):
+    posting_id, = add_postings(db, "https://boards.greenhouse.io/acme/jobs/4012345")
+
+    def job(headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, "", {"ETag": '"v1"'}
+        return 200, GREENHOUSE_JOB, {"ETag": '"v1"'}
+
+    ats.routes["/v1/boards/acme/jobs/4012345"] = job
+    enricher = PostingEnricher()
+    enricher.drain()
+
+    # Not due again until ENRICH_REFRESH_HOURS have passed
+    assert enricher.drain() == 0
+    stale = datetime.utcnow() - timedelta(hours=enrichment.ENRICH_REFRESH_HOURS + 1)
+    make_due(db, enriched_at=stale)
+    assert enricher.drain() == 1
+
+    assert ats.requests[-1][1].get("If-None-Match") == '"v1"'
+    assert enricher.counters["not_modified"] == 1
+    posting = load(db, posting_id)
+    assert posting.enrich_status == "ok" and posting.title == "Software Engineer Intern"
+    assert posting.enriched_at > stale
+
+def test_refresh_skips_postings_of_synced_boards(ats, db):
+    posting_id, = add_postings(db, "https://boards.greenhouse.io/acme/jobs/4012345")
+    ats.routes["/v1/boards/acme/jobs/4012345"] = (200, GREENHOUSE_JOB, {})
+    enricher = PostingEnricher()
+    enricher.drain()
+    db.add(JobBoard(ats="greenhouse", company="acme", is_active=True))
+    make_due(db, enriched_at=datetime.utcnow() - timedelta(days=2))
+
+    assert enricher.drain() == 0
+    assert enricher.counters["requests"] == 1
+
+@pytest.mark.parametrize("status", [404, 410])
+def test_gone_postings_are_closed(ats, db, status):
+    posting_id, = add_postings(db, "https://boards.greenhouse.io/acme/jobs/4012345")
+    ats.routes["/v1/boards/acme/jobs/4012345"] = (status, "", {})
+    enricher = PostingEnricher()
+
+    enricher.drain()
+
+    assert load(db, posting_id).enrich_status == "closed"
+    assert enricher.counters["closed"] == 1
+
+def test_failures_back_off_until_max_attempts(ats, db, monkeypatch):
+    monkeypatch.setattr(enrichment, "ENRICH_MAX_ATTEMPTS", 3)
+    posting_id, = add_postings(db, "https://boards.greenhouse.io/acme/jobs/4012345")
+    ats.routes["/v1/boards/acme/jobs/4012345"] = (500, "boom", {})
+    enricher = PostingEnricher()
+
+    started = datetime.utcnow()
+    enricher.drain()
+    posting = load(db, posting_id)
+    assert (posting.enrich_status, posting.enrich_attempts) == ("pending", 1)
+    assert posting.enrich_error.startswith("HTTPStatusError")
+    assert posting.enrich_next_at >= started + timedelta(seconds=enrichment.ENRICH_RETRY_BASE_SECONDS)
+    # Backing off: nothing is due until enrich_next_at
+    assert enricher.drain() == 0
+
+    make_due(db)
+    enricher.drain()
+    posting = load(db, posting_id)
+    assert posting.enrich_attempts == 2
+    assert posting.enrich_next_at >= datetime.utcnow() + timedelta(seconds=enrichment.ENRICH_RETRY_BASE_SECONDS * 2 - 5)
+
+    make_due(db)
+    enricher.drain()
+    posting = load(db, posting_id)
+    assert (posting.enrich_status, posting.enrich_attempts, posting.enrich_next_at) == ("failed", 3, None)
+    assert enricher.counters["retries"] == 2 and enricher.counters["failed"] == 1
+
+    make_due(db)
+    assert enricher.drain() == 0
+
+def test_ashby_postings_share_one_board_request(ats, db):
+    ids = add_postings(db, *[f"https://jobs.ashbyhq.com/gamma/{job_id}/application" for job_id in ASHBY_IDS])
+    ats.routes["/posting-api/job-board/gamma"] = (200, ASHBY_BOARD, {"ETag": '"board-1"'})
+    enricher = PostingEnricher()
+
+    assert enricher.drain() == 4
+
+    assert ats.paths() == ["/posting-api/job-board/gamma"]
+    assert [load(db, posting_id).title for posting_id in ids[:3]] == ["Engineer 0", "Engineer 1", "Engineer 2"]
+    # The fourth isn't on the board any more
+    assert load(db, ids[3]).enrich_status == "closed"
+    assert enricher.counters["enriched"] == 3 and enricher.counters["closed"] == 1
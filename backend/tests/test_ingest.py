@@ -0,0 +1,95 @@
+import pytest
+
+import ingest
+from ingest import ingest_results, posting_row
+from models import JobPosting, SavedSearch, SavedSearchResult
+from seen_filter import BloomFilter, SeenFilter
+
+LEVER = "https://jobs.lever.co/acme/0b6c1a7e-1111-2222-3333-444455556666"
+GREENHOUSE = "https://job-boards.greenhouse.io/beta/jobs/4012345"
+OTHER = "https://careers.example.com/jobs/42"
+
+@pytest.fixture(params=["filter", "no_filter"])
+def seen(request, monkeypatch):
+    """The seen-results filter loaded (and empty), or still loading so every lookup is a "maybe" """
+    seen = SeenFilter()
+    if request.param == "filter":
+        seen.filter = BloomFilter(1000, 0.01)
+        seen.ready = True
+    monkeypatch.setattr(ingest, "seen_filter", seen)
+    return seen
+
+@pytest.fixture(params=["on_conflict", "generic"])
+def searches(request, monkeypatch, db):
+    """Two saved searches, ingesting with SQLite's ON CONFLICT or the portable check-then-insert"""
+    if request.param == "generic":
+        monkeypatch.setattr(ingest, "_dialect_insert", lambda db: None)
+    rows = [
+        SavedSearch(user_id="user-1", name=name, job_title="Software Engineer", experience_level="intern")
+        for name in ("first", "second")
+    ]
+    db.add_all(rows)
+    db.commit()
+    return [row.id for row in rows]
+
+def links(db):
+    db.expire_all()
+    return sorted(
+        (link.saved_search_id, posting.url, link.is_new)
+        for link, posting in db.query(SavedSearchResult, JobPosting).join(
+            JobPosting, JobPosting.id == SavedSearchResult.posting_id
+        )
+    )
+
+def test_new_results_are_linked_in_rank_order(db, seen, searches):
+    search_id = searches[0]
+    urls = [OTHER, f"{LEVER}/apply?lever-source=linkedin", GREENHOUSE, LEVER]
+
+    assert ingest_results(db, search_id, urls) == [OTHER, LEVER, GREENHOUSE]
+    db.commit()
+
+    assert links(db) == sorted((search_id, url, True) for url in (OTHER, LEVER, GREENHOUSE))
+    lever = db.query(JobPosting).filter_by(url=LEVER).one()
+    assert (lever.ats, lever.company, lever.job_id) == ("lever", "acme", "0b6c1a7e-1111-2222-3333-444455556666")
+
+def test_same_url_across_runs_is_new_once(db, seen, searches):
+    search_id = searches[0]
+    ingest_results(db, search_id, [LEVER, OTHER])
+    db.commit()
+
+    assert ingest_results(db, search_id, [f"{LEVER}?utm_source=x", GREENHOUSE, OTHER]) == [GREENHOUSE]
+    db.commit()
+
+    assert db.query(JobPosting).count() == 3
+    assert len(links(db)) == 3
+    if seen.ready:
+        # The second run's repeats were "maybe" answers the database confirmed
+        assert seen.counters == {"lookups": 5, "maybe": 2, "definitely_new": 3, "false_positives": 0}
+
+def test_searches_share_one_posting(db, seen, searches):
+    first, second = searches
+    ingest_results(db, first, [LEVER, OTHER])
+    db.commit()
+
+    assert ingest_results(db, second, [LEVER]) == [LEVER]
+    db.commit()
+
+    assert db.query(JobPosting).filter_by(url=LEVER).count() == 1
+    assert links(db) == sorted([(first, LEVER, True), (first, OTHER, True), (second, LEVER, True)])
+
+def test_links_the_filter_has_not_seen_are_still_caught(db, seen, searches):
+    """Another worker linked the posting after this worker's filter was loaded"""
+    search_id = searches[0]
+    row = posting_row(LEVER)
+    posting_id = ingest.upsert_postings(db, [row])[row["url_hash"]]
+    db.add(SavedSearchResult(saved_search_id=search_id, posting_id=posting_id, is_new=False))
+    db.commit()
+
+    assert ingest_results(db, search_id, [LEVER, GREENHOUSE]) == [GREENHOUSE]
+    db.commit()
+
+    assert (search_id, LEVER, False) in links(db)
+
+def test_nothing_to_ingest(db, seen, searches):
+    assert ingest_results(db, searches[0], []) == []
+    assert db.query(JobPosting).count() == 0
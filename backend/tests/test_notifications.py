@@ -0,0 +1,142 @@
+import smtplib
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+import notifications
+from models import NotificationOutbox, SavedSearch
+from notifications import NotificationSender, enqueue_notification
+
+class StubSMTP:
+    """Stands in for smtplib.SMTP, recording every session and message"""
+
+    sessions = []
+    # Recipients the server rejects, and whether the connection drops instead
+    reject = set()
+    disconnect = False
+
+    def __init__(self, host, port, timeout=None):
+        self.messages = []
+        self.closed = False
+        StubSMTP.sessions.append(self)
+
+    def send_message(self, msg):
+        if StubSMTP.disconnect:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        if msg["To"] in StubSMTP.reject:
+            raise smtplib.SMTPRecipientsRefused({msg["To"]: (550, b"No such user")})
+        self.messages.append(msg)
+
+    def quit(self):
+        self.closed = True
+
+    close = quit
+
+@pytest.fixture
+def smtp(monkeypatch, db):
+    monkeypatch.setattr(notifications, "FROM_EMAIL", "alerts@example.com")
+    monkeypatch.setattr(notifications, "SMTP_AUTH", False)
+    monkeypatch.setattr(notifications, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(notifications.smtplib, "SMTP", StubSMTP)
+    monkeypatch.setattr(StubSMTP, "sessions", [])
+    monkeypatch.setattr(StubSMTP, "reject", set())
+    monkeypatch.setattr(StubSMTP, "disconnect", False)
+    return StubSMTP
+
+def enqueue(db, email, name, urls):
+    search = SavedSearch(user_id="user-1", name=name, job_title="Software Engineer",
+                         experience_level="intern", notification_email=email)
+    db.add(search)
+    db.flush()
+    assert enqueue_notification(db, search, urls)
+    db.commit()
+
+def outbox(db):
+    db.expire_all()
+    return db.query(NotificationOutbox).order_by(NotificationOutbox.id).all()
+
+def make_due(db):
+    db.execute(update(NotificationOutbox).values(next_attempt_at=datetime.utcnow()))
+    db.commit()
+
+def test_one_digest_per_recipient_over_one_session(smtp, db):
+    for i in range(3):
+        enqueue(db, "ada@example.com", f"Search {i}", [f"https://example.com/jobs/{i}"])
+    enqueue(db, "grace@example.com", "Data", ["https://example.com/jobs/data"])
+    sender = NotificationSender()
+
+    assert sender.drain() == 4
+
+    session, = smtp.sessions
+    assert session.closed
+    assert [msg["To"] for msg in session.messages] == ["ada@example.com", "grace@example.com"]
+    digest = session.messages[0]
+    assert digest["Subject"] == "New Job Results: 3 new posting(s) across 3 saved searches"
+    body = digest.get_payload()[0].get_payload()
+    assert all(f"https://example.com/jobs/{i}" in body for i in range(3))
+    assert session.messages[1]["Subject"] == "New Job Results: Data"
+    assert {item.status for item in outbox(db)} == {"sent"}
+    assert sender.counters["emails_sent"] == 2 and sender.counters["items_sent"] == 4
+    # Nothing left to send, so no new session
+    assert sender.drain() == 0 and len(smtp.sessions) == 1
+
+def test_rejected_recipient_is_rescheduled(smtp, db):
+    enqueue(db, "ada@example.com", "Backend", ["https://example.com/jobs/1"])
+    enqueue(db, "bounce@example.com", "Frontend", ["https://example.com/jobs/2"])
+    smtp.reject.add("bounce@example.com")
+    sender = NotificationSender()
+
+    started = datetime.utcnow()
+    assert sender.drain() == 1
+
+    sent, rejected = outbox(db)
+    assert sent.status == "sent"
+    assert (rejected.status, rejected.attempts, rejected.claim_token) == ("pending", 1, None)
+    assert "No such user" in rejected.last_error
+    assert rejected.next_attempt_at >= started + timedelta(seconds=notifications.NOTIFY_RETRY_BASE_SECONDS)
+    # Backing off: nothing is due yet
+    assert sender.drain() == 0
+
+    smtp.reject.clear()
+    make_due(db)
+    assert sender.drain() == 1
+    assert outbox(db)[1].status == "sent"
+
+def test_dropped_connection_requeues_unsent_and_gives_up(smtp, db, monkeypatch):
+    monkeypatch.setattr(notifications, "NOTIFY_MAX_ATTEMPTS", 2)
+    enqueue(db, "ada@example.com", "Backend", ["https://example.com/jobs/1"])
+    enqueue(db, "grace@example.com", "Data", ["https://example.com/jobs/2"])
+    smtp.disconnect = True
+    sender = NotificationSender()
+
+    assert sender.drain() == 0
+    assert [(item.status, item.attempts) for item in outbox(db)] == [("pending", 1), ("pending", 1)]
+    assert smtp.sessions[0].closed
+
+    make_due(db)
+    sender.drain()
+    assert [(item.status, item.attempts) for item in outbox(db)] == [("failed", 2), ("failed", 2)]
+    assert sender.counters["retries"] == 2 and sender.counters["failed"] == 2
+
+def test_purge_drops_old_finished_rows(smtp, db):
+    for status in ("sent", "failed", "pending"):
+        enqueue(db, "ada@example.com", status, ["https://example.com/jobs/1"])
+    enqueue(db, "ada@example.com", "recent", ["https://example.com/jobs/2"])
+    old = datetime.utcnow() - timedelta(days=notifications.NOTIFY_RETENTION_DAYS + 1)
+    for name in ("sent", "failed", "pending"):
+        db.execute(update(NotificationOutbox).where(NotificationOutbox.search_name == name)
+                   .values(status=name, created_at=old))
+    db.execute(update(NotificationOutbox).where(NotificationOutbox.search_name == "recent").values(status="sent"))
+    db.commit()
+
+    NotificationSender().purge()
+
+    assert [item.search_name for item in outbox(db)] == ["pending", "recent"]
+
+def test_nothing_queued_without_an_email(smtp, db):
+    search = SavedSearch(user_id="user-1", name="Quiet", job_title="Engineer", experience_level="intern")
+    db.add(search)
+    db.flush()
+
+    assert not enqueue_notification(db, search, ["https://example.com/jobs/1"])
@@ -0,0 +1,57 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import scheduler
+from models import SavedSearch
+from scheduler import SearchScheduler
+
+def test_timed_out_groups_count_against_max_in_flight(monkeypatch, db):
+    monkeypatch.setattr(scheduler, "MAX_IN_FLIGHT", 2)
+    monkeypatch.setattr(scheduler, "SEARCH_TIMEOUT_SECONDS", 0.2)
+    lock = threading.Lock()
+    running = []
+    most_running = 0
+
+    def run_search_group(db, query, members):
+        nonlocal most_running
+        with lock:
+            running.append(query)
+            most_running = max(most_running, len(running))
+        # The first two hang well past the timeout
+        time.sleep(2.5 if query in ("q0", "q1") else 0.05)
+        with lock:
+            running.remove(query)
+        return 1
+
+    sweeper = SearchScheduler()
+    monkeypatch.setattr(sweeper, "run_search_group", run_search_group)
+    summary = {"started": 0, "done": 0, "failed": 0, "timed_out": 0, "new_results": 0}
+
+    sweeper.execute_groups([(f"q{i}", []) for i in range(4)], summary)
+
+    assert most_running == 2
+    assert summary["timed_out"] == 2 and summary["done"] == 2
+    assert not sweeper.overrun
+
+def test_next_run_comes_from_the_earliest_unleased_search(db):
+    soon = datetime.utcnow() + timedelta(minutes=5)
+    db.add_all([
+        SavedSearch(user_id="u", name="later", job_title="Engineer", experience_level="intern",
+                    next_run_at=soon + timedelta(hours=1)),
+        SavedSearch(user_id="u", name="soon", job_title="Engineer", experience_level="intern", next_run_at=soon),
+        SavedSearch(user_id="u", name="leased", job_title="Engineer", experience_level="intern",
+                    next_run_at=soon - timedelta(minutes=4), lease_owner="other",
+                    lease_expires_at=datetime.utcnow() + timedelta(minutes=10)),
+        SavedSearch(user_id="u", name="paused", job_title="Engineer", experience_level="intern",
+                    next_run_at=soon - timedelta(minutes=4), is_active=False),
+    ])
+    db.commit()
+    sweeper = SearchScheduler()
+
+    sweeper.refresh_next_run()
+
+    assert sweeper.next_run_at == soon
+    assert 290 < sweeper.seconds_until_next_run() <= 300
+    status = sweeper.get_status()
+    assert (status["next_run"], status["queued_searches"]) == (soon.isoformat(), 2)
@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import scan
+import search_service
+from quota import INTERACTIVE, SCHEDULED, quota_limiter
+
+LINK = "https://jobs.lever.co/acme/0b6c1a7e-1111-2222-3333-444455556666"
+
+@pytest.fixture
+def one_page_worker(monkeypatch):
+    """Fetch result pages one at a time, so the pages after a short one are still queued"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(scan, "_page_executor", executor)
+    yield
+    executor.shutdown()
+
+def test_pages_not_requested_are_given_back(monkeypatch, db, one_page_worker):
+    requested = []
+
+    def fetch_page(query, key, id, start, num):
+        requested.append(start)
+        return [LINK] if start == 1 else []
+
+    monkeypatch.setattr(scan, "fetch_page", fetch_page)
+    released_before = quota_limiter.released
+
+    assert search_service.search("software engineer refund", 50) == [LINK]
+
+    assert requested == [1]
+    assert quota_limiter.used_today() == 1
+    assert quota_limiter.released - released_before == 4
+
+def test_full_pages_are_charged(monkeypatch, db, one_page_worker):
+    monkeypatch.setattr(scan, "fetch_page", lambda query, key, id, start, num: [f"https://example.com/{start + i}" for i in range(num)])
+
+    assert len(search_service.search("software engineer charged", 30)) == 30
+
+    assert quota_limiter.used_today() == 3
+
+def test_lanes_do_not_share_in_flight_calls(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def custom_search(query, key, id, num):
+        calls.append(query)
+        assert release.wait(5)
+        return [LINK]
+
+    monkeypatch.setattr(scan, "custom_search", custom_search)
+    monkeypatch.setattr(quota_limiter, "acquire", lambda cost, lane: None)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        scheduled = pool.submit(search_service.search, "software engineer lanes", 10, SCHEDULED)
+        interactive = pool.submit(search_service.search, "software engineer lanes", 10, INTERACTIVE)
+        while len(calls) < 2:
+            assert not interactive.done()
+            threading.Event().wait(0.005)
+        release.set()
+        assert scheduled.result() == interactive.result() == [LINK]
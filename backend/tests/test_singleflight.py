@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import scan
+import search_service
+from singleflight import SingleFlight
+
+CALLERS = 50
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "callers never joined the in-flight call"
+        time.sleep(0.005)
+
+class BlockingUpstream:
+    """Stand-in for the upstream call that blocks until released, counting calls"""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.release = threading.Event()
+        self.error = error
+
+    def __call__(self, *args):
+        self.calls += 1
+        assert self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return ["https://jobs.lever.co/acme/0b6c1a7e-1111-2222-3333-444455556666"]
+
+@pytest.fixture
+def upstream(monkeypatch):
+    stub = BlockingUpstream()
+    monkeypatch.setattr(scan, "custom_search", stub)
+    monkeypatch.setattr(search_service.quota_limiter, "acquire", lambda cost, lane: None)
+    return stub
+
+def search_from_threads(query, upstream):
+    """Run CALLERS concurrent search_service.search calls; returns their results or exceptions"""
+    flight = search_service._in_flight
+    shared_before = flight.shared
+
+    def call():
+        try:
+            return search_service.search(query, 10)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        futures = [pool.submit(call) for _ in range(CALLERS)]
+        # Everyone but the leader has to be waiting on the in-flight call before it finishes
+        wait_for(lambda: flight.shared - shared_before == CALLERS - 1)
+        upstream.release.set()
+        return [future.result() for future in futures]
+
+def test_threads_share_one_upstream_call(upstream):
+    results = search_from_threads("software engineer intern threads", upstream)
+
+    assert upstream.calls == 1
+    assert results == [["https://jobs.lever.co/acme/0b6c1a7e-1111-2222-3333-444455556666"]] * CALLERS
+
+def test_threads_share_upstream_exception(upstream):
+    upstream.error = RuntimeError("upstream failed")
+
+    results = search_from_threads("software engineer intern errors", upstream)
+
+    assert upstream.calls == 1
+    assert all(result is upstream.error for result in results)
+
+async def call_async(flight, fn):
+    tasks = [asyncio.create_task(flight.do_async("key", fn)) for _ in range(CALLERS)]
+    while flight.shared < CALLERS - 1:
+        await asyncio.sleep(0.005)
+    fn.release.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+def test_coroutines_share_one_call():
+    flight = SingleFlight()
+    fn = BlockingUpstream()
+
+    results = asyncio.run(call_async(flight, fn))
+
+    assert fn.calls == 1
+    assert results == [["https://jobs.lever.co/acme/0b6c1a7e-1111-2222-3333-444455556666"]] * CALLERS
+    assert flight.get_stats() == {"in_flight": 0, "executions": 1, "shared": CALLERS - 1}
+
+def test_coroutines_share_exception():
+    flight = SingleFlight()
+    fn = BlockingUpstream(error=RuntimeError("upstream failed"))
+
+    results = asyncio.run(call_async(flight, fn))
+
+    assert fn.calls == 1
+    assert all(result is fn.error for result in results)
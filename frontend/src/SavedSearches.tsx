@@ -48,6 +48,73 @@ export default function SavedSearches() {
     }
   }, [user, session])
 
+  // Live new-result counts over Server-Sent Events. EventSource can't send the
+  // Authorization header, so each connection opens with a short-lived stream token.
+  useEffect(() => {
+    if (!session?.access_token) return
+
+    let source: EventSource | null = null
+    let retryTimer: ReturnType<typeof setTimeout> | undefined
+    let lastEventId = ''
+    let closed = false
+
+    const scheduleReconnect = () => {
+      if (!closed) {
+        retryTimer = setTimeout(connect, 5000)
+      }
+    }
+
+    const connect = async () => {
+      try {
+        const response = await fetch(`${apiUrl}/events/token`, {
+          method: 'POST',
+          headers: {
+            'Authorization': `Bearer ${session.access_token}`,
+          },
+        })
+        if (!response.ok) {
+          throw new Error('Failed to get event stream token')
+        }
+        const { token } = await response.json()
+        if (closed) return
+
+        const params = new URLSearchParams({ token })
+        if (lastEventId) {
+          params.set('last_event_id', lastEventId)
+        }
+        source = new EventSource(`${apiUrl}/events/stream?${params}`)
+        source.addEventListener('new_results', (event) => {
+          const message = event as MessageEvent
+          lastEventId = message.lastEventId
+          const data = JSON.parse(message.data)
+          // Events carry the search's unseen total, so a refetch landing at the same time
+          // (e.g. after "run now") can't be counted twice; older events only have the delta
+          setSavedSearches(prev => prev.map(search =>
+            search.id === data.saved_search_id
+              ? { ...search, new_results_count: data.new_results_count ?? search.new_results_count + data.new_results }
+              : search
+          ))
+        })
+        source.onerror = () => {
+          // The browser reconnects by itself unless the stream was refused, e.g. once the token expired
+          if (source?.readyState === EventSource.CLOSED) {
+            source.close()
+            scheduleReconnect()
+          }
+        }
+      } catch {
+        scheduleReconnect()
+      }
+    }
+
+    connect()
+    return () => {
+      closed = true
+      clearTimeout(retryTimer)
+      source?.close()
+    }
+  }, [session?.access_token])
+
   const fetchSavedSearches = async () => {
     try {
       setLoading(true)
@@ -226,8 +293,26 @@ export default function SavedSearches() {
         throw new Error('Failed to run search')
       }
 
-      const result = await response.json()
-      alert(`Search completed! Found ${result.total_results} total results, ${result.new_results} new.`)
+      // The run happens in the background; poll until it finishes
+      let run = await response.json()
+      while (run.state === 'queued' || run.state === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1000))
+        const statusResponse = await fetch(`${apiUrl}/saved-searches/${id}/runs/${run.job_id}`, {
+          headers: {
+            'Authorization': `Bearer ${session?.access_token}`,
+          },
+        })
+        if (!statusResponse.ok) {
+          throw new Error('Failed to get search status')
+        }
+        run = await statusResponse.json()
+      }
+
+      if (run.state === 'failed') {
+        throw new Error(run.error || 'Failed to run search')
+      }
+
+      alert(`Search completed! Found ${run.total_results} total results, ${run.new_results} new.`)
       fetchSavedSearches()
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to run search')